@@ -13,9 +13,77 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv("JWT_SECRET", "studypilot-secret-key-change-in-production")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+    # Comma-separated user IDs allowed to read service-wide stats and metrics
+    ADMIN_USER_IDS: str = os.getenv("ADMIN_USER_IDS", "")
+
+    # LLM provider: "gemini" or "stub" (deterministic local responses for load tests)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    LLM_STUB_LATENCY_MS: float = float(os.getenv("LLM_STUB_LATENCY_MS", "800"))
+    LLM_STUB_LATENCY_DISTRIBUTION: str = os.getenv("LLM_STUB_LATENCY_DISTRIBUTION", "lognormal")
+    LLM_STUB_LATENCY_JITTER: float = float(os.getenv("LLM_STUB_LATENCY_JITTER", "0.5"))
+    LLM_STUB_ERROR_RATE: float = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+    LLM_STUB_SEED: int = int(os.getenv("LLM_STUB_SEED", "0"))
 
     # Gemini API
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    GEMINI_OCR_MODEL: str = os.getenv("GEMINI_OCR_MODEL", "gemini-1.5-flash")
+    PROMPT_VERSION: str = os.getenv("PROMPT_VERSION", "2")
+
+    # LLM OCR fallback
+    OCR_POLL_SECONDS: float = float(os.getenv("OCR_POLL_SECONDS", "0.5"))
+    OCR_BATCH_PAGES: int = int(os.getenv("OCR_BATCH_PAGES", "10"))
+    OCR_CONCURRENCY: int = int(os.getenv("OCR_CONCURRENCY", "4"))
+    OCR_BUDGET_SECONDS: float = float(os.getenv("OCR_BUDGET_SECONDS", "90"))
+
+    # Tesseract image preprocessing
+    OCR_TARGET_DPI: int = int(os.getenv("OCR_TARGET_DPI", "300"))
+    OCR_MAX_WIDTH: int = int(os.getenv("OCR_MAX_WIDTH", "2480"))
+    OCR_STRIP_HEIGHT: int = int(os.getenv("OCR_STRIP_HEIGHT", "2000"))
+    OCR_STRIP_OVERLAP: int = int(os.getenv("OCR_STRIP_OVERLAP", "100"))
+    OCR_AUTO_ROTATE: bool = os.getenv("OCR_AUTO_ROTATE", "true").lower() == "true"
+
+    # Gemini admission scheduler
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+    LLM_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+    LLM_OUTPUT_TOKEN_ESTIMATE: int = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "1024"))
+
+    # Model call instrumentation (failed calls are always recorded)
+    LLM_METRICS_SAMPLE_RATE: float = float(os.getenv("LLM_METRICS_SAMPLE_RATE", "0.1"))
+    LLM_METRICS_FLUSH_SECONDS: float = float(os.getenv("LLM_METRICS_FLUSH_SECONDS", "5"))
+    LLM_METRICS_BUFFER_SIZE: int = int(os.getenv("LLM_METRICS_BUFFER_SIZE", "5000"))
+    LLM_METRICS_MONGO_TTL_SECONDS: int = int(os.getenv("LLM_METRICS_MONGO_TTL_SECONDS", "2592000"))
+
+    # Summaries: "llm", or "local" for the offline extractive summarizer
+    AI_SUMMARY_MODE: str = os.getenv("AI_SUMMARY_MODE", "llm")
+    LOCAL_SUMMARY_MAX_WORDS: int = int(os.getenv("LOCAL_SUMMARY_MAX_WORDS", "350"))
+    # Key terms used for offline quiz/flashcard drafts (answers and distractors)
+    LOCAL_QUIZ_MAX_TERMS: int = int(os.getenv("LOCAL_QUIZ_MAX_TERMS", "40"))
+
+    # Chunked generation for long materials
+    AI_CHUNK_TOKENS: int = int(os.getenv("AI_CHUNK_TOKENS", "2000"))
+    AI_REDUCE_TOKENS: int = int(os.getenv("AI_REDUCE_TOKENS", "12000"))
+    AI_CHUNK_CONCURRENCY: int = int(os.getenv("AI_CHUNK_CONCURRENCY", "4"))
+    AI_GENERATE_ALL_CONCURRENCY: int = int(os.getenv("AI_GENERATE_ALL_CONCURRENCY", "3"))
+    AI_MAX_KEY_CONCEPTS: int = int(os.getenv("AI_MAX_KEY_CONCEPTS", "15"))
+    # Terms per material counted in the key-concept document-frequency table
+    KEYPHRASE_DF_TERMS: int = int(os.getenv("KEYPHRASE_DF_TERMS", "2000"))
+
+    # Background generation jobs (set JOB_WORKERS=0 to run workers only via worker.py)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_STANDALONE_WORKERS: int = int(os.getenv("JOB_STANDALONE_WORKERS", "8"))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+    # AI generation cache
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "512"))
+    AI_CACHE_TTL_SECONDS: int = int(os.getenv("AI_CACHE_TTL_SECONDS", "3600"))
+    AI_CACHE_MONGO_TTL_SECONDS: int = int(os.getenv("AI_CACHE_MONGO_TTL_SECONDS", "2592000"))
 
     # Server
     HOST: str = os.getenv("HOST", "0.0.0.0")
@@ -23,6 +91,39 @@ class Settings(BaseSettings):
 
     # Upload
     UPLOAD_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", "100"))
+    # Extraction process pool (EXTRACTION_WORKERS=0 uses one worker per core)
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", "0"))
+    EXTRACTION_QUEUE_SIZE: int = int(os.getenv("EXTRACTION_QUEUE_SIZE", "16"))
+    EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+    EXTRACTION_MAX_TASKS_PER_CHILD: int = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", "50"))
+    PDF_SHARD_PAGES: int = int(os.getenv("PDF_SHARD_PAGES", "25"))
+    # Text is normalized in segments of this many characters
+    TEXT_SEGMENT_CHARS: int = int(os.getenv("TEXT_SEGMENT_CHARS", str(1024 * 1024)))
+    # Bump when extraction or cleaning changes; cached extractions of other versions are dropped
+    EXTRACTOR_VERSION: str = os.getenv("EXTRACTOR_VERSION", "2")
+    EXTRACTION_CACHE_MONGO_TTL_SECONDS: int = int(os.getenv("EXTRACTION_CACHE_MONGO_TTL_SECONDS", "7776000"))
+    # Per-type limits in MB, e.g. "pdf:100,png:25"; other types use UPLOAD_MAX_MB
+    UPLOAD_TYPE_LIMITS_MB: str = os.getenv(
+        "UPLOAD_TYPE_LIMITS_MB", "pdf:100,txt:20,png:25,jpg:25,jpeg:25,bmp:25,tiff:50,webp:25,zip:200"
+    )
+    # Material text: compressed above CONTENT_COMPRESS_MIN_BYTES, moved to GridFS when still
+    # above CONTENT_INLINE_MAX_BYTES compressed
+    CONTENT_COMPRESS_MIN_BYTES: int = int(os.getenv("CONTENT_COMPRESS_MIN_BYTES", "16384"))
+    CONTENT_INLINE_MAX_BYTES: int = int(os.getenv("CONTENT_INLINE_MAX_BYTES", str(1024 * 1024)))
+    CONTENT_COMPRESSION_LEVEL: int = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+    # GridFS files claimed by an upload this recently are never deleted by a release
+    CONTENT_RELEASE_GRACE_SECONDS: int = int(os.getenv("CONTENT_RELEASE_GRACE_SECONDS", "3600"))
+    # Material listing page size (default and largest allowed)
+    MATERIALS_PAGE_SIZE: int = int(os.getenv("MATERIALS_PAGE_SIZE", "50"))
+    MATERIALS_PAGE_MAX: int = int(os.getenv("MATERIALS_PAGE_MAX", "200"))
+    # Bulk upload: files per request (ZIP entries included), concurrent extractions, unpacked ZIP size
+    BULK_UPLOAD_MAX_FILES: int = int(os.getenv("BULK_UPLOAD_MAX_FILES", "100"))
+    BULK_UPLOAD_CONCURRENCY: int = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "4"))
+    BULK_ARCHIVE_MAX_MB: int = int(os.getenv("BULK_ARCHIVE_MAX_MB", "500"))
+    # Whole bulk request body, checked from Content-Length before it is received
+    BULK_UPLOAD_MAX_MB: int = int(os.getenv("BULK_UPLOAD_MAX_MB", "500"))
 
     class Config:
         env_file = ".env"
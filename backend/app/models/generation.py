@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional
+
+
+def _as_text(value):
+    """Coerce scalar answers (e.g. true/false booleans) to strings."""
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+
+class QuizQuestion(BaseModel):
+    type: str = "short_answer"
+    question: str = Field(..., min_length=1)
+    options: Optional[List[str]] = None
+    correct_answer: str = Field(..., min_length=1)
+    explanation: str = ""
+
+    @field_validator("correct_answer", "explanation", mode="before")
+    @classmethod
+    def coerce_text(cls, value):
+        return _as_text(value)
+
+    @field_validator("options", mode="before")
+    @classmethod
+    def coerce_options(cls, value):
+        if isinstance(value, list):
+            return [_as_text(option) for option in value]
+        return value
+
+    @model_validator(mode="after")
+    def check_options(self):
+        if self.type == "mcq" and (not self.options or len(self.options) < 2):
+            raise ValueError("Multiple choice questions need at least two options")
+        return self
+
+
+class Flashcard(BaseModel):
+    front: str = Field(..., min_length=1)
+    back: str = Field(..., min_length=1)
+    category: str = "General"
+
+
+class StudyDay(BaseModel):
+    day: int
+    title: str = ""
+    topics: List[str] = []
+    objectives: List[str] = []
+    activities: List[str] = []
+    estimated_time: str = ""
+    tips: str = ""
+
+    @field_validator("estimated_time", "tips", mode="before")
+    @classmethod
+    def coerce_text(cls, value):
+        return _as_text(value)
+
+
+class StudyPlan(BaseModel):
+    title: str = "Study Plan"
+    total_days: int
+    overview: str = ""
+    daily_plans: List[StudyDay] = Field(..., min_length=1)
+    key_topics: List[str] = []
+    recommended_resources: List[str] = []
@@ -24,11 +24,22 @@ class MaterialResponse(BaseModel):
 class MaterialInDB(BaseModel):
     user_id: str
     title: str
-    content: str
+    # Plain text, or None when it is compressed or in GridFS (see content_store)
+    content: Optional[str] = None
+    content_blob: Optional[dict] = None
+    # Packed sentence/chunk offsets through content_store; text_index held them inline before
+    index_blob: Optional[dict] = None
+    text_index: Optional[dict] = None
     subject: Optional[str] = None
     file_type: Optional[str] = None
     original_filename: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Listing fields, kept in step with the content and artifacts (see material_listing)
+    content_preview: Optional[str] = None
+    has_summary: bool = False
+    has_flashcards: bool = False
+    has_quizzes: bool = False
+    has_study_plan: bool = False
     summary: Optional[str] = None
     key_concepts: Optional[List[str]] = None
     flashcards: Optional[List[dict]] = None
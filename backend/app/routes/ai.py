@@ -1,7 +1,22 @@
+import asyncio
+import time
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import JSONResponse
+from typing import Literal, Optional
 from bson import ObjectId
-from app.utils.helpers import get_current_user
-from app.services.ai_engine import ai_engine
+from app.config import settings
+from app.utils.helpers import get_current_user, require_admin, sse_event, sse_response
+from app.services.ai_engine import ai_engine, record_fallbacks
+from app.services.generation_cache import generation_cache
+from app.services.single_flight import ai_single_flight
+from app.services.llm_scheduler import current_priority, llm_scheduler
+from app.services.llm_metrics import llm_metrics
+from app.services.job_queue import JobFailed, job_queue
+from app.services.keyphrase_extractor import keyphrase_extractor
+from app.services.chunk_store import chunk_store, material_scope
+from app.services.content_store import CONTENT_FIELDS, content_store
+from app.services.material_listing import artifact_fields
+from app.services.text_index import INDEX_FIELDS, load_index
 
 router = APIRouter(prefix="/api/ai", tags=["AI Generation"])
 
@@ -11,65 +26,324 @@ def set_db(database):
     global db
     db = database
 
-async def get_material_doc(material_id: str, user_id: str):
+async def get_material_doc(material_id: str, user_id: str, with_content: bool = True):
+    """The material's text and index (only its id when with_content is False)."""
     try:
-        doc = await db.materials.find_one({
-            "_id": ObjectId(material_id),
-            "user_id": user_id
-        })
+        doc = await db.materials.find_one(
+            {"_id": ObjectId(material_id), "user_id": user_id},
+            {**CONTENT_FIELDS, **INDEX_FIELDS} if with_content else {"_id": 1}
+        )
     except Exception:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
 
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
-        
+
+    if with_content:
+        doc["content"] = await content_store.load(doc)
     return doc
 
-@router.post("/{material_id}/summarize")
-async def generate_summary(material_id: str, user_id: str = Depends(get_current_user)):
-    doc = await get_material_doc(material_id, user_id)
-    summary = await ai_engine.generate_summary(doc["content"])
-    key_concepts = await ai_engine.extract_key_concepts(doc["content"])
+async def run_key_concepts(user_id: str, content: str, timings: Optional[list] = None,
+                           mode: Optional[str] = None) -> list:
+    """Rank candidate concepts against the user's materials, then let the model refine them."""
+    hints = await keyphrase_extractor.extract_for_user(user_id, content)
+    return await ai_engine.extract_key_concepts(content, timings, hints, mode)
+
+async def run_summary(material_id: str, user_id: str, content: str, mode: Optional[str] = None) -> dict:
+    timings = []
+    summary, key_concepts = await asyncio.gather(
+        ai_engine.generate_summary(content, timings, mode),
+        run_key_concepts(user_id, content, timings, mode),
+    )
 
     await db.materials.update_one(
         {"_id": ObjectId(material_id)},
-        {"$set": {"summary": summary, "key_concepts": key_concepts}}
+        {"$set": artifact_fields({"summary": summary, "key_concepts": key_concepts})}
     )
 
-    return {"summary": summary, "key_concepts": key_concepts}
+    return {"summary": summary, "key_concepts": key_concepts, "chunk_timings": timings}
 
-@router.post("/{material_id}/quiz")
-async def generate_quiz(material_id: str, num_questions: int = 10, user_id: str = Depends(get_current_user)):
-    doc = await get_material_doc(material_id, user_id)
-    quizzes = await ai_engine.generate_quiz(doc["content"], num_questions)
+async def run_quiz(material_id: str, content: str, num_questions: int, mode: Optional[str] = None) -> dict:
+    timings = []
+    quizzes = await ai_engine.generate_quiz(content, num_questions, timings, mode)
 
     await db.materials.update_one(
         {"_id": ObjectId(material_id)},
-        {"$set": {"quizzes": quizzes}}
+        {"$set": artifact_fields({"quizzes": quizzes})}
     )
 
-    return {"quizzes": quizzes}
+    return {"quizzes": quizzes, "chunk_timings": timings}
 
-@router.post("/{material_id}/flashcards")
-async def generate_flashcards(material_id: str, num_cards: int = 15, user_id: str = Depends(get_current_user)):
-    doc = await get_material_doc(material_id, user_id)
-    flashcards = await ai_engine.generate_flashcards(doc["content"], num_cards)
+async def run_flashcards(material_id: str, content: str, num_cards: int, mode: Optional[str] = None) -> dict:
+    timings = []
+    flashcards = await ai_engine.generate_flashcards(content, num_cards, timings, mode)
 
     await db.materials.update_one(
         {"_id": ObjectId(material_id)},
-        {"$set": {"flashcards": flashcards}}
+        {"$set": artifact_fields({"flashcards": flashcards})}
     )
 
-    return {"flashcards": flashcards}
+    return {"flashcards": flashcards, "chunk_timings": timings}
 
-@router.post("/{material_id}/study-plan")
-async def generate_study_plan(material_id: str, days: int = 7, user_id: str = Depends(get_current_user)):
-    doc = await get_material_doc(material_id, user_id)
-    study_plan = await ai_engine.generate_study_plan(doc["content"], days)
+async def run_study_plan(material_id: str, content: str, days: int) -> dict:
+    timings = []
+    study_plan = await ai_engine.generate_study_plan(content, days, timings)
 
     await db.materials.update_one(
         {"_id": ObjectId(material_id)},
-        {"$set": {"study_plan": study_plan}}
+        {"$set": artifact_fields({"study_plan": study_plan})}
     )
 
-    return {"study_plan": study_plan}
+    return {"study_plan": study_plan, "chunk_timings": timings}
+
+async def run_generate_all(material_id: str, user_id: str, content: str, num_questions: int,
+                           num_cards: int, days: int) -> dict:
+    """Generate every artifact concurrently and persist them together.
+
+    Artifacts that failed are listed in errors; those the engine served
+    offline after a model failure are kept and listed in fallbacks.
+    """
+    timings = []
+    semaphore = asyncio.Semaphore(settings.AI_GENERATE_ALL_CONCURRENCY)
+    # Long materials are planned from their summary; share it instead of summarizing twice.
+    summary_ready = asyncio.get_running_loop().create_future()
+
+    async def summarize():
+        try:
+            summary = await ai_engine.generate_summary(content, timings)
+        except BaseException as e:
+            if not summary_ready.done():
+                summary_ready.set_exception(e)
+                summary_ready.exception()  # the study plan re-raises it; don't warn when it never looks
+            raise
+        if not summary_ready.done():
+            summary_ready.set_result(summary)
+        return summary
+
+    # The summary comes first so it takes a semaphore slot before the study plan waits on it.
+    artifacts = {
+        "summary": summarize,
+        "key_concepts": lambda: run_key_concepts(user_id, content, timings),
+        "quizzes": lambda: ai_engine.generate_quiz(content, num_questions, timings),
+        "flashcards": lambda: ai_engine.generate_flashcards(content, num_cards, timings),
+        "study_plan": lambda: ai_engine.generate_study_plan(
+            content, days, timings, summary=summary_ready),
+    }
+
+    async def run(name, generate):
+        async with semaphore:
+            started = time.perf_counter()
+            with record_fallbacks() as fallbacks:
+                try:
+                    value, error = await generate(), None
+                except Exception as e:
+                    print(f"generate-all {name} failed: {e}")
+                    value, error = None, str(e)
+            return name, value, round((time.perf_counter() - started) * 1000, 1), error, fallbacks
+
+    results = await asyncio.gather(*(run(name, generate) for name, generate in artifacts.items()))
+
+    generated = {name: value for name, value, _, error, _ in results if error is None}
+    errors = {name: error for name, _, _, error, _ in results if error is not None}
+    latency_ms = {name: elapsed for name, _, elapsed, _, _ in results}
+    fallbacks = {name: recorded[-1]["reason"] for name, _, _, _, recorded in results if recorded}
+
+    if generated:
+        await db.materials.update_one(
+            {"_id": ObjectId(material_id)},
+            {"$set": artifact_fields(generated)}
+        )
+
+    return {
+        **generated,
+        "latency_ms": latency_ms,
+        "errors": errors,
+        "fallbacks": fallbacks,
+        "chunk_timings": timings
+    }
+
+ARTIFACT_RUNNERS = {
+    "summary": lambda material_id, user_id, content, params: run_summary(
+        material_id, user_id, content, params.get("mode")),
+    "quiz": lambda material_id, user_id, content, params: run_quiz(
+        material_id, content, params["num_questions"], params.get("mode")),
+    "flashcards": lambda material_id, user_id, content, params: run_flashcards(
+        material_id, content, params["num_cards"], params.get("mode")),
+    "study_plan": lambda material_id, user_id, content, params: run_study_plan(
+        material_id, content, params["days"]),
+    "all": lambda material_id, user_id, content, params: run_generate_all(
+        material_id, user_id, content, params["num_questions"], params["num_cards"], params["days"]),
+}
+
+async def run_artifact(kind: str, material_id: str, user_id: str, params: dict,
+                       doc: Optional[dict] = None) -> dict:
+    """Generate and persist one artifact, coalescing identical in-flight requests.
+
+    Only requests of the same priority class share a run, so an interactive
+    request never waits behind a background job's queue position.
+    """
+    if doc is None:
+        doc = await get_material_doc(material_id, user_id)
+    key = (material_id, kind, current_priority(), *(params[name] for name in sorted(params)))
+
+    async def work():
+        with material_scope(material_id, await load_index(doc)):
+            return await ARTIFACT_RUNNERS[kind](material_id, user_id, doc["content"], params)
+
+    return await ai_single_flight.do(key, work)
+
+async def run_job(job: dict) -> dict:
+    try:
+        doc = await get_material_doc(job["material_id"], job["user_id"])
+    except HTTPException as e:
+        if e.status_code == status.HTTP_404_NOT_FOUND:
+            raise JobFailed(e.detail)
+        raise
+    return await run_artifact(job["kind"], job["material_id"], job["user_id"], job["params"], doc)
+
+for artifact_kind in ARTIFACT_RUNNERS:
+    job_queue.register(artifact_kind, run_job)
+
+# Offline first drafts returned with a queued job while the model version is pending.
+DRAFT_BUILDERS = {
+    "quiz": lambda content, params: ai_engine.generate_quiz(
+        content, params["num_questions"], mode="local"),
+    "flashcards": lambda content, params: ai_engine.generate_flashcards(
+        content, params["num_cards"], mode="local"),
+}
+
+async def dispatch(kind: str, material_id: str, user_id: str, params: dict, background: bool):
+    """Run an artifact request inline, or queue it as a job when background is set."""
+    draft = background and kind in DRAFT_BUILDERS and params.get("mode") != "local"
+    doc = await get_material_doc(material_id, user_id, with_content=not background or draft)
+    if not background:
+        return await run_artifact(kind, material_id, user_id, params, doc)
+
+    job_id = await job_queue.enqueue(kind, user_id, material_id, params)
+    content = {"job_id": job_id, "status": "queued"}
+    if draft:
+        content["draft"] = await DRAFT_BUILDERS[kind](doc["content"], params)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=content
+    )
+
+@router.post("/{material_id}/summarize")
+async def generate_summary(
+    material_id: str,
+    mode: Optional[Literal["llm", "local"]] = None,
+    background: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    params = {"mode": mode} if mode else {}
+    return await dispatch("summary", material_id, user_id, params, background)
+
+@router.post("/{material_id}/quiz")
+async def generate_quiz(
+    material_id: str,
+    num_questions: int = 10,
+    mode: Optional[Literal["llm", "local"]] = None,
+    background: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    params = {"num_questions": num_questions, **({"mode": mode} if mode else {})}
+    return await dispatch("quiz", material_id, user_id, params, background)
+
+@router.post("/{material_id}/flashcards")
+async def generate_flashcards(
+    material_id: str,
+    num_cards: int = 15,
+    mode: Optional[Literal["llm", "local"]] = None,
+    background: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    params = {"num_cards": num_cards, **({"mode": mode} if mode else {})}
+    return await dispatch("flashcards", material_id, user_id, params, background)
+
+@router.post("/{material_id}/study-plan")
+async def generate_study_plan(material_id: str, days: int = 7, background: bool = False, user_id: str = Depends(get_current_user)):
+    return await dispatch("study_plan", material_id, user_id, {"days": days}, background)
+
+@router.post("/{material_id}/generate-all")
+async def generate_all(
+    material_id: str,
+    num_questions: int = 10,
+    num_cards: int = 15,
+    days: int = 7,
+    background: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    params = {"num_questions": num_questions, "num_cards": num_cards, "days": days}
+    return await dispatch("all", material_id, user_id, params, background)
+
+@router.get("/{material_id}/summarize/stream")
+async def stream_summary(material_id: str, user_id: str = Depends(get_current_user)):
+    """Stream the summary as SSE `delta` events, then persist it and send `done`."""
+    doc = await get_material_doc(material_id, user_id)
+    content = doc["content"]
+
+    async def events():
+        key_concepts_task = asyncio.ensure_future(run_key_concepts(user_id, content))
+        summary = None
+        try:
+            try:
+                async for event, data in ai_engine.stream_summary(content):
+                    if event == "done":
+                        summary = data
+                    else:
+                        yield sse_event(event, {"text": data})
+                key_concepts = await key_concepts_task
+            except Exception as e:
+                yield sse_event("error", {"detail": str(e)})
+                return
+
+            await db.materials.update_one(
+                {"_id": ObjectId(material_id)},
+                {"$set": artifact_fields({"summary": summary, "key_concepts": key_concepts})}
+            )
+            yield sse_event("done", {"summary": summary, "key_concepts": key_concepts})
+        finally:
+            # Also on client disconnect (GeneratorExit or cancellation), not only on errors.
+            if not key_concepts_task.done():
+                key_concepts_task.cancel()
+
+    return sse_response(events())
+
+@router.get("/{material_id}/study-plan/stream")
+async def stream_study_plan(material_id: str, days: int = 7, user_id: str = Depends(get_current_user)):
+    """Stream the raw study plan as SSE `delta` events, then persist the parsed plan and send `done`."""
+    doc = await get_material_doc(material_id, user_id)
+
+    async def events():
+        study_plan = None
+        try:
+            async for event, data in ai_engine.stream_study_plan(doc["content"], days):
+                if event == "done":
+                    study_plan = data
+                else:
+                    yield sse_event(event, {"text": data})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        await db.materials.update_one(
+            {"_id": ObjectId(material_id)},
+            {"$set": artifact_fields({"study_plan": study_plan})}
+        )
+        yield sse_event("done", {"study_plan": study_plan})
+
+    return sse_response(events())
+
+@router.get("/stats")
+async def get_generation_stats(user_id: str = Depends(require_admin)):
+    return {
+        "cache": generation_cache.stats(),
+        "coalescing": ai_single_flight.stats(),
+        "scheduler": llm_scheduler.stats(),
+        "chunk_store": chunk_store.stats()
+    }
+
+@router.get("/metrics")
+async def get_llm_metrics(user_id: str = Depends(require_admin)):
+    """Per-kind model call latency and token histograms, most expensive kinds first."""
+    return llm_metrics.stats()
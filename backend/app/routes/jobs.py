@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from app.utils.helpers import get_current_user
+from app.services.job_queue import job_queue
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Get the status, and once finished the result, of a background job."""
+    job = await job_queue.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    return {
+        "id": str(job["_id"]),
+        "kind": job["kind"],
+        "material_id": job["material_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat()
+    }
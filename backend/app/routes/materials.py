@@ -1,11 +1,23 @@
+import asyncio
 import os
-import uuid
+import time
+import zipfile
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, status
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
-from app.utils.helpers import get_current_user
+from app.config import settings
+from app.utils.helpers import get_current_user, require_admin, sse_event, sse_response
 from app.services.document_processor import DocumentProcessor
+from app.services.keyphrase_extractor import keyphrase_extractor
+from app.services.material_listing import InvalidCursor, listing_fields, material_listing
+from app.services.chunk_store import chunk_store
+from app.services.content_store import CONTENT_FIELDS, content_store
+from app.services.text_index import INDEX_FIELDS, TextIndex, index_fields, load_index
+from app.services.upload_storage import MB, ArchiveEntry, StoredUpload, UploadTooLarge, upload_storage
+from app.services.extraction_pool import ExtractionBusy, extraction_pool
+from app.services.extraction_cache import extraction_cache
+from app.services.ocr_service import ocr_service
 
 router = APIRouter(prefix="/api/materials", tags=["Materials"])
 
@@ -20,41 +32,94 @@ def set_upload_dir(upload_dir: str):
     global UPLOAD_DIR
     UPLOAD_DIR = upload_dir
 
-@router.post("/upload")
-async def upload_material(
-    file: Optional[UploadFile] = File(None),
-    title: str = Form(...),
-    content: Optional[str] = Form(None),
-    subject: Optional[str] = Form(None),
-    user_id: str = Depends(get_current_user)
-):
-    """Upload study material."""
+def upload_request_limits() -> list:
+    """(method, path, max bytes) for RequestSizeLimit, one entry per upload route."""
+    single = upload_storage.request_limit(DocumentProcessor.FILE_TYPES)
+    return [
+        ("POST", r"/api/materials/upload/?", single),
+        ("PUT", r"/api/materials/[^/]+/?", single),
+        ("POST", r"/api/materials/upload/bulk/?", settings.BULK_UPLOAD_MAX_MB * MB),
+    ]
+
+def build_index(text: str) -> TextIndex:
+    return TextIndex.build(text, settings.AI_CHUNK_TOKENS)
+
+async def material_document(user_id: str, title: str, subject: Optional[str], text: str,
+                            file_type: Optional[str], filename: Optional[str],
+                            stored: Optional[StoredUpload]) -> dict:
+    """A new material document, with its text index and stored content."""
+    index, content = await asyncio.gather(
+        asyncio.to_thread(build_index, text),
+        content_store.prepare(text)
+    )
+    return {
+        "user_id": user_id,
+        "title": title,
+        **content,
+        **await index_fields(index),
+        "subject": subject,
+        "file_type": file_type,
+        "original_filename": filename,
+        "file_size": stored.size if stored else None,
+        "file_sha256": stored.sha256 if stored else None,
+        "created_at": datetime.utcnow(),
+        **listing_fields(text),
+        "summary": None,
+        "key_concepts": None,
+        "flashcards": None,
+        "quizzes": None,
+        "study_plan": None
+    }
+
+async def extract_stored(stored: StoredUpload, file_type: str) -> tuple:
+    """Extract a stored upload through the extraction cache and pool; returns (text, cached)."""
+    return await extraction_cache.extract(
+        stored, file_type, lambda: extraction_pool.process_file(stored.path, file_type)
+    )
+
+async def extract_material(file: Optional[UploadFile], content: Optional[str]) -> tuple:
+    """Store an uploaded file (or take the pasted text).
+
+    Returns (text, file_type, filename, upload, cached), where upload
+    describes the stored file (None for pasted text) and cached tells
+    whether an identical file had already been extracted.
+    """
     extracted_text = ""
     file_type = None
     original_filename = None
+    stored = None
+    cached = False
 
     if file:
         file_ext = file.filename.split(".")[-1].lower()
         file_type = file_ext
         original_filename = file.filename
-        unique_name = f"{uuid.uuid4()}.{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, unique_name)
 
-        with open(file_path, "wb") as f:
-            file_content = await file.read()
-            f.write(file_content)
+        try:
+            stored = await upload_storage.save(file, UPLOAD_DIR, file_ext)
+        except UploadTooLarge as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
 
         try:
-            extracted_text = DocumentProcessor.process_file(file_path, file_ext)
+            extracted_text, cached = await extract_stored(stored, file_ext)
+        except ExtractionBusy as e:
+            upload_storage.remove(stored.path)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "5"}
+            )
         except Exception as e:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            upload_storage.remove(stored.path)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to process file: {str(e)}"
             )
     elif content:
-        extracted_text = DocumentProcessor.process_text(content)
+        extracted_text = await asyncio.to_thread(DocumentProcessor.process_text, content)
         file_type = "text"
     else:
         raise HTTPException(
@@ -68,20 +133,22 @@ async def upload_material(
             detail="No text could be extracted"
         )
 
-    material_doc = {
-        "user_id": user_id,
-        "title": title,
-        "content": extracted_text,
-        "subject": subject,
-        "file_type": file_type,
-        "original_filename": original_filename,
-        "created_at": datetime.utcnow(),
-        "summary": None,
-        "key_concepts": None,
-        "flashcards": None,
-        "quizzes": None,
-        "study_plan": None
-    }
+    return extracted_text, file_type, original_filename, stored, cached
+
+@router.post("/upload")
+async def upload_material(
+    file: Optional[UploadFile] = File(None),
+    title: str = Form(...),
+    content: Optional[str] = Form(None),
+    subject: Optional[str] = Form(None),
+    user_id: str = Depends(get_current_user)
+):
+    """Upload study material."""
+    extracted_text, file_type, original_filename, stored, cached = await extract_material(file, content)
+
+    material_doc = await material_document(
+        user_id, title, subject, extracted_text, file_type, original_filename, stored
+    )
 
     result = await db.materials.insert_one(material_doc)
 
@@ -90,6 +157,11 @@ async def upload_material(
         {"$inc": {"materials_count": 1}}
     )
 
+    try:
+        await keyphrase_extractor.add_document(user_id, extracted_text)
+    except Exception as e:
+        print(f"Term frequency update error: {e}")
+
     return {
         "message": "Material uploaded successfully",
         "material": {
@@ -99,39 +171,210 @@ async def upload_material(
             "subject": subject,
             "file_type": file_type,
             "created_at": material_doc["created_at"].isoformat()
-        }
+        },
+        "upload": {
+            "bytes": stored.size,
+            "sha256": stored.sha256,
+            "elapsed_ms": round(stored.elapsed * 1000, 1),
+            "bytes_per_second": round(stored.bytes_per_second),
+            "extraction_cached": cached
+        } if stored else None
     }
 
-@router.get("/")
-async def get_materials(user_id: str = Depends(get_current_user)):
-    """Get all materials for user."""
-    materials = []
-    cursor = db.materials.find({"user_id": user_id}).sort("created_at", -1)
-
-    async for doc in cursor:
-        materials.append({
-            "id": str(doc["_id"]),
-            "title": doc["title"],
-            "content_preview": doc["content"][:200] + "..." if len(doc["content"]) > 200 else doc["content"],
-            "subject": doc.get("subject"),
-            "file_type": doc.get("file_type"),
-            "created_at": doc["created_at"].isoformat(),
-            "has_summary": doc.get("summary") is not None,
-            "has_flashcards": doc.get("flashcards") is not None,
-            "has_quizzes": doc.get("quizzes") is not None,
-            "has_study_plan": doc.get("study_plan") is not None
+def remove_entries(entries: List[ArchiveEntry]):
+    for entry in entries:
+        if entry.stored is not None:
+            upload_storage.remove(entry.stored.path)
+
+async def receive_uploads(files: List[UploadFile]) -> List[ArchiveEntry]:
+    """Stream each upload to disk, unpacking ZIP archives into their entries.
+
+    At most BULK_UPLOAD_MAX_FILES files are stored across loose files and
+    archives together; the rest are reported as failed entries.
+    """
+    limit = settings.BULK_UPLOAD_MAX_FILES
+    entries = []
+    try:
+        for upload in files:
+            name = upload.filename or "upload"
+            file_type = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+            if file_type != "zip" and file_type not in DocumentProcessor.FILE_TYPES:
+                entries.append(ArchiveEntry(name, file_type, None, "Unsupported file type"))
+                continue
+            remaining = limit - sum(1 for entry in entries if entry.stored)
+            if remaining <= 0:
+                entries.append(ArchiveEntry(name, file_type, None, f"More than {limit} files in one upload"))
+                continue
+            try:
+                stored = await upload_storage.save(upload, UPLOAD_DIR, file_type)
+            except UploadTooLarge as e:
+                entries.append(ArchiveEntry(name, file_type, None, str(e)))
+                continue
+            if file_type != "zip":
+                entries.append(ArchiveEntry(name, file_type, stored))
+                continue
+
+            try:
+                entries.extend(await asyncio.to_thread(
+                    upload_storage.unpack_archive, stored.path, UPLOAD_DIR, DocumentProcessor.FILE_TYPES,
+                    remaining, settings.BULK_ARCHIVE_MAX_MB * MB
+                ))
+            except zipfile.BadZipFile:
+                entries.append(ArchiveEntry(name, file_type, None, "Not a valid ZIP archive"))
+            finally:
+                await asyncio.to_thread(upload_storage.remove, stored.path)
+    except BaseException:
+        remove_entries(entries)
+        raise
+    return entries
+
+async def bulk_upload_events(entries: List[ArchiveEntry], subject: Optional[str], user_id: str):
+    """Extract entries concurrently, then insert their materials together.
+
+    Yields ("file", status) as each entry finishes, then ("done", summary).
+    Every stored entry is removed when the generator finishes or is
+    closed early (a disconnected SSE client); materials keep only the
+    extracted text.
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(settings.BULK_UPLOAD_CONCURRENCY)
+
+    async def process(position: int, entry: ArchiveEntry) -> tuple:
+        result = {"index": position, "filename": entry.name, "status": "failed"}
+        if entry.stored is None:
+            result["error"] = entry.error
+            return result, None, None
+        async with semaphore:
+            item_started = time.perf_counter()
+            try:
+                text, cached = await extract_stored(entry.stored, entry.file_type)
+                if not text.strip():
+                    raise ValueError("No text could be extracted")
+                title = os.path.splitext(os.path.basename(entry.name))[0]
+                doc = await material_document(
+                    user_id, title, subject, text, entry.file_type,
+                    os.path.basename(entry.name), entry.stored
+                )
+            except Exception as e:
+                result["error"] = str(e)
+                return result, None, None
+        result.update({
+            "status": "extracted",
+            "bytes": entry.stored.size,
+            "extraction_cached": cached,
+            "elapsed_ms": round((time.perf_counter() - item_started) * 1000, 1)
         })
+        return result, doc, text
 
-    return {"materials": materials}
+    try:
+        tasks = [asyncio.ensure_future(process(i, entry)) for i, entry in enumerate(entries)]
+        results, docs, texts = [None] * len(entries), [None] * len(entries), [None] * len(entries)
+        try:
+            for completed, future in enumerate(asyncio.as_completed(tasks), 1):
+                result, doc, text = await future
+                position = result["index"]
+                results[position], docs[position], texts[position] = result, doc, text
+                yield "file", {**result, "completed": completed, "total": len(entries)}
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        positions = [i for i, doc in enumerate(docs) if doc is not None]
+        if positions:
+            inserted = await db.materials.insert_many([docs[i] for i in positions])
+            await db.users.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$inc": {"materials_count": len(positions)}}
+            )
+            for i, material_id in zip(positions, inserted.inserted_ids):
+                results[i].update({"status": "uploaded", "id": str(material_id)})
+            try:
+                await keyphrase_extractor.add_documents(user_id, [texts[i] for i in positions])
+            except Exception as e:
+                print(f"Term frequency update error: {e}")
+
+        yield "done", {
+            "uploaded": len(positions),
+            "failed": len(entries) - len(positions),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "files": results
+        }
+    finally:
+        remove_entries(entries)
+
+@router.post("/upload/bulk")
+async def upload_materials_bulk(
+    files: List[UploadFile] = File(...),
+    subject: Optional[str] = Form(None),
+    stream: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    """Upload many files, or ZIP archives of them, as separate materials.
+
+    Files are extracted concurrently and the materials are inserted in one
+    batch; each file gets its own status. With stream=true, progress is
+    sent as SSE `file` events followed by `done`.
+    """
+    if len(files) > settings.BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BULK_UPLOAD_MAX_FILES} files can be uploaded at once"
+        )
+    entries = await receive_uploads(files)
+
+    if stream:
+        async def events():
+            async for event, data in bulk_upload_events(entries, subject, user_id):
+                yield sse_event(event, data)
+        return sse_response(events())
+
+    async for event, data in bulk_upload_events(entries, subject, user_id):
+        if event == "done":
+            summary = data
+    return {"message": f"Uploaded {summary['uploaded']} of {len(entries)} files", **summary}
+
+@router.get("/")
+async def get_materials(
+    subject: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = settings.MATERIALS_PAGE_SIZE,
+    user_id: str = Depends(get_current_user)
+):
+    """Get the user's materials, newest first, a page at a time.
+
+    Pass the returned next_cursor to get the following page; it is null on
+    the last page.
+    """
+    try:
+        materials, next_cursor = await material_listing.page(
+            user_id, subject, cursor, max(1, min(limit, settings.MATERIALS_PAGE_MAX))
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {"materials": materials, "next_cursor": next_cursor}
+
+@router.get("/stats/uploads")
+async def get_upload_stats(user_id: str = Depends(require_admin)):
+    """Upload counts, bytes and streaming throughput, extraction pool load, cache hits, content storage and listing."""
+    return {
+        **upload_storage.stats(),
+        "extraction": extraction_pool.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "ocr": ocr_service.stats(),
+        "content_store": content_store.stats(),
+        "listing": material_listing.stats()
+    }
 
 @router.get("/{material_id}")
 async def get_material(material_id: str, user_id: str = Depends(get_current_user)):
     """Get specific material."""
     try:
-        doc = await db.materials.find_one({
-            "_id": ObjectId(material_id),
-            "user_id": user_id
-        })
+        doc = await db.materials.find_one(
+            {"_id": ObjectId(material_id), "user_id": user_id},
+            {"text_index": 0, "index_blob": 0}
+        )
     except Exception:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
 
@@ -141,7 +384,7 @@ async def get_material(material_id: str, user_id: str = Depends(get_current_user
     return {
         "id": str(doc["_id"]),
         "title": doc["title"],
-        "content": doc["content"],
+        "content": await content_store.load(doc),
         "subject": doc.get("subject"),
         "file_type": doc.get("file_type"),
         "original_filename": doc.get("original_filename"),
@@ -153,18 +396,102 @@ async def get_material(material_id: str, user_id: str = Depends(get_current_user
         "study_plan": doc.get("study_plan")
     }
 
+@router.put("/{material_id}")
+async def update_material(
+    material_id: str,
+    file: Optional[UploadFile] = File(None),
+    content: Optional[str] = Form(None),
+    title: Optional[str] = Form(None),
+    subject: Optional[str] = Form(None),
+    user_id: str = Depends(get_current_user)
+):
+    """Replace a material's content with an edited text or a re-uploaded file.
+
+    Generated artifacts are cleared; regenerating them only sends the
+    chunks whose content changed to the model.
+    """
+    try:
+        doc = await db.materials.find_one(
+            {"_id": ObjectId(material_id), "user_id": user_id},
+            {**CONTENT_FIELDS, **INDEX_FIELDS, "chunk_manifest": 1}
+        )
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
+
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
+
+    extracted_text, file_type, original_filename, stored, _ = await extract_material(file, content)
+    old_text = await content_store.load(doc)
+    old_index = await load_index(doc)
+    if old_index is not None and old_index.chunk_tokens == settings.AI_CHUNK_TOKENS:
+        old_hashes = old_index.chunk_hashes()
+    elif doc.get("chunk_manifest"):
+        # Materials uploaded before the text index stored a list of chunk entries.
+        old_hashes = [entry["hash"] for entry in doc["chunk_manifest"]]
+    else:
+        old_hashes = (await asyncio.to_thread(build_index, old_text)).chunk_hashes()
+    index, content_fields = await asyncio.gather(
+        asyncio.to_thread(build_index, extracted_text),
+        content_store.prepare(extracted_text)
+    )
+    hashes = index.chunk_hashes()
+    changed = chunk_store.changed(old_hashes, hashes)
+
+    update = {
+        **content_fields,
+        **await index_fields(index),
+        "file_type": file_type,
+        "original_filename": original_filename,
+        "file_size": stored.size if stored else None,
+        "file_sha256": stored.sha256 if stored else None,
+        "updated_at": datetime.utcnow(),
+        **listing_fields(extracted_text),
+        "summary": None,
+        "key_concepts": None,
+        "flashcards": None,
+        "quizzes": None,
+        "study_plan": None
+    }
+    if title:
+        update["title"] = title
+    if subject is not None:
+        update["subject"] = subject
+    await db.materials.update_one({"_id": doc["_id"]}, {"$set": update, "$unset": {"chunk_manifest": ""}})
+
+    try:
+        await chunk_store.prune(material_id, hashes)
+    except Exception as e:
+        print(f"Chunk store prune error: {e}")
+
+    try:
+        await content_store.release(doc)
+    except Exception as e:
+        print(f"Content store release error: {e}")
+
+    try:
+        await keyphrase_extractor.replace_document(user_id, old_text, extracted_text)
+    except Exception as e:
+        print(f"Term frequency update error: {e}")
+
+    return {
+        "message": "Material updated successfully",
+        "chunks": len(hashes),
+        "changed_chunks": changed
+    }
+
 @router.delete("/{material_id}")
 async def delete_material(material_id: str, user_id: str = Depends(get_current_user)):
     """Delete a material."""
     try:
-        result = await db.materials.delete_one({
-            "_id": ObjectId(material_id),
-            "user_id": user_id
-        })
+        doc = await db.materials.find_one_and_delete(
+            {"_id": ObjectId(material_id), "user_id": user_id},
+            projection={**CONTENT_FIELDS, "index_blob": 1}
+        )
     except Exception:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
 
-    if result.deleted_count == 0:
+    if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
 
     await db.users.update_one(
@@ -172,4 +499,19 @@ async def delete_material(material_id: str, user_id: str = Depends(get_current_u
         {"$inc": {"materials_count": -1}}
     )
 
+    try:
+        await keyphrase_extractor.remove_document(user_id, await content_store.load(doc))
+    except Exception as e:
+        print(f"Term frequency update error: {e}")
+
+    try:
+        await content_store.release(doc)
+    except Exception as e:
+        print(f"Content store release error: {e}")
+
+    try:
+        await chunk_store.delete(material_id)
+    except Exception as e:
+        print(f"Chunk store delete error: {e}")
+
     return {"message": "Material deleted successfully"}
@@ -1,50 +1,204 @@
-import json
-import re
-from typing import Optional, List
-import google.generativeai as genai
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Optional, List
 from app.config import settings
+from app.models.generation import QuizQuestion, Flashcard, StudyPlan
+from app.services import response_parser
+from app.services.chunk_store import chunk_store, current_material
+from app.services.chunking import Chunk, chunk_hash, chunk_text, allocate_counts, estimate_tokens
+from app.services.generation_cache import generation_cache
+from app.services.keyphrase_extractor import keyphrase_extractor
+from app.services.llm_metrics import CallRecord, llm_metrics
+from app.services.llm_provider import LLMProvider, LLMResponse, llm_provider
+from app.services.llm_scheduler import llm_scheduler
+from app.services.local_quiz import local_quiz_generator
+from app.services.local_summarizer import local_summarizer
+from app.services.text_index import current_index
+
+_fallbacks: ContextVar[Optional[list]] = ContextVar("ai_fallbacks", default=None)
+
+
+@contextmanager
+def record_fallbacks():
+    """Collect {"kind", "reason"} for everything served offline in the enclosed block."""
+    recorded = []
+    token = _fallbacks.set(recorded)
+    try:
+        yield recorded
+    finally:
+        _fallbacks.reset(token)
 
 
 class AIEngine:
-    """AI-powered content generation engine using Google Gemini."""
+    """AI-powered content generation engine on top of a pluggable LLM provider."""
 
-    def __init__(self):
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-        else:
-            self.model = None
-
-    def _safe_parse_json(self, text: str) -> dict | list:
-        """Safely parse JSON from AI response, handling markdown code blocks."""
-        # Remove markdown code blocks if present
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:]
-        elif text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        self.provider = provider
+        self.model_name = provider.model_name if provider else settings.GEMINI_MODEL
 
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # Try to find JSON in the response
-            json_match = re.search(r'[\[{].*[\]}]', text, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    pass
-            return {}
+    def _cache_key(self, kind: str, material: str, params: Optional[dict] = None) -> str:
+        """Cache key for a generation over the given material."""
+        return generation_cache.make_key(self.model_name, kind, material, params)
+
+    @staticmethod
+    def _parse_quiz(text: str) -> list:
+        return response_parser.parse_items(text, QuizQuestion)
+
+    @staticmethod
+    def _parse_flashcards(text: str) -> list:
+        return response_parser.parse_items(text, Flashcard)
+
+    @staticmethod
+    def _parse_study_plan(text: str) -> Optional[dict]:
+        return response_parser.parse_object(text, StudyPlan)
 
-    async def generate_summary(self, text: str) -> str:
-        """Generate a concise summary of the given text."""
-        if not self.model:
-            return self._fallback_summary(text)
+    @staticmethod
+    def _parse_key_concepts(text: str) -> list:
+        return response_parser.parse_strings(text)
 
-        prompt = f"""You are an expert academic summarizer. Create a comprehensive yet concise summary of the following study material.
+    async def _call_model(self, prompt: str, kind: str, call: CallRecord) -> LLMResponse:
+        """Send a prompt through the admission scheduler, recording it on call."""
+        tokens = estimate_tokens(prompt) + settings.LLM_OUTPUT_TOKEN_ESTIMATE
+        try:
+            response = await llm_scheduler.run(call.attempt(lambda: self.provider.generate(prompt, kind)), tokens)
+        except Exception as e:
+            call.failed("error", e)
+            raise
+        call.completed(response.text, response.prompt_tokens, response.response_tokens)
+        return response
+
+    def _count_fallback(self, kind: str, reason: Optional[str]):
+        """Record that kind was served offline; reason None means the caller asked for it."""
+        if reason:
+            reason = reason if self.provider else "no_provider"
+            llm_metrics.fallback(kind, reason)
+            recorded = _fallbacks.get()
+            if recorded is not None:
+                recorded.append({"kind": kind, "reason": reason})
+
+    async def _generate_text(self, kind: str, material: str, prompt: str,
+                             params: Optional[dict] = None) -> Optional[str]:
+        """Run a prompt whose answer is free text. Returns None on failure."""
+        cache_key = self._cache_key(kind, material, params)
+        cached = await generation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with llm_metrics.track(kind, self.provider, prompt) as call:
+            try:
+                response = await self._call_model(prompt, kind, call)
+            except Exception as e:
+                print(f"LLM API error ({kind}): {e}")
+                return None
+        await generation_cache.set(cache_key, response.text)
+        return response.text
+
+    async def _generate_json(self, kind: str, material: str, prompt: str,
+                             parse: Callable[[str], Optional[dict | list]],
+                             params: Optional[dict] = None) -> Optional[dict | list]:
+        """Run a prompt whose answer is JSON and validate it with parse. Returns None on failure."""
+        cache_key = self._cache_key(kind, material, params)
+        cached = await generation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with llm_metrics.track(kind, self.provider, prompt) as call:
+            try:
+                response = await self._call_model(prompt, kind, call)
+            except Exception as e:
+                print(f"LLM API error ({kind}): {e}")
+                return None
+            result = parse(response.text)
+            if not result:
+                call.failed("invalid_response")
+                return None
+        await generation_cache.set(cache_key, result)
+        return result
+
+    async def _map_chunks(self, kind: str, chunks: List[Chunk], generate,
+                          timings: Optional[list] = None) -> list:
+        """Run generate(chunk) for every chunk under a bounded semaphore, preserving order."""
+        semaphore = asyncio.Semaphore(settings.AI_CHUNK_CONCURRENCY)
+
+        async def run(chunk: Chunk):
+            async with semaphore:
+                started = time.perf_counter()
+                result = await generate(chunk)
+                if timings is not None:
+                    timings.append({
+                        "kind": kind,
+                        "chunk": chunk.index,
+                        "tokens": chunk.tokens,
+                        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                        "ok": result is not None,
+                    })
+                return result
+
+        return await asyncio.gather(*(run(chunk) for chunk in chunks))
+
+    async def _map_stored(self, kind: str, chunks: List[Chunk], generate,
+                          timings: Optional[list] = None, counts: Optional[List[int]] = None) -> list:
+        """_map_chunks that reuses the current material's stored results for unchanged chunks.
+
+        A stored list of items is reused when it holds at least the number
+        of items now requested for its chunk (counts), and is trimmed to it.
+        """
+        material_id = current_material()
+        if material_id is None:
+            return await self._map_chunks(kind, chunks, generate, timings)
+
+        version = f"{self.model_name}:{settings.PROMPT_VERSION}"
+        hashes = [chunk_hash(c.text) for c in chunks]
+        stored = await chunk_store.load(material_id, kind, version, hashes)
+
+        results = [None] * len(chunks)
+        missing = []
+        for position, (chunk, digest) in enumerate(zip(chunks, hashes)):
+            piece = stored.get(digest)
+            needed = counts[chunk.index] if counts else None
+            if piece is not None and (needed is None or (piece["count"] or 0) >= needed):
+                results[position] = piece["value"][:needed] if needed else piece["value"]
+            else:
+                missing.append(position)
+        chunk_store.reused += len(chunks) - len(missing)
+
+        generated = await self._map_chunks(kind, [chunks[i] for i in missing], generate, timings)
+        fresh = {}
+        for position, value in zip(missing, generated):
+            results[position] = value
+            if value:
+                fresh[hashes[position]] = (value, counts[chunks[position].index] if counts else None)
+        await chunk_store.save(material_id, kind, version, fresh)
+        return results
+
+    def _chunks(self, text: str) -> List[Chunk]:
+        index = current_index(text, settings.AI_CHUNK_TOKENS)
+        if index is not None:
+            return index.chunk_list(text)
+        return chunk_text(text, settings.AI_CHUNK_TOKENS)
+
+    @staticmethod
+    def _dedupe(items: list, field: str, limit: int) -> list:
+        """Drop items whose field repeats (case-insensitively) and cap the list."""
+        seen = set()
+        unique = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            marker = str(item.get(field, "")).strip().lower()
+            if not marker or marker in seen:
+                continue
+            seen.add(marker)
+            unique.append(item)
+        return unique[:limit]
+
+    # ---- Prompts ----
+
+    @staticmethod
+    def _summary_prompt(material: str) -> str:
+        return f"""You are an expert academic summarizer. Create a comprehensive yet concise summary of the following study material.
 
 The summary should:
 1. Capture all key concepts and main ideas
@@ -54,23 +208,38 @@ The summary should:
 5. Be around 300-500 words
 
 Study Material:
-{text[:8000]}
+{material}
 
 Provide the summary in clean markdown format."""
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return self._fallback_summary(text)
+    @staticmethod
+    def _chunk_summary_prompt(material: str) -> str:
+        return f"""You are an expert academic summarizer. The following is one section of a longer study material.
 
-    async def generate_quiz(self, text: str, num_questions: int = 10) -> list:
-        """Generate quiz questions from the study material."""
-        if not self.model:
-            return self._fallback_quiz(text)
+Summarize this section in 100-200 words of markdown bullet points, keeping every key concept, definition and important detail. Highlight key terms in **bold**. Do not add an introduction or conclusion.
 
-        prompt = f"""You are an expert quiz creator for academic content. Generate exactly {num_questions} quiz questions from the following study material.
+Section:
+{material}"""
+
+    @staticmethod
+    def _merge_summary_prompt(partials: str) -> str:
+        return f"""You are an expert academic summarizer. Below are summaries of consecutive sections of one study material.
+
+Merge them into a single comprehensive yet concise summary that:
+1. Captures all key concepts and main ideas across every section
+2. Is organized with clear headings using markdown (##)
+3. Includes bullet points for important details
+4. Highlights key terms in **bold**
+5. Is around 300-500 words
+
+Section Summaries:
+{partials}
+
+Provide the summary in clean markdown format."""
+
+    @staticmethod
+    def _quiz_prompt(material: str, num_questions: int) -> str:
+        return f"""You are an expert quiz creator for academic content. Generate exactly {num_questions} quiz questions from the following study material.
 
 Create a mix of:
 - Multiple Choice Questions (MCQ) with 4 options
@@ -101,26 +270,13 @@ Return ONLY a valid JSON array with this exact format:
 ]
 
 Study Material:
-{text[:8000]}
+{material}
 
 Return ONLY valid JSON, no other text."""
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            result = self._safe_parse_json(response.text)
-            if isinstance(result, list):
-                return result
-            return self._fallback_quiz(text)
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return self._fallback_quiz(text)
-
-    async def generate_flashcards(self, text: str, num_cards: int = 15) -> list:
-        """Generate flashcards from the study material."""
-        if not self.model:
-            return self._fallback_flashcards(text)
-
-        prompt = f"""You are an expert educator. Create exactly {num_cards} flashcards from the following study material.
+    @staticmethod
+    def _flashcards_prompt(material: str, num_cards: int) -> str:
+        return f"""You are an expert educator. Create exactly {num_cards} flashcards from the following study material.
 
 Each flashcard should have:
 - A clear, concise front (question/term)
@@ -136,26 +292,13 @@ Return ONLY a valid JSON array with this format:
 ]
 
 Study Material:
-{text[:8000]}
+{material}
 
 Return ONLY valid JSON, no other text."""
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            result = self._safe_parse_json(response.text)
-            if isinstance(result, list):
-                return result
-            return self._fallback_flashcards(text)
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return self._fallback_flashcards(text)
-
-    async def generate_study_plan(self, text: str, available_days: int = 7) -> dict:
-        """Generate a personalized study plan from the material."""
-        if not self.model:
-            return self._fallback_study_plan(text)
-
-        prompt = f"""You are an expert academic planner. Create a detailed {available_days}-day study plan based on the following material.
+    @staticmethod
+    def _study_plan_prompt(material: str, available_days: int) -> str:
+        return f"""You are an expert academic planner. Create a detailed {available_days}-day study plan based on the following material.
 
 The plan should:
 1. Break content into manageable daily topics
@@ -185,57 +328,348 @@ Return ONLY a valid JSON object with this format:
 }}
 
 Study Material:
-{text[:8000]}
+{material}
 
 Return ONLY valid JSON, no other text."""
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            result = self._safe_parse_json(response.text)
-            if isinstance(result, dict):
-                return result
-            return self._fallback_study_plan(text)
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return self._fallback_study_plan(text)
-
-    async def extract_key_concepts(self, text: str) -> list:
-        """Extract key concepts and topics from the text."""
-        if not self.model:
-            return self._fallback_key_concepts(text)
-
-        prompt = f"""Extract the top 10-15 key concepts, terms, and topics from this study material.
-
+    @staticmethod
+    def _key_concepts_prompt(material: str, hints: Optional[list] = None) -> str:
+        guide = ""
+        if hints:
+            guide = ("\nCandidate terms ranked by how distinctive they are for this material "
+                     "(use them as a guide; drop any that are not real concepts): "
+                     + ", ".join(hints) + "\n")
+        return f"""Extract the top 10-15 key concepts, terms, and topics from this study material.
+{guide}
 Return ONLY a valid JSON array of strings:
 ["Concept 1", "Concept 2", "Concept 3"]
 
 Study Material:
-{text[:6000]}
+{material}
 
 Return ONLY valid JSON, no other text."""
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            result = self._safe_parse_json(response.text)
-            if isinstance(result, list):
-                return result
-            return self._fallback_key_concepts(text)
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return self._fallback_key_concepts(text)
+    # ---- Generation ----
+
+    async def generate_summary(self, text: str, timings: Optional[list] = None,
+                               mode: Optional[str] = None) -> str:
+        """Generate a concise summary of the given text.
+
+        Long materials are summarized section by section and the section
+        summaries are merged in a reduce pass. mode="local" (or
+        AI_SUMMARY_MODE=local) uses the offline extractive summarizer instead.
+        """
+        if (mode or settings.AI_SUMMARY_MODE) == "local":
+            return await asyncio.to_thread(local_summarizer.summarize, text)
+        if not self.provider:
+            return await self._fallback_summary(text)
+
+        chunks = self._chunks(text)
+        if len(chunks) <= 1:
+            summary = await self._generate_text("summary", text, self._summary_prompt(text))
+            return summary or await self._fallback_summary(text)
+
+        partials = await self._map_stored(
+            "summary", chunks,
+            lambda c: self._generate_text("chunk_summary", c.text, self._chunk_summary_prompt(c.text)),
+            timings,
+        )
+        partials = [p for p in partials if p]
+        if not partials:
+            return await self._fallback_summary(text)
+
+        summary = await self._reduce_summaries(partials)
+        return summary or await self._fallback_summary(text)
+
+    async def _condense_summaries(self, partials: List[str]) -> Optional[List[str]]:
+        """Merge section summaries in rounds until they fit one merge prompt."""
+        while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > settings.AI_REDUCE_TOKENS:
+            groups, group, size = [], [], 0
+            for partial in partials:
+                tokens = estimate_tokens(partial)
+                if group and size + tokens > settings.AI_REDUCE_TOKENS:
+                    groups.append(group)
+                    group, size = [], 0
+                group.append(partial)
+                size += tokens
+            groups.append(group)
+            if len(groups) == len(partials):
+                # Each summary alone fills the budget; merging cannot shrink the input further.
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+
+            semaphore = asyncio.Semaphore(settings.AI_CHUNK_CONCURRENCY)
+
+            async def merge(group: List[str]):
+                async with semaphore:
+                    joined_group = "\n\n".join(group)
+                    return await self._generate_text(
+                        "summary_merge", joined_group, self._merge_summary_prompt(joined_group)
+                    )
+
+            merged = await asyncio.gather(*(merge(g) for g in groups))
+            partials = [m for m in merged if m]
+            if not partials:
+                return None
+        return partials
+
+    async def _reduce_summaries(self, partials: List[str]) -> Optional[str]:
+        """Merge section summaries, in several rounds if they exceed one prompt budget."""
+        partials = await self._condense_summaries(partials)
+        if not partials:
+            return None
+        joined = "\n\n".join(partials)
+        return await self._generate_text("summary_merge", joined, self._merge_summary_prompt(joined))
+
+    # ---- Streaming ----
+
+    async def _stream_text(self, kind: str, material: str, prompt: str,
+                           cached_text: bool = True) -> AsyncIterator[str]:
+        """Stream a model answer piece by piece.
+
+        With cached_text the complete answer is served from and stored in
+        the generation cache. Yields nothing if the call fails before the
+        first piece arrives; failures after that are raised to the caller.
+        """
+        cache_key = self._cache_key(kind, material)
+        if cached_text:
+            cached = await generation_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        pieces = []
+        tokens = estimate_tokens(prompt) + settings.LLM_OUTPUT_TOKEN_ESTIMATE
+        with llm_metrics.track(kind, self.provider, prompt, stream=True) as call:
+            async with llm_scheduler.slot(tokens):
+                call.attempts += 1
+                started = time.perf_counter()
+                try:
+                    async for piece in self.provider.stream(prompt, kind):
+                        pieces.append(piece)
+                        yield piece
+                except Exception as e:
+                    print(f"LLM API error ({kind}): {e}")
+                    call.failed("error", e)
+                    if pieces:
+                        raise
+                    return
+                finally:
+                    call.model_ms += (time.perf_counter() - started) * 1000
+            call.completed("".join(pieces))
+
+        if cached_text and pieces:
+            await generation_cache.set(cache_key, "".join(pieces))
+
+    async def stream_summary(self, text: str) -> AsyncIterator[tuple]:
+        """Stream a summary as ("delta", text) events followed by ("done", summary)."""
+        if not self.provider:
+            summary = await self._fallback_summary(text)
+            yield "delta", summary
+            yield "done", summary
+            return
+
+        chunks = self._chunks(text)
+        if len(chunks) <= 1:
+            kind, material, prompt = "summary", text, self._summary_prompt(text)
+        else:
+            partials = await self._map_stored(
+                "summary", chunks,
+                lambda c: self._generate_text("chunk_summary", c.text, self._chunk_summary_prompt(c.text)),
+            )
+            partials = await self._condense_summaries([p for p in partials if p])
+            if not partials:
+                summary = await self._fallback_summary(text)
+                yield "delta", summary
+                yield "done", summary
+                return
+            material = "\n\n".join(partials)
+            kind, prompt = "summary_merge", self._merge_summary_prompt(material)
+
+        pieces = []
+        async for piece in self._stream_text(kind, material, prompt):
+            pieces.append(piece)
+            yield "delta", piece
+
+        if not pieces:
+            summary = await self._fallback_summary(text)
+            yield "delta", summary
+            yield "done", summary
+            return
+        yield "done", "".join(pieces)
+
+    async def stream_study_plan(self, text: str, available_days: int = 7) -> AsyncIterator[tuple]:
+        """Stream a study plan as raw ("delta", text) events followed by ("done", plan)."""
+        if not self.provider:
+            plan = self._fallback_study_plan(text)
+            yield "done", plan
+            return
+
+        material = text
+        if len(self._chunks(text)) > 1:
+            material = await self.generate_summary(text)
+
+        params = {"days": available_days}
+        cache_key = self._cache_key("study_plan", material, params)
+        cached = await generation_cache.get(cache_key)
+        if cached is not None:
+            yield "done", cached
+            return
+
+        pieces = []
+        prompt = self._study_plan_prompt(material, available_days)
+        async for piece in self._stream_text("study_plan", material, prompt, cached_text=False):
+            pieces.append(piece)
+            yield "delta", piece
+
+        plan = self._parse_study_plan("".join(pieces)) if pieces else None
+        if plan:
+            await generation_cache.set(cache_key, plan)
+            yield "done", plan
+        else:
+            yield "done", self._fallback_study_plan(text)
+
+    async def generate_quiz(self, text: str, num_questions: int = 10,
+                            timings: Optional[list] = None, mode: Optional[str] = None) -> list:
+        """Generate quiz questions from the study material.
+
+        mode="local" builds them offline from the material (see LocalQuizGenerator).
+        """
+        if mode == "local" or not self.provider:
+            return await self._fallback_quiz(text, num_questions, None if mode == "local" else "no_provider")
+
+        chunks = self._chunks(text)
+        if len(chunks) <= 1:
+            result = await self._generate_json(
+                "quiz", text, self._quiz_prompt(text, num_questions), self._parse_quiz,
+                {"num_questions": num_questions},
+            )
+            return result or await self._fallback_quiz(text, num_questions)
+
+        counts = allocate_counts(num_questions, chunks)
+        selected = [c for c, n in zip(chunks, counts) if n > 0]
+        results = await self._map_stored(
+            "quiz", selected,
+            lambda c: self._generate_json(
+                "quiz", c.text, self._quiz_prompt(c.text, counts[c.index]), self._parse_quiz,
+                {"num_questions": counts[c.index]},
+            ),
+            timings, counts,
+        )
+        questions = [q for r in results if r for q in r]
+        questions = self._dedupe(questions, "question", num_questions)
+        return questions or await self._fallback_quiz(text, num_questions)
+
+    async def generate_flashcards(self, text: str, num_cards: int = 15,
+                                  timings: Optional[list] = None, mode: Optional[str] = None) -> list:
+        """Generate flashcards from the study material.
+
+        mode="local" builds them offline from the material (see LocalQuizGenerator).
+        """
+        if mode == "local" or not self.provider:
+            return await self._fallback_flashcards(text, num_cards, None if mode == "local" else "no_provider")
+
+        chunks = self._chunks(text)
+        if len(chunks) <= 1:
+            result = await self._generate_json(
+                "flashcards", text, self._flashcards_prompt(text, num_cards), self._parse_flashcards,
+                {"num_cards": num_cards},
+            )
+            return result or await self._fallback_flashcards(text, num_cards)
+
+        counts = allocate_counts(num_cards, chunks)
+        selected = [c for c, n in zip(chunks, counts) if n > 0]
+        results = await self._map_stored(
+            "flashcards", selected,
+            lambda c: self._generate_json(
+                "flashcards", c.text, self._flashcards_prompt(c.text, counts[c.index]), self._parse_flashcards,
+                {"num_cards": counts[c.index]},
+            ),
+            timings, counts,
+        )
+        cards = [card for r in results if r for card in r]
+        cards = self._dedupe(cards, "front", num_cards)
+        return cards or await self._fallback_flashcards(text, num_cards)
+
+    async def generate_study_plan(self, text: str, available_days: int = 7,
+                                  timings: Optional[list] = None,
+                                  summary: Optional[Awaitable[str]] = None) -> dict:
+        """Generate a personalized study plan from the material.
+
+        Long materials are planned from their merged summary so every
+        section is represented; pass summary when one is already being
+        generated so the map-reduce does not run twice.
+        """
+        if not self.provider:
+            return self._fallback_study_plan(text)
 
-    # ---- Fallback methods (when API key is not available) ----
+        material = text
+        if len(self._chunks(text)) > 1:
+            material = await summary if summary is not None else await self.generate_summary(text, timings)
+
+        result = await self._generate_json(
+            "study_plan", material, self._study_plan_prompt(material, available_days), self._parse_study_plan,
+            {"days": available_days},
+        )
+        return result or self._fallback_study_plan(text)
+
+    async def extract_key_concepts(self, text: str, timings: Optional[list] = None,
+                                   hints: Optional[list] = None, mode: Optional[str] = None) -> list:
+        """Extract key concepts and topics from the text.
+
+        hints are statistically ranked candidates (see KeyphraseExtractor) that
+        focus the prompt; mode="local" returns them without calling the model.
+        """
+        if mode == "local" or not self.provider:
+            return self._fallback_key_concepts(text, hints, None if mode == "local" else "no_provider")
+
+        chunks = self._chunks(text)
+        if len(chunks) <= 1:
+            result = await self._generate_json(
+                "key_concepts", text, self._key_concepts_prompt(text, hints), self._parse_key_concepts,
+                {"hints": hints or []},
+            )
+            return result or self._fallback_key_concepts(text, hints)
+
+        def chunk_hints(chunk: Chunk) -> list:
+            lowered = chunk.text.lower()
+            return [hint for hint in hints or [] if hint.lower() in lowered]
+
+        results = await self._map_chunks(
+            "key_concepts", chunks,
+            lambda c: self._generate_json(
+                "key_concepts", c.text, self._key_concepts_prompt(c.text, chunk_hints(c)),
+                self._parse_key_concepts, {"hints": chunk_hints(c)},
+            ),
+            timings,
+        )
+        # Rank concepts by how many sections mention them, then by first appearance.
+        ranked = {}
+        for position, result in enumerate(r for r in results if r):
+            for concept in result:
+                if not isinstance(concept, str) or not concept.strip():
+                    continue
+                marker = concept.strip().lower()
+                if marker not in ranked:
+                    ranked[marker] = [concept.strip(), 0, position]
+                ranked[marker][1] += 1
+        concepts = sorted(ranked.values(), key=lambda entry: (-entry[1], entry[2]))
+        return [entry[0] for entry in concepts[:settings.AI_MAX_KEY_CONCEPTS]] or \
+            self._fallback_key_concepts(text, hints)
 
-    def _fallback_summary(self, text: str) -> str:
-        """Generate a basic summary without AI."""
-        sentences = text.split('.')
-        key_sentences = sentences[:min(10, len(sentences))]
-        summary = '. '.join(s.strip() for s in key_sentences if s.strip())
-        return f"## Summary\n\n{summary}.\n\n*Note: This is a basic summary. Configure your Gemini API key for AI-powered summaries.*"
+    # ---- Fallback methods (when API key is not available) ----
 
-    def _fallback_quiz(self, text: str) -> list:
-        """Generate basic quiz without AI."""
-        return [
+    async def _fallback_summary(self, text: str, reason: Optional[str] = "generation_failed") -> str:
+        """Generate an extractive summary without AI."""
+        self._count_fallback("summary", reason)
+        summary = await asyncio.to_thread(local_summarizer.summarize, text)
+        return f"{summary}\n\n*Note: This is an extractive summary generated offline. Configure your Gemini API key for AI-powered summaries.*"
+
+    async def _fallback_quiz(self, text: str, num_questions: int = 10,
+                             reason: Optional[str] = "generation_failed") -> list:
+        """Generate cloze, true/false and definition questions from the material without AI."""
+        self._count_fallback("quiz", reason)
+        questions = await asyncio.to_thread(local_quiz_generator.quiz, text, num_questions)
+        return questions or [
             {
                 "type": "short_answer",
                 "question": "Summarize the main topic of this study material.",
@@ -250,8 +684,13 @@ Return ONLY valid JSON, no other text."""
             }
         ]
 
-    def _fallback_flashcards(self, text: str) -> list:
-        """Generate basic flashcards without AI."""
+    async def _fallback_flashcards(self, text: str, num_cards: int = 15,
+                                   reason: Optional[str] = "generation_failed") -> list:
+        """Generate term-definition and cloze flashcards from the material without AI."""
+        self._count_fallback("flashcards", reason)
+        cards = await asyncio.to_thread(local_quiz_generator.flashcards, text, num_cards)
+        if cards:
+            return cards
         words = text.split()
         return [
             {
@@ -261,8 +700,9 @@ Return ONLY valid JSON, no other text."""
             }
         ]
 
-    def _fallback_study_plan(self, text: str) -> dict:
+    def _fallback_study_plan(self, text: str, reason: Optional[str] = "generation_failed") -> dict:
         """Generate basic study plan without AI."""
+        self._count_fallback("study_plan", reason)
         return {
             "title": "Study Plan",
             "total_days": 7,
@@ -283,13 +723,12 @@ Return ONLY valid JSON, no other text."""
             "recommended_resources": ["Your uploaded material"]
         }
 
-    def _fallback_key_concepts(self, text: str) -> list:
-        """Extract basic key concepts without AI."""
-        words = text.split()
-        # Get unique longer words as potential key terms
-        key_words = list(set(w.strip('.,;:!?') for w in words if len(w) > 6))
-        return key_words[:10] if key_words else ["General concepts"]
+    def _fallback_key_concepts(self, text: str, hints: Optional[list] = None,
+                               reason: Optional[str] = "generation_failed") -> list:
+        """Use the ranked hints, or extract key concepts without AI by TF-IDF within the text."""
+        self._count_fallback("key_concepts", reason)
+        return hints or keyphrase_extractor.extract(text) or ["General concepts"]
 
 
 # Singleton instance
-ai_engine = AIEngine()
+ai_engine = AIEngine(llm_provider)
@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.services.text_index import TextIndex, index_scope
+
+_current_material: ContextVar[Optional[str]] = ContextVar("chunk_store_material", default=None)
+
+
+@contextmanager
+def material_scope(material_id: str, index: Optional[TextIndex] = None):
+    """Let generations in the enclosed block reuse and store this material's chunk
+    results, and use its stored text index."""
+    token = _current_material.set(material_id)
+    try:
+        with index_scope(index):
+            yield
+    finally:
+        _current_material.reset(token)
+
+
+def current_material() -> Optional[str]:
+    return _current_material.get()
+
+
+class ChunkStore:
+    """Per-material results of chunk-level generations, keyed by chunk content hash.
+
+    When a material is edited, unchanged chunks keep their hash, so their
+    summaries, questions and flashcards are reused and only the changed
+    chunks go back to the model.
+    """
+
+    def __init__(self):
+        self.collection = None
+        self.reused = 0
+        self.stored = 0
+
+    def set_db(self, database):
+        self.collection = database.material_chunks if database is not None else None
+
+    @staticmethod
+    def changed(old_hashes: List[str], new_hashes: List[str]) -> List[int]:
+        """Indexes of new chunks whose content is not among the old ones."""
+        known = set(old_hashes)
+        return [i for i, digest in enumerate(new_hashes) if digest not in known]
+
+    async def load(self, material_id: str, kind: str, version: str, hashes: List[str]) -> Dict[str, dict]:
+        """Return {hash: {"value", "count"}} for the stored results of these chunks."""
+        if self.collection is None or not hashes:
+            return {}
+        try:
+            cursor = self.collection.find(
+                {"material_id": material_id, "kind": kind, "version": version, "hash": {"$in": hashes}},
+                {"_id": 0, "hash": 1, "value": 1, "count": 1},
+            )
+            return {doc["hash"]: doc async for doc in cursor}
+        except Exception as e:
+            print(f"Chunk store read error: {e}")
+            return {}
+
+    async def save(self, material_id: str, kind: str, version: str, pieces: Dict[str, tuple]):
+        """Store {hash: (value, count)} results for a material's chunks."""
+        if self.collection is None or not pieces:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"material_id": material_id, "kind": kind, "version": version, "hash": digest},
+                {"$set": {"value": value, "count": count, "updated_at": now}},
+                upsert=True,
+            )
+            for digest, (value, count) in pieces.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+            self.stored += len(operations)
+        except Exception as e:
+            print(f"Chunk store write error: {e}")
+
+    async def prune(self, material_id: str, keep: List[str]):
+        """Drop stored results for chunks that are no longer part of the material."""
+        if self.collection is None:
+            return
+        await self.collection.delete_many({"material_id": material_id, "hash": {"$nin": keep}})
+
+    async def delete(self, material_id: str):
+        if self.collection is None:
+            return
+        await self.collection.delete_many({"material_id": material_id})
+
+    def stats(self) -> dict:
+        return {"reused": self.reused, "stored": self.stored}
+
+
+chunk_store = ChunkStore()
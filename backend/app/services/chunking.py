@@ -0,0 +1,106 @@
+import hashlib
+import zlib
+from typing import List, NamedTuple, Optional
+
+from app.services.document_processor import DocumentProcessor
+
+# Rough average for English prose; good enough for budgeting prompts.
+CHARS_PER_TOKEN = 4
+# Content-defined boundaries: once a chunk is this full, it ends after any
+# sentence whose hash is divisible by BOUNDARY_PERIOD.
+BOUNDARY_MIN_FILL = 0.75
+BOUNDARY_PERIOD = 4
+
+
+class Chunk(NamedTuple):
+    index: int
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in a piece of text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash identifying a chunk across edits of its material."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_long_span(start: int, end: int, max_chars: int) -> List[tuple]:
+    """Hard-split a single sentence that is larger than the chunk budget."""
+    return [(s, min(s + max_chars, end)) for s in range(start, end, max_chars)]
+
+
+def chunk_spans(text: str, max_tokens: int, sentences: Optional[List[tuple]] = None) -> List[tuple]:
+    """(start, end) offsets of the chunks chunk_text builds; sentences are
+    DocumentProcessor.sentence_spans(text) when already known."""
+    if not text or not text.strip():
+        return []
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    min_chars = int(max_chars * BOUNDARY_MIN_FILL)
+    spans = []
+    if sentences is None:
+        sentences = DocumentProcessor.sentence_spans(text)
+    for start, end in sentences:
+        if end - start > max_chars:
+            spans.extend(_split_long_span(start, end, max_chars))
+        else:
+            spans.append((start, end))
+
+    chunks = []
+    chunk_start = chunk_end = None
+    for start, end in spans:
+        if chunk_start is not None and end - chunk_start > max_chars:
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        if end - chunk_start >= min_chars and \
+                zlib.crc32(text[start:end].encode("utf-8")) % BOUNDARY_PERIOD == 0:
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = None
+    if chunk_start is not None:
+        chunks.append((chunk_start, chunk_end))
+    return chunks
+
+
+def chunk_text(text: str, max_tokens: int) -> List[Chunk]:
+    """Pack whole sentences into chunks of at most max_tokens estimated tokens.
+
+    Where a chunk ends depends on the sentences themselves rather than only
+    on its length, so an edit moves the boundaries of the chunks around it
+    and the rest of the material keeps the same chunks (and chunk hashes).
+    """
+    return [
+        Chunk(index=i, text=text[start:end], start=start, end=end,
+              tokens=estimate_tokens(text[start:end]))
+        for i, (start, end) in enumerate(chunk_spans(text, max_tokens))
+    ]
+
+
+def allocate_counts(total: int, chunks: List[Chunk]) -> List[int]:
+    """Split a requested item count across chunks in proportion to their size.
+
+    Counts are taken from rounded cumulative shares, so when there are more
+    chunks than items the items are spread evenly across the material.
+    """
+    if not chunks or total <= 0:
+        return [0] * len(chunks)
+
+    weight = sum(c.tokens for c in chunks) or len(chunks)
+    counts = []
+    cumulative = 0.0
+    assigned = 0
+    for chunk in chunks:
+        cumulative += total * (chunk.tokens or 1) / weight
+        target = min(total, int(cumulative + 0.5))
+        counts.append(target - assigned)
+        assigned = target
+    counts[-1] += total - assigned
+    return counts
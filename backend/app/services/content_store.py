@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.config import settings
+
+CODEC = "zlib"
+# Fields a material's text can live in; project these to load it.
+CONTENT_FIELDS = {"content": 1, "content_blob": 1}
+# Document fields holding a blob that may point at a GridFS file.
+BLOB_FIELDS = ("content_blob", "index_blob")
+# Texts this small decompress faster than a worker thread starts.
+_THREAD_MIN_BYTES = 256 * 1024
+
+
+class EncodedContent(NamedTuple):
+    fields: dict
+    blob: Optional[bytes]
+
+
+class ContentStore:
+    """Where a material's text lives, in or outside its document.
+
+    Texts under compress_min_bytes stay plain in `content`, as materials
+    always stored them. Larger texts are zlib-compressed into
+    `content_blob`; when the compressed form is still above
+    inline_max_bytes it goes to the GridFS bucket `material_content`,
+    named by the SHA-256 of the text so identical texts share one file.
+    Only the paths that need the full text call load(). Derived binary
+    data such as the text index goes through prepare_blob() and
+    load_blob() under the same rules, minus the plain form.
+
+    Each upload marks the file it stores or reuses as claimed before the
+    material is written, and release() only deletes files claimed more
+    than release_grace_seconds ago, so a concurrent release cannot delete
+    a file a new material is about to reference.
+    """
+
+    def __init__(self, compress_min_bytes: int, inline_max_bytes: int, level: int,
+                 release_grace_seconds: int = 3600):
+        self.compress_min_bytes = compress_min_bytes
+        self.inline_max_bytes = inline_max_bytes
+        self.level = level
+        self.release_grace_seconds = release_grace_seconds
+        self.bucket = None
+        self.files = None
+        self.materials = None
+        self.stored = {"inline": 0, "compressed": 0, "gridfs": 0}
+        self.bytes_in = 0
+        self.bytes_stored = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.blobs = {"compressed": 0, "gridfs": 0}
+
+    def set_db(self, database):
+        if database is None:
+            self.bucket = self.files = self.materials = None
+            return
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name="material_content")
+        self.files = database["material_content.files"]
+        self.materials = database.materials
+
+    def _compress(self, raw: bytes) -> Tuple[dict, Optional[bytes]]:
+        """A blob field for raw, plus the compressed bytes when they belong in GridFS."""
+        data = zlib.compress(raw, self.level)
+        blob = {"codec": CODEC, "size": len(raw), "stored": len(data)}
+        if len(data) <= self.inline_max_bytes:
+            return {**blob, "data": data}, None
+        blob["sha256"] = hashlib.sha256(raw).hexdigest()
+        return blob, data
+
+    def encode(self, text: str) -> EncodedContent:
+        """Document fields for text, plus the compressed bytes when they belong in GridFS."""
+        raw = text.encode("utf-8")
+        if len(raw) < self.compress_min_bytes:
+            return EncodedContent({"content": text, "content_blob": None}, None)
+        blob, data = self._compress(raw)
+        return EncodedContent({"content": None, "content_blob": {**blob, "length": len(text)}}, data)
+
+    async def _upload(self, blob: dict, data: bytes):
+        # Claim an existing file before deciding to reuse it; see release().
+        now = datetime.utcnow()
+        claimed = await self.files.update_many(
+            {"filename": blob["sha256"]}, {"$set": {"metadata.claimed_at": now}}
+        )
+        if not claimed.matched_count:
+            await self.bucket.upload_from_stream(
+                blob["sha256"], data, metadata={"codec": CODEC, "size": blob["size"], "claimed_at": now}
+            )
+
+    async def prepare(self, text: str) -> dict:
+        """Encode text and upload it to GridFS if needed; returns the fields to $set."""
+        if len(text) < self.compress_min_bytes // 4:
+            encoded = self.encode(text)
+        else:
+            encoded = await asyncio.to_thread(self.encode, text)
+        blob = encoded.fields["content_blob"]
+        if encoded.blob is not None:
+            await self._upload(blob, encoded.blob)
+            self.stored["gridfs"] += 1
+        else:
+            self.stored["compressed" if blob else "inline"] += 1
+        self.bytes_in += blob["size"] if blob else len(text)
+        self.bytes_stored += blob["stored"] if blob else len(text)
+        return encoded.fields
+
+    async def prepare_blob(self, raw: bytes) -> dict:
+        """Compress binary data, uploading it to GridFS if needed; returns its blob field."""
+        if len(raw) < _THREAD_MIN_BYTES:
+            blob, data = self._compress(raw)
+        else:
+            blob, data = await asyncio.to_thread(self._compress, raw)
+        if data is not None:
+            await self._upload(blob, data)
+        self.blobs["compressed" if data is None else "gridfs"] += 1
+        return blob
+
+    async def _read(self, blob: dict) -> bytes:
+        if "data" in blob:
+            return blob["data"]
+        stream = await self.bucket.open_download_stream_by_name(blob["sha256"])
+        return await stream.read()
+
+    async def load_blob(self, blob: dict) -> bytes:
+        """The data a blob field from prepare_blob() or encode() stands for."""
+        data = await self._read(blob)
+        if blob["size"] < _THREAD_MIN_BYTES:
+            return zlib.decompress(data)
+        return await asyncio.to_thread(zlib.decompress, data)
+
+    async def load(self, doc: dict) -> str:
+        """The full text of a material document fetched with CONTENT_FIELDS."""
+        blob = doc.get("content_blob")
+        if not blob:
+            return doc.get("content") or ""
+        started = time.perf_counter()
+        raw = await self.load_blob(blob)
+        if blob["size"] < _THREAD_MIN_BYTES:
+            text = raw.decode("utf-8")
+        else:
+            text = await asyncio.to_thread(raw.decode, "utf-8")
+        self.loads += 1
+        self.load_seconds += time.perf_counter() - started
+        return text
+
+    async def preview(self, doc: dict, chars: int) -> str:
+        """The first chars characters, decompressing only as much as they need."""
+        blob = doc.get("content_blob")
+        if not blob:
+            return (doc.get("content") or "")[:chars]
+        if "data" in blob:
+            data = blob["data"]
+        else:
+            stream = await self.bucket.open_download_stream_by_name(blob["sha256"])
+            data = await stream.readchunk()
+        # At most 4 bytes per character; a character cut at the end is dropped.
+        head = zlib.decompressobj().decompress(data, chars * 4)
+        return head.decode("utf-8", errors="ignore")[:chars]
+
+    async def release(self, doc: dict):
+        """Delete a removed or replaced material's GridFS files unless another material shares them.
+
+        doc is the material as it was, fetched with the BLOB_FIELDS it had.
+        Files claimed within release_grace_seconds are kept even when no
+        material references them yet: an upload may be about to.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.release_grace_seconds)
+        for field in BLOB_FIELDS:
+            blob = doc.get(field)
+            if not blob or "sha256" not in blob:
+                continue
+            if await self.materials.find_one({f"{field}.sha256": blob["sha256"]}, {"_id": 1}):
+                continue
+            async for file in self.bucket.find({
+                "filename": blob["sha256"],
+                "$or": [
+                    {"metadata.claimed_at": {"$lt": cutoff}},
+                    {"metadata.claimed_at": {"$exists": False}, "uploadDate": {"$lt": cutoff}},
+                ],
+            }):
+                await self.bucket.delete(file._id)
+
+    def stats(self) -> dict:
+        return {
+            "stored": dict(self.stored),
+            "bytes_in": self.bytes_in,
+            "bytes_stored": self.bytes_stored,
+            "ratio": round(self.bytes_stored / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "loads": self.loads,
+            "avg_load_ms": round(self.load_seconds / self.loads * 1000, 2) if self.loads else 0.0,
+            "blobs": dict(self.blobs),
+        }
+
+
+content_store = ContentStore(
+    compress_min_bytes=settings.CONTENT_COMPRESS_MIN_BYTES,
+    inline_max_bytes=settings.CONTENT_INLINE_MAX_BYTES,
+    level=settings.CONTENT_COMPRESSION_LEVEL,
+    release_grace_seconds=settings.CONTENT_RELEASE_GRACE_SECONDS,
+)
@@ -1,18 +1,40 @@
 import os
 import re
-from typing import Optional
-from PyPDF2 import PdfReader
+import time
+from typing import List, NamedTuple, Optional
+from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
+from app.config import settings
+from app.services.image_preprocessor import image_preprocessor
+from app.services.llm_provider import llm_provider
+from app.services.text_normalizer import read_segments, text_normalizer
 
 try:
     import pytesseract
 except ImportError:
     pytesseract = None
 
+_SENTENCE_GAP = re.compile(r'(?<=[.!?])\s+')
+
+
+class PageText(NamedTuple):
+    number: int                 # 0-based page index
+    text: str
+    elapsed_ms: float
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        """No text came out of the page (scanned, or the parser raised)."""
+        return self.error is not None or not self.text.strip()
+
 
 class DocumentProcessor:
     """Handles extraction and cleaning of text from various input formats."""
 
+    IMAGE_TYPES = ("png", "jpg", "jpeg", "bmp", "tiff", "webp")
+    FILE_TYPES = ("pdf", "txt", *IMAGE_TYPES)
+
     @staticmethod
     def extract_from_pdf(file_path: str) -> str:
         """Extract text content from a PDF file."""
@@ -27,59 +49,121 @@ class DocumentProcessor:
         except Exception as e:
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
+    @staticmethod
+    def pdf_page_count(file_path: str) -> int:
+        try:
+            return len(PdfReader(file_path).pages)
+        except Exception as e:
+            raise ValueError(f"Failed to read PDF: {str(e)}")
+
+    @staticmethod
+    def extract_pdf_pages(file_path: str, start: int, end: int) -> List[PageText]:
+        """Extract pages [start, end) of a PDF, timing each page and keeping per-page errors."""
+        reader = PdfReader(file_path)
+        pages = []
+        for number in range(start, min(end, len(reader.pages))):
+            started = time.perf_counter()
+            try:
+                text, error = reader.pages[number].extract_text() or "", None
+            except Exception as e:
+                text, error = "", str(e)
+            pages.append(PageText(number, text, (time.perf_counter() - started) * 1000, error))
+        return pages
+
+    @staticmethod
+    def write_pdf_pages(file_path: str, numbers: List[int], out_path: str):
+        """Copy the given pages of a PDF into a new file (e.g. to OCR just those pages)."""
+        reader = PdfReader(file_path)
+        writer = PdfWriter()
+        for number in numbers:
+            writer.add_page(reader.pages[number])
+        with open(out_path, "wb") as f:
+            writer.write(f)
+
     @staticmethod
     def extract_from_image(file_path: str) -> str:
-        """Extract text from an image using OCR."""
+        """Extract text from an image using OCR, after preprocessing; tall images are read in strips."""
         if pytesseract is None:
             raise ImportError(
                 "pytesseract is not installed. Install it with: pip install pytesseract"
             )
         try:
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
-            return text
+            image = image_preprocessor.prepare(Image.open(file_path))
+            texts = [pytesseract.image_to_string(strip) for strip in image_preprocessor.split(image)]
+            return image_preprocessor.stitch(texts)
         except Exception as e:
             raise ValueError(f"Failed to extract text from image: {str(e)}")
 
     @staticmethod
-    def clean_text(raw_text: str) -> str:
-        """Clean and normalize extracted text."""
-        if not raw_text:
-            return ""
+    def has_tesseract() -> bool:
+        return pytesseract is not None
 
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', raw_text)
+    @staticmethod
+    def prepare_image_strips(file_path: str) -> List[str]:
+        """Preprocess an image and save its OCR strips as PNG files next to it, in order."""
+        image = image_preprocessor.prepare(Image.open(file_path))
+        base = os.path.splitext(file_path)[0]
+        paths = []
+        for i, strip in enumerate(image_preprocessor.split(image)):
+            path = f"{base}.strip-{i}.png"
+            strip.convert("1").save(path)
+            paths.append(path)
+        return paths
 
-        # Remove special characters that don't add meaning
-        text = re.sub(r'[^\w\s.,;:!?\-\'\"()\[\]{}/\\@#$%&*+=<>~`^|]', '', text)
+    @staticmethod
+    def ocr_image(file_path: str) -> str:
+        """Tesseract on an already preprocessed image."""
+        with Image.open(file_path) as image:
+            return pytesseract.image_to_string(image)
 
-        # Fix sentence spacing
-        text = re.sub(r'\.(?=[A-Z])', '. ', text)
+    @staticmethod
+    def clean_text(raw_text: str) -> str:
+        """Clean and normalize extracted text, keeping paragraph breaks."""
+        if not raw_text:
+            return ""
+        size = settings.TEXT_SEGMENT_CHARS
+        return text_normalizer.normalize(raw_text[i:i + size] for i in range(0, len(raw_text), size))
 
-        # Remove redundant newlines
-        text = re.sub(r'\n{3,}', '\n\n', text)
+    @staticmethod
+    def clean_pages(pages: List[str]) -> str:
+        """clean_text for page texts, with a paragraph break between pages."""
+        return text_normalizer.normalize_pages(pages)
 
-        return text.strip()
+    @staticmethod
+    def clean_file(file_path: str) -> str:
+        """Read and clean a text file segment by segment, without loading it whole first."""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return text_normalizer.normalize(read_segments(f, settings.TEXT_SEGMENT_CHARS))
 
     @staticmethod
-    def segment_sentences(text: str) -> list:
+    def sentence_spans(text: str) -> List[tuple]:
+        """(start, end) offsets of the sentences segment_sentences returns."""
+        spans = []
+        start = len(text) - len(text.lstrip())
+        for gap in _SENTENCE_GAP.finditer(text, start):
+            if gap.start() > start:
+                spans.append((start, gap.start()))
+            start = gap.end()
+        end = len(text.rstrip())
+        if end > start:
+            spans.append((start, end))
+        return spans
+
+    @classmethod
+    def segment_sentences(cls, text: str) -> list:
         """Split text into sentences."""
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+        return [text[start:end] for start, end in cls.sentence_spans(text)]
 
     @classmethod
-    def process_file(cls, file_path: str, file_type: str) -> str:
-        """Process a file based on its type and return cleaned text. Uses Gemini as a strong OCR fallback."""
+    def extract_local(cls, file_path: str, file_type: str) -> str:
+        """Extract raw text with the local extractors only; empty if they find nothing."""
         raw_text = ""
         try:
             if file_type == "pdf":
                 raw_text = cls.extract_from_pdf(file_path)
-            elif file_type in ["png", "jpg", "jpeg", "bmp", "tiff", "webp"]:
-                # If tesseract is missing, we just rely on Gemini fallback
-                try:
-                    raw_text = cls.extract_from_image(file_path)
-                except:
-                    pass
+            elif file_type in cls.IMAGE_TYPES:
+                # If tesseract is missing this raises and the LLM OCR fallback reads the image
+                raw_text = cls.extract_from_image(file_path)
             elif file_type == "txt":
                 with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                     raw_text = f.read()
@@ -87,36 +171,27 @@ class DocumentProcessor:
                 pass
         except Exception:
             pass
+        return raw_text
 
-        # Brilliant Fallback: If PyPDF2/Tesseract failed or were blocked, use Gemini 1.5 Flash File Vision API
-        if not raw_text.strip() and file_type in ["pdf", "png", "jpg", "jpeg", "webp"]:
+    @classmethod
+    def extract_and_clean(cls, file_path: str, file_type: str) -> str:
+        """Local extraction plus cleaning: the CPU-bound part of ExtractionPool.process_file."""
+        if file_type == "txt":
             try:
-                import google.generativeai as genai
-                from app.config import settings
-                import time
-                
-                genai.configure(api_key=settings.GEMINI_API_KEY)
-                
-                # Upload to Gemini File API
-                uploaded_file = genai.upload_file(file_path)
-                
-                # Wait briefly for processing (if needed for larger PDFs)
-                time.sleep(2)
-                
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                response = model.generate_content([
-                    "You are a professional OCR engine. Please extract ALL the text from this document accurately. Do not add any introductory or conversational text, just return the raw text you see in the document.",
-                    uploaded_file
-                ])
-                
-                raw_text = response.text
-                
-                # Cleanup Cloud Space
-                genai.delete_file(uploaded_file.name)
-            except Exception as e:
-                print(f"Gemini OCR Fallback failed: {e}")
+                return cls.clean_file(file_path)
+            except Exception:
+                return ""
+        return cls.clean_text(cls.extract_local(file_path, file_type))
+
+    @staticmethod
+    def ocr_available() -> bool:
+        """Whether an LLM provider is configured to read scanned pages and images."""
+        return llm_provider is not None
 
-        return cls.clean_text(raw_text)
+    @classmethod
+    def needs_ocr(cls, text: str, file_type: str) -> bool:
+        """Whether the LLM OCR fallback should read a file, given its locally extracted text."""
+        return not text.strip() and file_type in ["pdf", "png", "jpg", "jpeg", "webp"] and cls.ocr_available()
 
     @classmethod
     def process_text(cls, text: str) -> str:
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.services.upload_storage import StoredUpload
+
+
+class ExtractionCache:
+    """Cleaned text of uploaded files, shared across users, keyed by content hash.
+
+    The key also holds the file type, EXTRACTOR_VERSION and whether OCR was
+    available, so bumping the version (or enabling OCR) makes old entries
+    miss. Concurrent uploads of the same file wait for a single extraction.
+    """
+
+    def __init__(self, version: str):
+        self.version = version
+        self.collection = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stored = 0
+        self.bytes_skipped = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def set_db(self, database):
+        self.collection = database.extraction_cache if database is not None else None
+
+    def make_key(self, sha256: str, file_type: str) -> str:
+        ocr = "ocr" if DocumentProcessor.ocr_available() else "local"
+        return f"{self.version}:{ocr}:{file_type}:{sha256}"
+
+    async def get(self, key: str) -> Optional[str]:
+        if self.collection is None:
+            return None
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": key},
+                {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+                projection={"text": 1},
+            )
+        except Exception as e:
+            print(f"Extraction cache read error: {e}")
+            return None
+        return doc["text"] if doc is not None else None
+
+    async def set(self, key: str, text: str, file_type: str, size: int):
+        if self.collection is None:
+            return
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "text": text,
+                    "version": self.version,
+                    "file_type": file_type,
+                    "file_size": size,
+                    "created_at": now,
+                    "last_used_at": now,
+                    "hits": 0,
+                }},
+                upsert=True,
+            )
+            self.stored += 1
+        except Exception as e:
+            print(f"Extraction cache write error: {e}")
+
+    async def extract(self, stored: StoredUpload, file_type: str,
+                      extract: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """Return (text, cached): the cached text for this file, or extract() and store it."""
+        key = self.make_key(stored.sha256, file_type)
+        if key in self._inflight:
+            self.coalesced += 1
+            self.bytes_skipped += stored.size
+            return await asyncio.shield(self._inflight[key]), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self.get(key)
+            if text is not None:
+                self.hits += 1
+                self.bytes_skipped += stored.size
+                future.set_result(text)
+                return text, True
+
+            self.misses += 1
+            try:
+                text = await extract()
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # waiters re-raise it; don't warn when there are none
+                raise
+            future.set_result(text)
+            if text.strip():
+                await self.set(key, text, file_type, stored.size)
+            return text, False
+        finally:
+            del self._inflight[key]
+
+    async def prune(self) -> int:
+        """Delete entries written by other extractor versions."""
+        if self.collection is None:
+            return 0
+        result = await self.collection.delete_many({"version": {"$ne": self.version}})
+        return result.deleted_count
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "stored": self.stored,
+            "bytes_skipped": self.bytes_skipped,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+extraction_cache = ExtractionCache(version=settings.EXTRACTOR_VERSION)
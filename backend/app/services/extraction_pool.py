@@ -0,0 +1,266 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, List, NamedTuple, Optional, Set
+
+from app.config import settings
+from app.services.document_processor import DocumentProcessor, PageText
+from app.services.image_preprocessor import image_preprocessor
+from app.services.ocr_service import ocr_service
+
+
+class ExtractionBusy(RuntimeError):
+    """The extraction queue is full."""
+
+
+class ExtractionTimeout(TimeoutError):
+    """An extraction task ran past its time limit and its worker was killed."""
+
+
+def _register_worker(pids):
+    """Worker initializer: tell the pool which process to kill if a task overruns."""
+    pids.put(os.getpid())
+
+
+class PdfExtraction(NamedTuple):
+    pages: List[PageText]       # in page order
+    elapsed_ms: float
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(page.text for page in self.pages if page.text.strip())
+
+    @property
+    def failed_pages(self) -> List[int]:
+        return [page.number for page in self.pages if page.failed]
+
+
+class ExtractionPool:
+    """Process pool for CPU-bound document extraction (PyPDF2, Tesseract, text cleaning).
+
+    At most workers + queue_size tasks are admitted at once; further
+    callers are rejected with ExtractionBusy instead of piling up. Only
+    `workers` tasks are submitted at a time and the rest wait here, so a
+    task's timeout runs from when a worker picks it up. A task that
+    exceeds it cannot be interrupted inside its process, so the whole
+    pool is torn down and rebuilt; tasks that were running next to it are
+    resubmitted once. Workers are replaced after max_tasks_per_child
+    tasks to contain PyPDF2 memory growth.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, max_tasks_per_child: int,
+                 shard_pages: int = 25):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_pages = shard_pages
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._context = multiprocessing.get_context("spawn")
+        # Pids reported by the current executor's workers, fed by _register_worker.
+        self._pid_queue = None
+        self._worker_pids: Set[int] = set()
+        self._running = asyncio.Semaphore(self.workers)
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.pdf_pages = 0
+        self.pdf_failed_pages = 0
+        self.image_strips = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._pid_queue = self._context.SimpleQueue()
+            self._worker_pids = set()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: forking a process that runs an event loop and client threads is unsafe.
+                mp_context=self._context,
+                initializer=_register_worker,
+                initargs=(self._pid_queue,),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor):
+        """Kill every worker of executor, stuck ones included; the next task starts a fresh pool."""
+        if self._executor is not executor:
+            return
+        self._executor = None
+        self.restarts += 1
+        while not self._pid_queue.empty():
+            self._worker_pids.add(self._pid_queue.get())
+        # Only live children are matched, so a reused pid is never signalled.
+        for process in multiprocessing.active_children():
+            if process.pid in self._worker_pids:
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """Run fn(*args) in a worker process; fn and args must be picklable."""
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise ExtractionBusy(f"Extraction queue is full ({self.capacity} tasks)")
+        self.pending += 1
+        timeout = timeout or self.timeout
+        try:
+            for attempt in range(2):
+                try:
+                    async with self._running:
+                        executor = self._pool()
+                        result = await asyncio.wait_for(asyncio.wrap_future(executor.submit(fn, *args)), timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self._restart(executor)
+                    raise ExtractionTimeout(f"Extraction took longer than {timeout:.0f}s")
+                except BrokenProcessPool:
+                    # Killed by another task's timeout, or a worker crashed.
+                    self._restart(executor)
+                    if attempt:
+                        raise
+                    continue
+                self.completed += 1
+                return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    def _shards(self, page_count: int) -> List[tuple]:
+        """Split pages into [start, end) ranges: one per worker, at most shard_pages long."""
+        size = max(1, min(self.shard_pages, math.ceil(page_count / self.workers)))
+        return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+    async def iter_pdf_pages(self, file_path: str) -> AsyncIterator[PageText]:
+        """Yield a PDF's pages in order as soon as the shard holding them is extracted.
+
+        Shards run concurrently in the pool (at most one per worker for this
+        document), each opening the file itself.
+        """
+        page_count = await self.run(DocumentProcessor.pdf_page_count, file_path)
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def extract(start: int, end: int) -> List[PageText]:
+            async with semaphore:
+                return await self.run(DocumentProcessor.extract_pdf_pages, file_path, start, end)
+
+        tasks = [asyncio.ensure_future(extract(start, end)) for start, end in self._shards(page_count)]
+        try:
+            for task in tasks:
+                for page in await task:
+                    yield page
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def extract_pdf(self, file_path: str) -> PdfExtraction:
+        """Extract every page of a PDF in parallel, with per-page timing and failures."""
+        started = time.perf_counter()
+        pages = [page async for page in self.iter_pdf_pages(file_path)]
+        extraction = PdfExtraction(pages, (time.perf_counter() - started) * 1000)
+        self.pdf_pages += len(pages)
+        self.pdf_failed_pages += len(extraction.failed_pages)
+        return extraction
+
+    async def _process_pdf(self, file_path: str) -> str:
+        """Parallel page extraction; only pages that yield no text go to the OCR fallback."""
+        try:
+            extraction = await self.extract_pdf(file_path)
+        except ValueError:
+            # Unreadable PDF: let the OCR fallback read the whole file.
+            extraction = PdfExtraction([], 0.0)
+
+        texts = {page.number: page.text for page in extraction.pages}
+        if DocumentProcessor.ocr_available():
+            if not extraction.pages:
+                texts[0] = await ocr_service.read_file(file_path)
+            elif extraction.failed_pages:
+                texts.update(await ocr_service.read_pages(
+                    file_path, extraction.failed_pages, len(extraction.pages)
+                ))
+        return await self.run(DocumentProcessor.clean_pages, [texts[number] for number in sorted(texts)])
+
+    async def _ocr_image(self, file_path: str) -> str:
+        """Preprocess an image in the pool, then OCR its strips in parallel and stitch them."""
+        strips = await self.run(DocumentProcessor.prepare_image_strips, file_path)
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def read(path: str) -> str:
+            async with semaphore:
+                return await self.run(DocumentProcessor.ocr_image, path)
+
+        try:
+            texts = await asyncio.gather(*(read(path) for path in strips))
+        finally:
+            for path in strips:
+                if os.path.exists(path):
+                    os.remove(path)
+        self.image_strips += len(strips)
+        return image_preprocessor.stitch(texts)
+
+    async def _process_image(self, file_path: str, file_type: str) -> str:
+        raw_text = ""
+        if DocumentProcessor.has_tesseract():
+            try:
+                raw_text = await self._ocr_image(file_path)
+            except (ExtractionBusy, ExtractionTimeout):
+                raise
+            except Exception as e:
+                print(f"Image OCR failed: {e}")
+        if DocumentProcessor.needs_ocr(raw_text, file_type):
+            raw_text = await ocr_service.read_file(file_path)
+        return await self.run(DocumentProcessor.clean_text, raw_text)
+
+    async def process_file(self, file_path: str, file_type: str) -> str:
+        """Cleaned text of a file: local extraction in the pool, async OCR fallback."""
+        if file_type == "pdf":
+            return await self._process_pdf(file_path)
+        if file_type in DocumentProcessor.IMAGE_TYPES:
+            return await self._process_image(file_path, file_type)
+        text = await self.run(DocumentProcessor.extract_and_clean, file_path, file_type)
+        if DocumentProcessor.needs_ocr(text, file_type):
+            raw_text = await ocr_service.read_file(file_path)
+            text = await self.run(DocumentProcessor.clean_text, raw_text)
+        return text
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "pdf_pages": self.pdf_pages,
+            "pdf_failed_pages": self.pdf_failed_pages,
+            "image_strips": self.image_strips,
+        }
+
+
+extraction_pool = ExtractionPool(
+    workers=settings.EXTRACTION_WORKERS,
+    queue_size=settings.EXTRACTION_QUEUE_SIZE,
+    timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+    max_tasks_per_child=settings.EXTRACTION_MAX_TASKS_PER_CHILD,
+    shard_pages=settings.PDF_SHARD_PAGES,
+)
@@ -0,0 +1,122 @@
+import copy
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Optional
+
+from app.config import settings
+
+
+class GenerationCache:
+    """Two-tier cache for AI generations: in-process LRU in front of a Mongo collection."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.collection = None
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self.evictions = 0
+
+    def set_db(self, database):
+        """Attach the persistent tier."""
+        self.collection = database.ai_cache if database is not None else None
+
+    @staticmethod
+    def make_key(model: str, kind: str, text: str, params: Optional[dict] = None) -> str:
+        """Build a content-addressed key for a generation request."""
+        payload = json.dumps(
+            {
+                "model": model,
+                "prompt_version": settings.PROMPT_VERSION,
+                "kind": kind,
+                "params": params or {},
+            },
+            sort_keys=True,
+        )
+        digest = hashlib.sha256(payload.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def _set_local(self, key: str, value: Any):
+        # The local tier keeps its own copy, so callers can change what they stored or got back.
+        self._entries[key] = (copy.deepcopy(value), time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return a cached generation, or None on a miss."""
+        value = self._get_local(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": key})
+            except Exception as e:
+                print(f"AI cache read error: {e}")
+                doc = None
+            if doc is not None:
+                self.hits += 1
+                self.persistent_hits += 1
+                self._set_local(key, doc["value"])
+                return doc["value"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        """Store a generation in both tiers."""
+        self._set_local(key, value)
+        if self.collection is None:
+            return
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {"value": value, "created_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"AI cache write error: {e}")
+
+    def clear(self):
+        """Drop the in-process tier."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+generation_cache = GenerationCache(
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+)
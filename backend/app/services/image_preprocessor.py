@@ -0,0 +1,150 @@
+from typing import List, Tuple
+
+from PIL import Image, ImageChops, ImageOps
+
+from app.config import settings
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Rows at least this light (0-255 mean) are treated as blank when choosing a strip cut.
+BLANK_ROW = 250
+
+
+class ImagePreprocessor:
+    """Prepares photos and scans of notes for Tesseract.
+
+    Images are turned upright (EXIF orientation, then Tesseract OSD when
+    auto_rotate is on), downscaled to target_dpi or at most max_width
+    pixels wide, flattened against their local background to remove uneven
+    lighting, and binarized with Otsu's threshold. Images taller than
+    strip_height are cut into strips at the lightest row near each
+    boundary; when that row still has ink, neighbouring strips share
+    overlap pixels and the repeated lines are dropped when stitching.
+    """
+
+    def __init__(self, target_dpi: int, max_width: int, strip_height: int, overlap: int,
+                 auto_rotate: bool):
+        # strips() searches the overlap rows above each boundary for a cut and steps
+        # back by overlap; both need 0 < overlap < strip_height / 2.
+        if not 0 < overlap < strip_height / 2:
+            raise ValueError(
+                f"OCR strip overlap must be between 0 and half the strip height "
+                f"({strip_height // 2}), got {overlap}"
+            )
+        self.target_dpi = target_dpi
+        self.max_width = max_width
+        self.strip_height = strip_height
+        self.overlap = overlap
+        self.auto_rotate = auto_rotate
+
+    def scale(self, image: Image.Image) -> float:
+        factor = 1.0
+        dpi = image.info.get("dpi")
+        if dpi and dpi[0] > self.target_dpi:
+            factor = self.target_dpi / dpi[0]
+        if image.width * factor > self.max_width:
+            factor = self.max_width / image.width
+        return factor
+
+    @staticmethod
+    def otsu_threshold(histogram: List[int]) -> int:
+        """Gray level that best separates ink from background."""
+        total = sum(histogram)
+        total_sum = sum(level * count for level, count in enumerate(histogram))
+        weight = level_sum = 0
+        best_level, best_variance = 0, -1.0
+        for level, count in enumerate(histogram):
+            weight += count
+            if not weight:
+                continue
+            if weight == total:
+                break
+            level_sum += level * count
+            mean_dark = level_sum / weight
+            mean_light = (total_sum - level_sum) / (total - weight)
+            variance = weight * (total - weight) * (mean_dark - mean_light) ** 2
+            if variance > best_variance:
+                best_level, best_variance = level, variance
+        return best_level
+
+    def _rotate(self, image: Image.Image) -> Image.Image:
+        """Apply the rotation Tesseract's orientation detection suggests, if any."""
+        if not self.auto_rotate or pytesseract is None:
+            return image
+        try:
+            small = image.copy()
+            small.thumbnail((1200, 1200))
+            rotation = pytesseract.image_to_osd(small, output_type=pytesseract.Output.DICT)["rotate"]
+        except Exception:
+            # OSD needs a minimum amount of text and fails on sparse images.
+            return image
+        return image.rotate(-rotation, expand=True) if rotation else image
+
+    def binarize(self, gray: Image.Image) -> Image.Image:
+        """Flatten uneven lighting, then threshold: black text on white."""
+        small = (max(1, gray.width // 32), max(1, gray.height // 32))
+        background = gray.resize(small, Image.BOX).resize(gray.size, Image.BILINEAR)
+        flat = ImageOps.invert(ImageChops.subtract(background, gray))
+        threshold = self.otsu_threshold(flat.histogram())
+        return flat.point([255 if level > threshold else 0 for level in range(256)])
+
+    def prepare(self, image: Image.Image) -> Image.Image:
+        image = ImageOps.exif_transpose(image)
+        factor = self.scale(image)
+        gray = image.convert("L")
+        if factor < 1:
+            gray = gray.resize((round(gray.width * factor), round(gray.height * factor)), Image.LANCZOS)
+        return self.binarize(self._rotate(gray))
+
+    def strips(self, image: Image.Image) -> List[Tuple[int, int]]:
+        """(top, bottom) row ranges covering the image."""
+        height = image.height
+        if height <= self.strip_height * 1.25:
+            return [(0, height)]
+        rows = list(image.resize((1, height), Image.BOX).getdata())
+        boxes = []
+        top = 0
+        while height - top > self.strip_height * 1.25:
+            target = top + self.strip_height
+            cut = max(range(target - self.overlap, target), key=lambda row: rows[row])
+            if rows[cut] >= BLANK_ROW:
+                boxes.append((top, cut))
+                top = cut
+            else:
+                boxes.append((top, cut + self.overlap))
+                top = cut - self.overlap
+        boxes.append((top, height))
+        return boxes
+
+    def split(self, image: Image.Image) -> List[Image.Image]:
+        return [image.crop((0, top, image.width, bottom)) for top, bottom in self.strips(image)]
+
+    @staticmethod
+    def stitch(texts: List[str], max_repeat: int = 4) -> str:
+        """Join strip texts, dropping lines repeated across a shared overlap."""
+        def key(line: str) -> str:
+            return " ".join(line.split()).lower()
+
+        lines: List[str] = []
+        for text in texts:
+            new = text.strip("\n").splitlines()
+            tail = [key(line) for line in lines if line.strip()][-max_repeat:]
+            head = [i for i, line in enumerate(new) if line.strip()][:max_repeat]
+            for count in range(min(len(tail), len(head)), 0, -1):
+                if tail[-count:] == [key(new[i]) for i in head[:count]]:
+                    new = new[head[count - 1] + 1:]
+                    break
+            lines.extend(new)
+        return "\n".join(lines)
+
+
+image_preprocessor = ImagePreprocessor(
+    target_dpi=settings.OCR_TARGET_DPI,
+    max_width=settings.OCR_MAX_WIDTH,
+    strip_height=settings.OCR_STRIP_HEIGHT,
+    overlap=settings.OCR_STRIP_OVERLAP,
+    auto_rotate=settings.OCR_AUTO_ROTATE,
+)
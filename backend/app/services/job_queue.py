@@ -0,0 +1,173 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.services.llm_scheduler import BACKGROUND, priority
+
+
+class JobFailed(Exception):
+    """Raised by a handler when retrying cannot help (e.g. the material is gone)."""
+
+
+class JobQueue:
+    """Mongo-backed job queue drained by a pool of async workers with leases."""
+
+    def __init__(self, workers: int, lease_seconds: int, poll_seconds: float, max_attempts: int):
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.collection = None
+        self._handlers: Dict[str, Callable[[dict], Awaitable[dict]]] = {}
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+
+    def set_db(self, database):
+        self.collection = database.jobs
+
+    def register(self, kind: str, handler: Callable[[dict], Awaitable[dict]]):
+        """Register the coroutine that executes jobs of the given kind."""
+        self._handlers[kind] = handler
+
+    async def enqueue(self, kind: str, user_id: str, material_id: str, params: dict) -> str:
+        """Queue a job and return its ID."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.utcnow()
+        result = await self.collection.insert_one({
+            "kind": kind,
+            "user_id": user_id,
+            "material_id": material_id,
+            "params": params,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        try:
+            return await self.collection.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+        except Exception:
+            return None
+
+    async def _claim(self, owner: str) -> Optional[dict]:
+        """Atomically take the oldest queued job, or a running job whose lease expired."""
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_expires_at": {"$lt": now}},
+                ],
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_owner": owner,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _fail_abandoned(self):
+        """Fail jobs whose lease expired after their last allowed attempt."""
+        now = datetime.utcnow()
+        await self.collection.update_many(
+            {
+                "status": "running",
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {"$set": {"status": "failed", "error": "Lease expired", "updated_at": now}},
+        )
+
+    async def _heartbeat(self, job_id, owner: str):
+        """Keep extending the lease while the job runs."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            now = datetime.utcnow()
+            await self.collection.update_one(
+                {"_id": job_id, "lease_owner": owner},
+                {"$set": {
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                }},
+            )
+
+    async def _execute(self, job: dict, owner: str):
+        heartbeat = asyncio.ensure_future(self._heartbeat(job["_id"], owner))
+        try:
+            with priority(BACKGROUND):
+                result = await self._handlers[job["kind"]](job)
+            update = {"status": "done", "result": result, "error": None}
+        except JobFailed as e:
+            print(f"Job {job['_id']} ({job['kind']}) failed permanently: {e}")
+            update = {"status": "failed", "error": str(e)}
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['kind']}) failed: {e}")
+            retry = job["attempts"] < self.max_attempts
+            update = {"status": "queued" if retry else "failed", "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        update.update({"lease_owner": None, "lease_expires_at": None, "updated_at": datetime.utcnow()})
+        await self.collection.update_one({"_id": job["_id"], "lease_owner": owner}, {"$set": update})
+
+    async def _worker(self):
+        owner = uuid.uuid4().hex
+        while True:
+            try:
+                job = await self._claim(owner)
+            except Exception as e:
+                print(f"Job queue claim error: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await self._fail_abandoned()
+                except Exception as e:
+                    print(f"Job queue sweep error: {e}")
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(job, owner)
+
+    def start(self, workers: Optional[int] = None):
+        """Start the worker pool on the running event loop."""
+        count = self.workers if workers is None else workers
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(count)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_seconds=settings.JOB_POLL_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+)
@@ -0,0 +1,232 @@
+import asyncio
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from app.config import settings
+
+# Words, plus runs of punctuation, digits and line breaks that end a phrase.
+_TOKENS = re.compile(r"[a-z][a-z-]*|[^a-z \t]+")
+# Per-user document count, stored next to the term rows; "#" never occurs in a term.
+DOCUMENTS_KEY = "#documents"
+
+
+class Candidates(NamedTuple):
+    terms: np.ndarray       # lowercase n-grams, best first
+    counts: np.ndarray      # occurrences in the document
+    scores: np.ndarray      # document-local score, before IDF
+
+
+class KeyphraseExtractor:
+    """TF-IDF keyphrase extraction against a per-user document-frequency table."""
+
+    def __init__(self, max_ngram: int = 3, top_k: int = 15, max_candidates: int = 400,
+                 min_phrase_count: int = 2, phrase_boost: float = 0.5, df_terms: int = 2000):
+        self.max_ngram = max_ngram
+        self.top_k = top_k
+        self.max_candidates = max_candidates
+        # Terms per document counted in the DF table; bounds the writes per upload.
+        self.df_terms = max(df_terms, max_candidates)
+        self.min_phrase_count = min_phrase_count
+        self.phrase_boost = phrase_boost
+        self.collection = None
+
+    def set_db(self, database):
+        self.collection = database.term_frequencies if database is not None else None
+
+    @staticmethod
+    def _is_word(token: str) -> bool:
+        return len(token) > 2 and token[-1].isalpha() and token not in ENGLISH_STOP_WORDS
+
+    def candidates(self, text: str, limit: Optional[int] = None) -> Optional[Candidates]:
+        """Count stopword-free n-grams and keep the strongest limit (default max_candidates).
+
+        Tokens are mapped to integer
+        IDs and each n-gram is packed into one int64 key, so counting is a
+        single np.unique per n-gram length.
+        """
+        index: Dict[str, int] = {}
+        ids = np.fromiter(
+            (index.setdefault(token, len(index)) for token in _TOKENS.findall(text.lower())),
+            dtype=np.int64,
+        )
+        vocab = list(index)
+        size = len(vocab)
+        if size == 0:
+            return None
+        # Stopwords and separators become -1, so no n-gram spans them.
+        words = np.array([self._is_word(token) for token in vocab])
+        ids = np.where(words[ids], ids, -1)
+
+        longest = self.max_ngram
+        while size ** longest >= 2 ** 63:
+            longest -= 1
+
+        keys, counts, lengths = [], [], []
+        grams = ids
+        valid = ids >= 0
+        for n in range(1, longest + 1):
+            if n > 1:
+                valid = valid[:-1] & (ids[n - 1:] >= 0)
+                grams = grams[:-1] * size + ids[n - 1:]
+            found, found_counts = np.unique(grams[valid], return_counts=True)
+            if n > 1:
+                # Phrases seen once are usually accidental word pairs.
+                frequent = found_counts >= self.min_phrase_count
+                found, found_counts = found[frequent], found_counts[frequent]
+            keys.append(found)
+            counts.append(found_counts)
+            lengths.append(np.full(len(found), n))
+        keys, counts, lengths = np.concatenate(keys), np.concatenate(counts), np.concatenate(lengths)
+        if len(keys) == 0:
+            return None
+
+        scores = counts * (1 + self.phrase_boost * (lengths - 1))
+        top = np.argsort(-scores, kind="stable")[:limit or self.max_candidates]
+        terms = []
+        for key, n in zip(keys[top].tolist(), lengths[top].tolist()):
+            parts = []
+            for _ in range(n):
+                key, part = divmod(key, size)
+                parts.append(vocab[part])
+            terms.append(" ".join(reversed(parts)))
+        return Candidates(np.array(terms, dtype=object), counts[top], scores[top])
+
+    @staticmethod
+    def _stem(word: str) -> str:
+        """Crude plural folding, enough to merge "enzyme" and "enzymes"."""
+        if len(word) > 4 and word.endswith("ies"):
+            return word[:-3] + "y"
+        if len(word) > 4 and word.endswith("es") and word[-3] in "sxz":
+            return word[:-2]
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            return word[:-1]
+        return word
+
+    @staticmethod
+    def _contains(phrase: tuple, part: tuple) -> bool:
+        n = len(part)
+        return any(phrase[i:i + n] == part for i in range(len(phrase) - n + 1))
+
+    def _merge(self, terms: List[str], scores: np.ndarray, top_k: int) -> List[str]:
+        """Walk terms best-first, dropping plural variants and phrases nested in chosen ones."""
+        chosen = []   # [term, stems, score]
+        for i in np.argsort(-scores, kind="stable"):
+            stems = tuple(self._stem(w) for w in terms[i].split())
+            duplicate = False
+            for entry in chosen:
+                if self._contains(entry[1], stems):
+                    duplicate = True
+                    break
+                if self._contains(stems, entry[1]) and scores[i] >= 0.8 * entry[2]:
+                    # A longer phrase nearly as strong replaces the term it contains.
+                    entry[:] = [terms[i], stems, scores[i]]
+                    duplicate = True
+                    break
+            if not duplicate:
+                chosen.append([terms[i], stems, scores[i]])
+                if len(chosen) >= top_k:
+                    break
+        return [entry[0] for entry in chosen]
+
+    @staticmethod
+    def _surface(text: str, term: str) -> str:
+        """The term as first written in the text, with a capital initial."""
+        pattern = r"\b" + r"[\s-]+".join(re.escape(w) for w in term.split()) + r"\b"
+        found = re.search(pattern, text, re.IGNORECASE)
+        name = found.group() if found else term
+        return name[0].upper() + name[1:]
+
+    def rank(self, text: str, candidates: Optional[Candidates], df: Optional[Dict[str, int]] = None,
+             documents: int = 0, top_k: Optional[int] = None) -> List[str]:
+        """Score candidates by TF-IDF and return the top distinct concepts."""
+        if candidates is None:
+            return []
+        df = df or {}
+        frequencies = np.array([df.get(term, 0) for term in candidates.terms], dtype=np.float64)
+        idf = np.log((1 + documents) / (1 + frequencies)) + 1
+        scores = candidates.scores * idf
+        terms = self._merge(list(candidates.terms), scores, top_k or self.top_k)
+        return [self._surface(text, term) for term in terms]
+
+    def extract(self, text: str, df: Optional[Dict[str, int]] = None, documents: int = 0,
+                top_k: Optional[int] = None) -> List[str]:
+        """Rank key concepts of a text; without df every term has the same IDF."""
+        return self.rank(text, self.candidates(text), df, documents, top_k)
+
+    async def document_frequencies(self, user_id: str, terms: List[str]):
+        """Return (documents, {term: df}) for a user's corpus."""
+        if self.collection is None:
+            return 0, {}
+        cursor = self.collection.find(
+            {"user_id": user_id, "term": {"$in": [DOCUMENTS_KEY, *terms]}},
+            {"_id": 0, "term": 1, "df": 1},
+        )
+        df = {row["term"]: row["df"] async for row in cursor}
+        return max(df.pop(DOCUMENTS_KEY, 0), 0), df
+
+    async def extract_for_user(self, user_id: str, text: str, top_k: Optional[int] = None) -> List[str]:
+        """Rank key concepts of a text against the user's uploaded materials."""
+        candidates = await asyncio.to_thread(self.candidates, text)
+        if candidates is None:
+            return []
+        try:
+            documents, df = await self.document_frequencies(user_id, list(candidates.terms))
+        except Exception as e:
+            print(f"Term frequency lookup error: {e}")
+            documents, df = 0, {}
+        return await asyncio.to_thread(self.rank, text, candidates, df, documents, top_k)
+
+    def df_operations(self, added: List[str], removed: List[str]) -> Dict[str, int]:
+        """Net DF change per term for adding and removing texts; terms that cancel out are left out.
+
+        Each text counts its df_terms strongest terms, several times the
+        max_candidates it is ranked on, so a term ranked in one material
+        has a DF from the others without a write per distinct n-gram.
+        """
+        counts = {DOCUMENTS_KEY: len(added) - len(removed)}
+        for texts, delta in ((added, 1), (removed, -1)):
+            for text in texts:
+                candidates = self.candidates(text, self.df_terms)
+                for term in [] if candidates is None else candidates.terms:
+                    counts[term] = counts.get(term, 0) + delta
+        return {term: count for term, count in counts.items() if count}
+
+    async def _update(self, user_id: str, added: List[str], removed: List[str] = ()):
+        if self.collection is None or not (added or removed):
+            return
+        counts = await asyncio.to_thread(self.df_operations, list(added), list(removed))
+        if not counts:
+            return
+        operations = [
+            UpdateOne({"user_id": user_id, "term": term}, {"$inc": {"df": count}}, upsert=True)
+            for term, count in counts.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+        if any(count < 0 for count in counts.values()):
+            await self.collection.delete_many({"user_id": user_id, "df": {"$lte": 0}})
+
+    async def add_document(self, user_id: str, text: str):
+        """Count a newly uploaded material in the user's document frequencies."""
+        await self._update(user_id, [text])
+
+    async def add_documents(self, user_id: str, texts: List[str]):
+        """add_document for several materials in one bulk write."""
+        await self._update(user_id, texts)
+
+    async def remove_document(self, user_id: str, text: str):
+        """Undo add_document for a deleted material."""
+        await self._update(user_id, [], [text])
+
+    async def replace_document(self, user_id: str, old_text: str, new_text: str):
+        """remove_document then add_document in one bulk write, for an edited material."""
+        await self._update(user_id, [new_text], [old_text])
+
+
+keyphrase_extractor = KeyphraseExtractor(
+    top_k=settings.AI_MAX_KEY_CONCEPTS,
+    df_terms=settings.KEYPHRASE_DF_TERMS,
+)
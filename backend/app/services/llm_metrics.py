@@ -0,0 +1,288 @@
+import asyncio
+import bisect
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.services.chunking import estimate_tokens
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded.
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+TOKEN_BUCKETS = [100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000]
+
+
+class Histogram:
+    """Fixed-bucket histogram with count and sum."""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if it is the open bucket)."""
+        count = sum(self.counts)
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, bucket in zip(self.bounds, self.counts):
+            seen += bucket
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict:
+        count = sum(self.counts)
+        labels = [f"le_{bound}" for bound in self.bounds] + ["inf"]
+        return {
+            "count": count,
+            "sum": round(self.total, 1),
+            "avg": round(self.total / count, 1) if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class KindStats:
+    """Aggregates for one artifact kind."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.invalid = 0
+        self.retries = 0
+        self.fallbacks: Dict[str, int] = {}
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.response_tokens = Histogram(TOKEN_BUCKETS)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "invalid_responses": self.invalid,
+            "retries": self.retries,
+            "fallbacks": dict(self.fallbacks),
+            "latency_ms": self.latency_ms.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "response_tokens": self.response_tokens.snapshot(),
+        }
+
+
+class CallRecord:
+    """One model call as seen by LLMMetrics.track."""
+
+    def __init__(self, kind: str, provider: str, model: str, prompt: Optional[str], stream: bool):
+        self.kind = kind
+        self.provider = provider
+        self.model = model
+        self.prompt = prompt
+        self.stream = stream
+        self.attempts = 0
+        self.prompt_tokens: Optional[int] = None
+        self.response_tokens: Optional[int] = None
+        self.tokens_estimated = False
+        self.outcome = "ok"
+        self.error: Optional[str] = None
+        self.started = time.perf_counter()
+        self.latency_ms = 0.0
+        self.model_ms = 0.0
+
+    def attempt(self, call: Callable[[], Awaitable]):
+        """Wrap a zero-argument coroutine call so each (re)try is counted and timed.
+
+        latency_ms is wall time including admission waits and backoff;
+        model_ms only covers the attempts themselves.
+        """
+        async def counted():
+            self.attempts += 1
+            started = time.perf_counter()
+            try:
+                return await call()
+            finally:
+                self.model_ms += (time.perf_counter() - started) * 1000
+        return counted
+
+    def completed(self, text: str, prompt_tokens: Optional[int] = None,
+                  response_tokens: Optional[int] = None):
+        """Record the answer; missing usage counts are estimated from the text."""
+        if prompt_tokens is None or response_tokens is None:
+            self.tokens_estimated = True
+        self.prompt_tokens = prompt_tokens if prompt_tokens is not None else \
+            (estimate_tokens(self.prompt) if self.prompt else None)
+        self.response_tokens = response_tokens if response_tokens is not None else estimate_tokens(text)
+
+    def failed(self, outcome: str, error: Optional[BaseException] = None):
+        """Mark the call as failed; outcome is "error", "invalid_response" or "cancelled"."""
+        self.outcome = outcome
+        if self.prompt_tokens is None and self.prompt:
+            self.prompt_tokens = estimate_tokens(self.prompt)
+            self.tokens_estimated = True
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"[:500]
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    def to_document(self) -> dict:
+        return {
+            "kind": self.kind,
+            "provider": self.provider,
+            "model": self.model,
+            "stream": self.stream,
+            "outcome": self.outcome,
+            "error": self.error,
+            "latency_ms": round(self.latency_ms, 1),
+            "model_ms": round(self.model_ms, 1),
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "prompt_chars": len(self.prompt) if self.prompt else 0,
+            "prompt_hash": hashlib.sha256(self.prompt.encode("utf-8")).hexdigest()[:16] if self.prompt else None,
+            "created_at": datetime.utcnow(),
+        }
+
+
+class LLMMetrics:
+    """Per-kind latency/token histograms in memory, plus sampled per-call records in Mongo.
+
+    Records are buffered and written by a background flusher, so tracking
+    never adds a database round trip to a model call. Failed calls are
+    always kept; successful ones are sampled at sample_rate.
+    """
+
+    def __init__(self, sample_rate: float, flush_seconds: float, buffer_size: int):
+        self.sample_rate = sample_rate
+        self.flush_seconds = flush_seconds
+        self.collection = None
+        self.dropped = 0
+        self.written = 0
+        self._kinds: Dict[str, KindStats] = {}
+        self._pending = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._task = None
+
+    def set_db(self, database):
+        self.collection = database.llm_calls if database is not None else None
+
+    def _stats(self, kind: str) -> KindStats:
+        if kind not in self._kinds:
+            self._kinds[kind] = KindStats()
+        return self._kinds[kind]
+
+    @contextmanager
+    def track(self, kind: str, provider, prompt: Optional[str] = None,
+              stream: bool = False) -> Iterator[CallRecord]:
+        """Time the enclosed model call; an exception escaping the block marks it as an error."""
+        record = CallRecord(kind, getattr(provider, "name", "none"), getattr(provider, "model_name", ""),
+                            prompt, stream)
+        try:
+            yield record
+        except (asyncio.CancelledError, GeneratorExit):
+            record.failed("cancelled")
+            raise
+        except BaseException as e:
+            if record.outcome == "ok":
+                record.failed("error", e)
+            raise
+        finally:
+            record.latency_ms = (time.perf_counter() - record.started) * 1000
+            self.record(record)
+
+    def record(self, record: CallRecord):
+        with self._lock:
+            stats = self._stats(record.kind)
+            stats.calls += 1
+            stats.retries += record.retries
+            if record.outcome == "error":
+                stats.errors += 1
+            elif record.outcome == "invalid_response":
+                stats.invalid += 1
+            stats.latency_ms.observe(record.latency_ms)
+            if record.prompt_tokens is not None:
+                stats.prompt_tokens.observe(record.prompt_tokens)
+            if record.response_tokens is not None:
+                stats.response_tokens.observe(record.response_tokens)
+
+            if record.outcome != "ok" or random.random() < self.sample_rate:
+                if len(self._pending) == self._pending.maxlen:
+                    self.dropped += 1
+                self._pending.append(record.to_document())
+
+    def fallback(self, kind: str, reason: str):
+        """Count a generation served by an offline fallback instead of the model."""
+        with self._lock:
+            fallbacks = self._stats(kind).fallbacks
+            fallbacks[reason] = fallbacks.get(reason, 0) + 1
+
+    async def flush(self):
+        """Write buffered call records to Mongo."""
+        if self.collection is None:
+            return
+        with self._lock:
+            documents = list(self._pending)
+            self._pending.clear()
+        if not documents:
+            return
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+            self.written += len(documents)
+        except Exception as e:
+            print(f"LLM metrics write error: {e}")
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def start(self):
+        """Start the background flusher on the running event loop."""
+        self._task = asyncio.ensure_future(self._flusher())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {kind: stats.snapshot() for kind, stats in self._kinds.items()}
+            pending = len(self._pending)
+        # Most expensive kinds first, by total prompt + response tokens.
+        ranked = sorted(
+            kinds.items(),
+            key=lambda item: -(item[1]["prompt_tokens"]["sum"] + item[1]["response_tokens"]["sum"]),
+        )
+        return {
+            "kinds": dict(ranked),
+            "records": {
+                "sample_rate": self.sample_rate,
+                "pending": pending,
+                "written": self.written,
+                "dropped": self.dropped,
+            },
+        }
+
+
+llm_metrics = LLMMetrics(
+    sample_rate=settings.LLM_METRICS_SAMPLE_RATE,
+    flush_seconds=settings.LLM_METRICS_FLUSH_SECONDS,
+    buffer_size=settings.LLM_METRICS_BUFFER_SIZE,
+)
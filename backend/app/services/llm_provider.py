@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, NamedTuple, Optional
+
+from app.config import settings
+
+OCR_PROMPT = (
+    "You are a professional OCR engine. Please extract ALL the text from this document accurately. "
+    "Do not add any introductory or conversational text, just return the raw text you see in the document."
+)
+
+
+class LLMResponse(NamedTuple):
+    text: str
+    prompt_tokens: Optional[int] = None
+    response_tokens: Optional[int] = None
+
+
+class LLMProvider(ABC):
+    """Interface for the language model backends used by AIEngine and OCRService."""
+
+    name = "base"
+    model_name = ""
+
+    @abstractmethod
+    async def generate(self, prompt: str, kind: str) -> LLMResponse:
+        """Complete a prompt; kind names the artifact being generated."""
+
+    @abstractmethod
+    def stream(self, prompt: str, kind: str) -> AsyncIterator[str]:
+        """Complete a prompt, yielding text pieces as they arrive (an async generator)."""
+
+    @abstractmethod
+    async def extract_file_text(self, file_path: str) -> str:
+        """Return all text visible in a document or image (OCR)."""
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini via google-generativeai."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, ocr_model_name: str,
+                 poll_seconds: float = 0.5, poll_max_seconds: float = 4.0):
+        import google.generativeai as genai
+
+        self._genai = genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.ocr_model_name = ocr_model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.poll_seconds = poll_seconds
+        self.poll_max_seconds = poll_max_seconds
+        self._cleanups = set()
+
+    async def generate(self, prompt: str, kind: str) -> LLMResponse:
+        response = await self.model.generate_content_async(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=response.text,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            response_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+    async def stream(self, prompt: str, kind: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for part in response:
+            if part.text:
+                yield part.text
+
+    def _poll_delays(self):
+        """Exponential backoff between File API state checks."""
+        delay = self.poll_seconds
+        while True:
+            yield delay
+            delay = min(delay * 2, self.poll_max_seconds)
+
+    @staticmethod
+    def _file_state(uploaded_file) -> str:
+        state = getattr(uploaded_file, "state", None)
+        return getattr(state, "name", "ACTIVE")
+
+    def _delete_later(self, upload: asyncio.Future):
+        """Done-callback for an upload whose caller was cancelled: delete the file once it exists."""
+        if upload.cancelled() or upload.exception() is not None:
+            return
+
+        async def delete(name: str):
+            try:
+                await asyncio.to_thread(self._genai.delete_file, name)
+            except Exception as e:
+                print(f"Gemini file cleanup failed: {e}")
+
+        task = asyncio.ensure_future(delete(upload.result().name))
+        self._cleanups.add(task)
+        task.add_done_callback(self._cleanups.discard)
+
+    async def extract_file_text(self, file_path: str) -> str:
+        genai = self._genai
+        # The File API calls are blocking; the generation call is native async.
+        upload = asyncio.ensure_future(asyncio.to_thread(genai.upload_file, file_path))
+        try:
+            uploaded_file = await asyncio.shield(upload)
+        except asyncio.CancelledError:
+            # The upload thread runs to completion regardless; delete what it uploads.
+            upload.add_done_callback(self._delete_later)
+            raise
+        try:
+            delays = self._poll_delays()
+            while self._file_state(uploaded_file) == "PROCESSING":
+                await asyncio.sleep(next(delays))
+                uploaded_file = await asyncio.to_thread(genai.get_file, uploaded_file.name)
+            if self._file_state(uploaded_file) != "ACTIVE":
+                raise RuntimeError(f"Gemini could not process {os.path.basename(file_path)}")
+            model = genai.GenerativeModel(self.ocr_model_name)
+            response = await model.generate_content_async([OCR_PROMPT, uploaded_file])
+            return response.text
+        finally:
+            # Shielded so the remote file is deleted even when the OCR is cancelled or times out.
+            await asyncio.shield(asyncio.to_thread(genai.delete_file, uploaded_file.name))
+
+
+class StubProviderError(ConnectionError):
+    """Injected failure; a ConnectionError so the scheduler treats it as retryable."""
+
+
+class StubProvider(LLMProvider):
+    """Deterministic local provider for load tests and CI.
+
+    Returns schema-valid answers for every artifact kind after a simulated
+    latency drawn from the configured distribution, and fails a configurable
+    fraction of calls.
+    """
+
+    name = "stub"
+    model_name = "stub"
+
+    def __init__(self, latency_ms: float, distribution: str, jitter: float,
+                 error_rate: float, seed: Optional[int] = None):
+        if distribution not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown stub latency distribution: {distribution}")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def _latency(self) -> float:
+        """Simulated latency in seconds; latency_ms is the median (mean for exponential)."""
+        base = self.latency_ms / 1000
+        if self.distribution == "uniform":
+            return max(0.0, self.random.uniform(base * (1 - self.jitter), base * (1 + self.jitter)))
+        if self.distribution == "exponential":
+            return self.random.expovariate(1 / base) if base > 0 else 0.0
+        if self.distribution == "lognormal":
+            return self.random.lognormvariate(0, self.jitter) * base
+        return base
+
+    async def _simulate(self):
+        await asyncio.sleep(self._latency())
+        if self.random.random() < self.error_rate:
+            raise StubProviderError("Injected stub provider failure")
+
+    @staticmethod
+    def _terms(prompt: str, count: int) -> list:
+        """Pick deterministic pseudo-terms from the material embedded in the prompt."""
+        material = re.split(r"(?:Study Material|Section Summaries|Section):\n", prompt)[-1]
+        words = sorted(set(w for w in re.findall(r"[A-Za-z]{5,}", material)))
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        if not words:
+            words = ["concept"]
+        return [rng.choice(words).capitalize() for _ in range(count)]
+
+    def _respond(self, prompt: str, kind: str) -> str:
+        requested = re.search(r"exactly (\d+)", prompt)
+        count = int(requested.group(1)) if requested else 10
+
+        if kind == "quiz":
+            terms = self._terms(prompt, count * 4)
+            tag = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:6]
+            items = []
+            for i in range(count):
+                options = terms[i * 4:i * 4 + 4]
+                items.append({
+                    "type": "mcq",
+                    "question": f"Question {tag}-{i + 1}: which term is described in the material?",
+                    "options": options,
+                    "correct_answer": options[0],
+                    "explanation": f"{options[0]} is the term described in the material.",
+                })
+            return json.dumps(items)
+        if kind == "flashcards":
+            return json.dumps([
+                {"front": term, "back": f"Definition of {term}.", "category": "General"}
+                for term in self._terms(prompt, count)
+            ])
+        if kind == "key_concepts":
+            return json.dumps(self._terms(prompt, 12))
+        if kind == "study_plan":
+            days_match = re.search(r"(\d+)-day", prompt)
+            days = int(days_match.group(1)) if days_match else 7
+            topics = self._terms(prompt, days)
+            return json.dumps({
+                "title": "Study Plan",
+                "total_days": days,
+                "overview": "Generated by the stub provider.",
+                "daily_plans": [
+                    {
+                        "day": day,
+                        "title": f"Day {day}: {topics[day - 1]}",
+                        "topics": [topics[day - 1]],
+                        "objectives": [f"Understand {topics[day - 1]}"],
+                        "activities": ["Review notes"],
+                        "estimated_time": "1 hour",
+                        "tips": "Take short breaks.",
+                    }
+                    for day in range(1, days + 1)
+                ],
+                "key_topics": topics[:5],
+                "recommended_resources": ["Your uploaded material"],
+            })
+        terms = self._terms(prompt, 6)
+        bullets = "\n".join(f"- **{term}**: key idea from the material." for term in terms)
+        return f"## Overview\n\n{bullets}\n"
+
+    async def generate(self, prompt: str, kind: str) -> LLMResponse:
+        await self._simulate()
+        text = self._respond(prompt, kind)
+        return LLMResponse(text, prompt_tokens=len(prompt) // 4, response_tokens=len(text) // 4)
+
+    async def stream(self, prompt: str, kind: str) -> AsyncIterator[str]:
+        await self._simulate()
+        text = self._respond(prompt, kind)
+        for start in range(0, len(text), 64):
+            yield text[start:start + 64]
+            await asyncio.sleep(0)
+
+    async def extract_file_text(self, file_path: str) -> str:
+        await self._simulate()
+        name = os.path.basename(file_path)
+        return f"Stub OCR text for {name}. This document was processed by the stub provider."
+
+
+def create_provider() -> Optional[LLMProvider]:
+    """Build the provider selected by LLM_PROVIDER; None when Gemini has no API key."""
+    if settings.LLM_PROVIDER == "stub":
+        return StubProvider(
+            latency_ms=settings.LLM_STUB_LATENCY_MS,
+            distribution=settings.LLM_STUB_LATENCY_DISTRIBUTION,
+            jitter=settings.LLM_STUB_LATENCY_JITTER,
+            error_rate=settings.LLM_STUB_ERROR_RATE,
+            seed=settings.LLM_STUB_SEED,
+        )
+    if settings.LLM_PROVIDER == "gemini":
+        if not settings.GEMINI_API_KEY:
+            return None
+        return GeminiProvider(
+            settings.GEMINI_API_KEY,
+            settings.GEMINI_MODEL,
+            settings.GEMINI_OCR_MODEL,
+            poll_seconds=settings.OCR_POLL_SECONDS,
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
+
+
+llm_provider = create_provider()
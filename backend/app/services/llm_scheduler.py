@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from app.config import settings
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+# Priority classes; lower values are admitted first.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_current_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+if google_exceptions is not None:
+    RETRYABLE_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+        asyncio.TimeoutError,
+        ConnectionError,
+    )
+else:
+    RETRYABLE_ERRORS = (asyncio.TimeoutError, ConnectionError)
+
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed model calls with the given priority class."""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    """The priority class model calls made here will be queued under."""
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """Admission control for model calls: rate limits, concurrency cap, priorities and retries."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int,
+                 max_retries: int, backoff_base: float, backoff_max: float):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._timer = None
+        self.active = 0
+
+        self.admitted = 0
+        self.retries = 0
+        self.failures = 0
+        self._wait_times = deque(maxlen=1000)
+
+    def _dispatch(self):
+        """Admit queued callers in priority order while capacity allows."""
+        self._timer = None
+        while self._waiters and self.active < self.max_concurrency:
+            _, _, tokens, enqueued_at, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(tokens))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self.active += 1
+            self.admitted += 1
+            self._wait_times.append(time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def _kick(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    async def acquire(self, tokens: int, level: Optional[int] = None):
+        """Wait for an admission slot for a call of roughly `tokens` tokens."""
+        level = current_priority() if level is None else level
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters, (level, next(self._sequence), tokens, time.monotonic(), future)
+        )
+        self._kick()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._kick()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, level: Optional[int] = None):
+        """Hold one admission slot for the duration of the block (e.g. a stream)."""
+        await self.acquire(tokens, level)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def run(self, call: Callable[[], Awaitable[Any]], tokens: int,
+                  level: Optional[int] = None) -> Any:
+        """Admit and run call(), retrying retryable errors with jittered backoff."""
+        attempt = 0
+        while True:
+            async with self.slot(tokens, level):
+                try:
+                    return await call()
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        self.failures += 1
+                        raise
+                    error = e
+            self.retries += 1
+            delay = self._backoff(attempt)
+            print(f"Retrying model call in {delay:.1f}s after: {error}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for level, _, _, _, future in self._waiters:
+            if not future.done():
+                queued[PRIORITY_NAMES.get(level, str(level))] += 1
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(queued.values()),
+            "queued_by_priority": queued,
+            "admitted": self.admitted,
+            "retries": self.retries,
+            "failures": self.failures,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                "p99": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 1) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 1) if waits else 0.0,
+            },
+        }
+
+
+llm_scheduler = LLMScheduler(
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+)
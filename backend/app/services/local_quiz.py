@@ -0,0 +1,224 @@
+import random
+import re
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.services.keyphrase_extractor import keyphrase_extractor
+from app.services.text_index import segment_sentences
+
+BLANK = "_____"
+# Verbs that turn "<term> is ..." into a definition.
+_DEFINING = r"(?:is|are|was|were|refers? to|means?|describes?|denotes?|can be defined as)"
+
+
+class MaterialIndex(NamedTuple):
+    sentences: List[str]
+    terms: List[str]                    # key terms, best first
+    mentions: Dict[int, List[int]]      # term -> sentences that mention it, in order
+    definitions: Dict[int, int]         # term -> first sentence that defines it
+
+
+class LocalQuizGenerator:
+    """Offline cloze, true/false and term-definition items built from the material itself.
+
+    Key terms come from KeyphraseExtractor; every sentence is scanned once
+    with a single alternation of all terms, and distractors are other key
+    terms, preferring ones of the same length in words.
+    """
+
+    QUIZ_PATTERN = ("mcq", "true_false", "mcq", "short_answer", "true_false")
+
+    def __init__(self, max_terms: int = 40, answer_terms: int = 15, min_sentence_words: int = 6,
+                 max_sentence_words: int = 45, options: int = 4):
+        self.max_terms = max_terms
+        self.answer_terms = answer_terms
+        self.min_sentence_words = min_sentence_words
+        self.max_sentence_words = max_sentence_words
+        self.options = options
+
+    @staticmethod
+    def _pattern(term: str) -> str:
+        return r"[\s-]+".join(re.escape(word) for word in term.split())
+
+    def index(self, text: str, terms: Optional[List[str]] = None) -> Optional[MaterialIndex]:
+        """Segment the text and map each key term to the sentences that use it."""
+        terms = terms or keyphrase_extractor.extract(text, top_k=self.max_terms)
+        sentences = [
+            s for s in segment_sentences(text)
+            if self.min_sentence_words <= len(s.split()) <= self.max_sentence_words
+        ]
+        if not terms or not sentences:
+            return None
+
+        # Longest terms first so "cell membrane" wins over "cell".
+        order = sorted(range(len(terms)), key=lambda i: -len(terms[i]))
+        finder = re.compile(
+            r"\b(?:" + "|".join(f"(?P<t{i}>{self._pattern(terms[i])})" for i in order) + r")\b",
+            re.IGNORECASE,
+        )
+        definers = {}
+        mentions: Dict[int, List[int]] = {}
+        definitions: Dict[int, int] = {}
+        for s, sentence in enumerate(sentences):
+            seen = set()
+            for match in finder.finditer(sentence):
+                t = int(match.lastgroup[1:])
+                if t in seen:
+                    continue
+                seen.add(t)
+                mentions.setdefault(t, []).append(s)
+                if t not in definitions and match.start() <= 4:
+                    if t not in definers:
+                        definers[t] = re.compile(
+                            rf"^(?:(?:an?|the)\s+)?{self._pattern(terms[t])}\s+{_DEFINING}\s+\w",
+                            re.IGNORECASE,
+                        )
+                    if definers[t].match(sentence):
+                        definitions[t] = s
+        return MaterialIndex(sentences, terms, mentions, definitions)
+
+    def _pairs(self, index: MaterialIndex) -> Iterator[Tuple[int, int]]:
+        """(term, sentence) pairs, round-robin over the top terms so each is covered early.
+
+        Weaker terms only serve as distractors.
+        """
+        depth = 0
+        while True:
+            found = False
+            for t in range(min(self.answer_terms, len(index.terms))):
+                sentences = index.mentions.get(t, [])
+                if depth < len(sentences):
+                    found = True
+                    yield t, sentences[depth]
+            if not found:
+                return
+            depth += 1
+
+    def _distractors(self, index: MaterialIndex, t: int, sentence: str, rng: random.Random,
+                     count: int) -> List[str]:
+        """Other key terms, same word count first, none of which already appear in the sentence."""
+        lowered = sentence.lower()
+        words = len(index.terms[t].split())
+        pool = [
+            term for i, term in enumerate(index.terms)
+            if i != t and term.lower() not in lowered and term.lower() != index.terms[t].lower()
+        ]
+        rng.shuffle(pool)
+        pool.sort(key=lambda term: len(term.split()) != words)
+        return pool[:count]
+
+    def _blank(self, index: MaterialIndex, t: int, sentence: str) -> str:
+        return re.sub(rf"\b{self._pattern(index.terms[t])}\b", BLANK, sentence, flags=re.IGNORECASE)
+
+    def _cloze_question(self, index: MaterialIndex, t: int, s: int, rng: random.Random) -> Optional[dict]:
+        sentence = index.sentences[s]
+        distractors = self._distractors(index, t, sentence, rng, self.options - 1)
+        if not distractors:
+            return None
+        options = [index.terms[t], *distractors]
+        rng.shuffle(options)
+        return {
+            "type": "mcq",
+            "question": f"Fill in the blank: {self._blank(index, t, sentence)}",
+            "options": options,
+            "correct_answer": index.terms[t],
+            "explanation": f"The material states: \"{sentence}\"",
+        }
+
+    def _true_false_question(self, index: MaterialIndex, t: int, s: int, rng: random.Random) -> dict:
+        sentence = index.sentences[s]
+        distractors = self._distractors(index, t, sentence, rng, 1)
+        if distractors and rng.random() < 0.5:
+            altered = self._blank(index, t, sentence).replace(BLANK, distractors[0])
+            return {
+                "type": "true_false",
+                "question": altered,
+                "correct_answer": "False",
+                "explanation": f"The material states: \"{sentence}\"",
+            }
+        return {
+            "type": "true_false",
+            "question": sentence,
+            "correct_answer": "True",
+            "explanation": "This statement is taken directly from the material.",
+        }
+
+    def _definition_question(self, index: MaterialIndex, t: int) -> dict:
+        return {
+            "type": "short_answer",
+            "question": f"What is meant by \"{index.terms[t]}\"?",
+            "correct_answer": index.sentences[index.definitions[t]],
+            "explanation": f"\"{index.terms[t]}\" is defined in the material.",
+        }
+
+    @staticmethod
+    def _rng(text: str) -> random.Random:
+        """Seeded by the text, so the same material always yields the same draft."""
+        return random.Random(zlib.crc32(text.encode("utf-8", "ignore")))
+
+    def quiz(self, text: str, num_questions: int = 10, terms: Optional[List[str]] = None) -> List[dict]:
+        """A mix of fill-in-the-blank MCQ, true/false and definition questions."""
+        index = self.index(text, terms)
+        if index is None:
+            return []
+        rng = self._rng(text)
+        pairs = self._pairs(index)
+        definitions = iter(sorted(index.definitions.items()))
+        used = set()
+        questions = []
+        exhausted = set()
+        position = 0
+        while len(questions) < num_questions and len(exhausted) < len(set(self.QUIZ_PATTERN)):
+            kind = self.QUIZ_PATTERN[position % len(self.QUIZ_PATTERN)]
+            position += 1
+            if kind in exhausted:
+                continue
+            if kind == "short_answer":
+                entry = next(((t, s) for t, s in definitions if s not in used), None)
+                if entry is None:
+                    exhausted.add(kind)
+                    continue
+                used.add(entry[1])
+                questions.append(self._definition_question(index, entry[0]))
+                continue
+
+            entry = next(((t, s) for t, s in pairs if s not in used), None)
+            if entry is None:
+                exhausted.update(("mcq", "true_false"))
+                continue
+            t, s = entry
+            used.add(s)
+            if kind == "mcq":
+                question = self._cloze_question(index, t, s, rng)
+            else:
+                question = self._true_false_question(index, t, s, rng)
+            if question is not None:
+                questions.append(question)
+        return questions
+
+    def flashcards(self, text: str, num_cards: int = 15, terms: Optional[List[str]] = None) -> List[dict]:
+        """Term-definition cards for every defined key term, then cloze cards."""
+        index = self.index(text, terms)
+        if index is None:
+            return []
+        cards = [
+            {"front": index.terms[t], "back": index.sentences[s], "category": "Key Terms"}
+            for t, s in sorted(index.definitions.items())
+        ][:num_cards]
+        used = {card["back"] for card in cards}
+        for t, s in self._pairs(index):
+            if len(cards) >= num_cards:
+                break
+            if index.sentences[s] in used:
+                continue
+            used.add(index.sentences[s])
+            cards.append({
+                "front": self._blank(index, t, index.sentences[s]),
+                "back": index.terms[t],
+                "category": "Fill in the Blank",
+            })
+        return cards
+
+
+local_quiz_generator = LocalQuizGenerator(max_terms=settings.LOCAL_QUIZ_MAX_TERMS)
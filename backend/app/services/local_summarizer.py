@@ -0,0 +1,121 @@
+import re
+from typing import List, Optional
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.config import settings
+from app.services.text_index import segment_sentences
+
+
+class LocalSummarizer:
+    """Offline extractive summarizer: TF-IDF sentence vectors ranked with TextRank.
+
+    The sentence similarity graph S = X·Xᵀ is never materialized; each
+    power iteration multiplies by X and Xᵀ instead, so ranking stays linear
+    in the number of non-zero TF-IDF weights even for textbook-size input.
+    """
+
+    def __init__(self, max_words: int = 350, damping: float = 0.85, iterations: int = 30,
+                 min_sentence_words: int = 5, max_sentence_words: int = 60,
+                 redundancy_threshold: float = 0.7):
+        self.max_words = max_words
+        self.damping = damping
+        self.iterations = iterations
+        self.min_sentence_words = min_sentence_words
+        self.max_sentence_words = max_sentence_words
+        self.redundancy_threshold = redundancy_threshold
+
+    def rank_sentences(self, matrix) -> np.ndarray:
+        """TextRank scores for the rows of an L2-normalized sentence matrix."""
+        n = matrix.shape[0]
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        transposed = matrix.T.tocsr()
+        # Similarity to every other sentence (the diagonal is 1 for non-empty rows).
+        self_similarity = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        degree = matrix @ (transposed @ np.ones(n, dtype=np.float32)) - self_similarity
+        degree = np.maximum(degree, 1e-6)
+
+        scores = np.full(n, 1.0 / n, dtype=np.float32)
+        for _ in range(self.iterations):
+            spread = scores / degree
+            scores = (1 - self.damping) / n + self.damping * (
+                matrix @ (transposed @ spread) - self_similarity * spread
+            )
+        return scores
+
+    def _select(self, sentences: List[str], matrix, scores: np.ndarray, max_words: int) -> List[int]:
+        """Pick top-ranked, non-redundant sentences until the word budget is spent."""
+        chosen, words = [], 0
+        for i in np.argsort(-scores):
+            length = len(sentences[i].split())
+            if length < self.min_sentence_words or length > self.max_sentence_words:
+                continue
+            if words + length > max_words:
+                if words >= max_words * 0.8:
+                    break
+                continue
+            if chosen:
+                overlap = (matrix[chosen] @ matrix[i].T).max()
+                if overlap > self.redundancy_threshold:
+                    continue
+            chosen.append(int(i))
+            words += length
+        return sorted(chosen)
+
+    @staticmethod
+    def _section_title(vectorizer: TfidfVectorizer, matrix, rows: List[int], sentences: List[str]) -> str:
+        """Name a section after its two heaviest terms, keeping their original casing."""
+        weights = np.asarray(matrix[rows].sum(axis=0)).ravel()
+        if not weights.any():
+            return "Key Points"
+        section_text = " ".join(sentences[i] for i in rows)
+        names = []
+        for term in vectorizer.get_feature_names_out()[np.argsort(-weights)[:2]]:
+            found = re.search(rf"\b{re.escape(term)}\b", section_text, re.IGNORECASE)
+            name = found.group() if found else term
+            names.append(name[0].upper() + name[1:])
+        return " & ".join(names)
+
+    def summarize(self, text: str, max_words: Optional[int] = None) -> str:
+        """Summarize text as markdown sections of its most central sentences."""
+        max_words = max_words or self.max_words
+        sentences = segment_sentences(text)
+        if not sentences:
+            return "## Summary\n\nNo content to summarize."
+
+        vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True, dtype=np.float32)
+        try:
+            matrix = vectorizer.fit_transform(sentences)
+        except ValueError:
+            # Only stopwords or punctuation: nothing to rank.
+            return "## Summary\n\n" + " ".join(sentences)[:2000]
+
+        scores = self.rank_sentences(matrix)
+        chosen = self._select(sentences, matrix, scores, max_words)
+        if not chosen:
+            chosen = sorted(int(i) for i in np.argsort(-scores)[:5])
+
+        # Group the picks into contiguous sections of the document.
+        section_count = max(1, min(4, len(chosen) // 3))
+        bounds = np.linspace(0, len(sentences), section_count + 1)
+        parts = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            rows = [i for i in chosen if start <= i < end]
+            if not rows:
+                continue
+            title = self._section_title(vectorizer, matrix, rows, sentences)
+            bullets = "\n".join(f"- {self._emphasize(sentences[i], title)}" for i in rows)
+            parts.append(f"## {title}\n\n{bullets}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _emphasize(sentence: str, title: str) -> str:
+        """Bold the section's key terms inside a sentence."""
+        for term in title.split(" & "):
+            sentence = re.sub(rf"\b({re.escape(term)})\b", r"**\1**", sentence, count=1, flags=re.IGNORECASE)
+        return sentence
+
+
+local_summarizer = LocalSummarizer(max_words=settings.LOCAL_SUMMARY_MAX_WORDS)
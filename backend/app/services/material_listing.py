@@ -0,0 +1,131 @@
+import base64
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.services.content_store import CONTENT_FIELDS, content_store
+
+PREVIEW_CHARS = 200
+# Generated artifacts and the flag kept next to each, so listing never reads the artifact.
+ARTIFACT_FLAGS = {
+    "summary": "has_summary",
+    "flashcards": "has_flashcards",
+    "quizzes": "has_quizzes",
+    "study_plan": "has_study_plan",
+}
+LIST_FIELDS = {
+    "title": 1,
+    "subject": 1,
+    "file_type": 1,
+    "created_at": 1,
+    "content_preview": 1,
+    **{flag: 1 for flag in ARTIFACT_FLAGS.values()},
+}
+_EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidCursor(ValueError):
+    """A listing cursor that was not returned by MaterialListing.page."""
+
+
+def content_preview(text: str) -> str:
+    return text[:PREVIEW_CHARS] + "..." if len(text) > PREVIEW_CHARS else text
+
+
+def artifact_fields(values: dict) -> dict:
+    """values (artifact name -> generated value or None) plus the matching has_* flags, for $set."""
+    return {
+        **values,
+        **{flag: values[name] is not None for name, flag in ARTIFACT_FLAGS.items() if name in values},
+    }
+
+
+def listing_fields(text: str) -> dict:
+    """Preview and flags for a new or replaced material, whose artifacts are all empty."""
+    return {"content_preview": content_preview(text), **{flag: False for flag in ARTIFACT_FLAGS.values()}}
+
+
+def encode_cursor(created_at: datetime, material_id: ObjectId) -> str:
+    # MongoDB stores dates to the millisecond, so this round-trips exactly.
+    millis = (created_at.replace(tzinfo=None) - _EPOCH) // timedelta(milliseconds=1)
+    return base64.urlsafe_b64encode(f"{millis}:{material_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        millis, material_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        return _EPOCH + timedelta(milliseconds=int(millis)), ObjectId(material_id)
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+
+class MaterialListing:
+    """Pages of a user's materials, newest first, read from their listing fields only.
+
+    Pages are keyed on (created_at, _id) rather than skipped over, so each
+    page is one range scan of the (user_id, [subject,] created_at, _id)
+    index however deep it is. Materials stored before the preview and
+    has_* fields existed get them written the first time they are listed.
+    """
+
+    def __init__(self):
+        self.materials = None
+        self.pages = 0
+        self.backfilled = 0
+
+    def set_db(self, database):
+        self.materials = database.materials if database is not None else None
+
+    async def _backfill(self, docs: List[dict]):
+        fields = {**CONTENT_FIELDS, **{name: 1 for name in ARTIFACT_FLAGS}}
+        async for full in self.materials.find({"_id": {"$in": [doc["_id"] for doc in docs]}}, fields):
+            update = {
+                "content_preview": content_preview(await content_store.preview(full, PREVIEW_CHARS + 1)),
+                **{flag: full.get(name) is not None for name, flag in ARTIFACT_FLAGS.items()},
+            }
+            await self.materials.update_one({"_id": full["_id"]}, {"$set": update})
+            next(doc for doc in docs if doc["_id"] == full["_id"]).update(update)
+            self.backfilled += 1
+
+    async def page(self, user_id: str, subject: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """One page of listing entries and the cursor for the next page (None on the last)."""
+        query = {"user_id": user_id}
+        if subject is not None:
+            query["subject"] = subject
+        if cursor:
+            created_at, material_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": material_id}},
+            ]
+
+        docs = await self.materials.find(query, LIST_FIELDS).sort(
+            [("created_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        more = len(docs) > limit
+        docs = docs[:limit]
+        self.pages += 1
+
+        legacy = [doc for doc in docs if "content_preview" not in doc]
+        if legacy:
+            await self._backfill(legacy)
+
+        entries = [{
+            "id": str(doc["_id"]),
+            "title": doc["title"],
+            "content_preview": doc["content_preview"],
+            "subject": doc.get("subject"),
+            "file_type": doc.get("file_type"),
+            "created_at": doc["created_at"].isoformat(),
+            **{flag: doc.get(flag, False) for flag in ARTIFACT_FLAGS.values()},
+        } for doc in docs]
+        next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"]) if more else None
+        return entries, next_cursor
+
+    def stats(self) -> dict:
+        return {"pages": self.pages, "backfilled": self.backfilled}
+
+
+material_listing = MaterialListing()
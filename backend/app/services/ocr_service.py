@@ -0,0 +1,112 @@
+import asyncio
+import os
+from typing import Awaitable, Dict, List
+
+from app.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.services.llm_metrics import llm_metrics
+from app.services.llm_provider import llm_provider
+
+
+class OCRService:
+    """Async LLM OCR fallback for files that local extraction could not read.
+
+    Only the pages local extraction left empty are sent: consecutive empty
+    pages are grouped into batches of at most batch_pages, copied into
+    sub-PDFs and read concurrently (at most concurrency calls at a time
+    across all uploads). Each file gets budget_seconds in total; batches
+    still running when it runs out are cancelled and their pages stay empty.
+    """
+
+    def __init__(self, batch_pages: int, concurrency: int, budget_seconds: float):
+        self.batch_pages = batch_pages
+        self.budget_seconds = budget_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.files = 0
+        self.batches = 0
+        self.pages = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def split(self, numbers: List[int]) -> List[List[int]]:
+        """Group page numbers into runs of consecutive pages, at most batch_pages long."""
+        batches = []
+        for number in sorted(numbers):
+            if batches and batches[-1][-1] == number - 1 and len(batches[-1]) < self.batch_pages:
+                batches[-1].append(number)
+            else:
+                batches.append([number])
+        return batches
+
+    async def _read(self, file_path: str) -> str:
+        async with self._semaphore:
+            with llm_metrics.track("ocr", llm_provider) as call:
+                text = await call.attempt(lambda: llm_provider.extract_file_text(file_path))()
+                call.completed(text)
+                return text
+
+    async def _read_batch(self, file_path: str, pages: List[int], page_count: int) -> str:
+        if len(pages) == page_count:
+            return await self._read(file_path)
+        subset_path = f"{os.path.splitext(file_path)[0]}.pages-{pages[0]}-{pages[-1]}.pdf"
+        try:
+            await asyncio.to_thread(DocumentProcessor.write_pdf_pages, file_path, pages, subset_path)
+            return await self._read(subset_path)
+        finally:
+            if os.path.exists(subset_path):
+                os.remove(subset_path)
+
+    async def _within_budget(self, jobs: Dict[int, Awaitable[str]]) -> Dict[int, str]:
+        """Run jobs concurrently; return the texts of those that succeeded within the budget."""
+        tasks = {key: asyncio.ensure_future(job) for key, job in jobs.items()}
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.budget_seconds)
+        if pending:
+            self.timeouts += 1
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        texts = {}
+        for key, task in tasks.items():
+            if task not in done:
+                continue
+            if task.exception() is not None:
+                self.failures += 1
+                print(f"LLM OCR Fallback failed: {task.exception()}")
+                continue
+            texts[key] = task.result()
+        return texts
+
+    async def read_file(self, file_path: str) -> str:
+        """OCR a whole document or image; empty on failure or timeout."""
+        self.files += 1
+        self.batches += 1
+        texts = await self._within_budget({0: self._read(file_path)})
+        return texts.get(0, "")
+
+    async def read_pages(self, file_path: str, numbers: List[int], page_count: int) -> Dict[int, str]:
+        """OCR only the given PDF pages. Returns {first page of batch: text}."""
+        batches = self.split(numbers)
+        self.files += 1
+        self.batches += len(batches)
+        self.pages += len(numbers)
+        return await self._within_budget({
+            batch[0]: self._read_batch(file_path, batch, page_count) for batch in batches
+        })
+
+    def stats(self) -> dict:
+        return {
+            "files": self.files,
+            "batches": self.batches,
+            "pages": self.pages,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "budget_seconds": self.budget_seconds,
+        }
+
+
+ocr_service = OCRService(
+    batch_pages=settings.OCR_BATCH_PAGES,
+    concurrency=settings.OCR_CONCURRENCY,
+    budget_seconds=settings.OCR_BUDGET_SECONDS,
+)
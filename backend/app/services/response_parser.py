@@ -0,0 +1,175 @@
+import json
+import re
+from typing import Any, List, NamedTuple, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Characters that affect JSON structure; everything else is skipped in bulk.
+_STRUCTURAL = re.compile(r'[\[\]{}",\\]')
+_VALUE_START = re.compile(r'[\[{]')
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+class JsonSpan(NamedTuple):
+    start: int
+    end: Optional[int]          # None when the value is truncated
+    items: List[tuple]          # (start, end) of complete top-level array elements
+    repair: Optional[str]       # truncated objects: prefix that closes cleanly at the last comma
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding markdown code block if present."""
+    text = text.strip()
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline != -1 and newline < 12 else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def _scan(text: str, start: int) -> Optional[JsonSpan]:
+    """Bracket-balance one candidate value starting at text[start].
+
+    Returns None when the brackets are mismatched before any array element
+    completed, i.e. the candidate is not JSON (for example a "[sic]" in
+    surrounding prose). A mismatch after that is treated like truncation so
+    the complete elements can still be recovered.
+    """
+    root = text[start]
+    stack = [root]
+    items = []
+    item_start = start + 1
+    in_string = False
+    escaped_at = -1
+    last_comma, last_comma_stack = None, None
+
+    for match in _STRUCTURAL.finditer(text, start + 1):
+        i = match.start()
+        ch = match.group()
+        if in_string:
+            if i == escaped_at:
+                continue
+            if ch == "\\":
+                escaped_at = i + 1
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch == "[" or ch == "{":
+            stack.append(ch)
+        elif ch == "]" or ch == "}":
+            if _CLOSERS[stack[-1]] != ch:
+                return JsonSpan(start, None, items, None) if items else None
+            stack.pop()
+            if not stack:
+                if root == "[" and text[item_start:i].strip():
+                    items.append((item_start, i))
+                return JsonSpan(start, i + 1, items, None)
+        elif ch == ",":
+            if len(stack) == 1 and root == "[":
+                items.append((item_start, i))
+                item_start = i + 1
+            last_comma, last_comma_stack = i, list(stack)
+
+    repair = None
+    if root == "{" and last_comma is not None:
+        repair = text[start:last_comma] + "".join(_CLOSERS[c] for c in reversed(last_comma_stack))
+    return JsonSpan(start, None, items, repair)
+
+
+def find_json(text: str, pos: int = 0) -> Optional[JsonSpan]:
+    """Find the next bracket-balanced JSON candidate in text at or after pos."""
+    while True:
+        match = _VALUE_START.search(text, pos)
+        if match is None:
+            return None
+        span = _scan(text, match.start())
+        if span is not None:
+            return span
+        pos = match.start() + 1
+
+
+def _loads(fragment: str) -> Any:
+    try:
+        return json.loads(fragment)
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+def _decode_span(text: str, span: JsonSpan) -> Any:
+    """Decode a candidate, salvaging complete elements or members when it is damaged."""
+    if span.end is not None:
+        value = _loads(text[span.start:span.end])
+        if value is not None:
+            return value
+
+    if span.items:
+        items = [_loads(text[s:e]) for s, e in span.items]
+        items = [item for item in items if item is not None]
+        if items:
+            return items
+    if span.repair:
+        return _loads(span.repair)
+    return None
+
+
+def parse_json(text: str) -> Any:
+    """Parse the JSON value in a model response.
+
+    Handles code fences and surrounding prose. Truncated arrays yield their
+    complete elements; truncated objects are closed at the last complete
+    member. Returns None when nothing usable is found.
+    """
+    text = strip_code_fences(text)
+    value = _loads(text)
+    if value is not None:
+        return value
+
+    span = find_json(text)
+    while span is not None:
+        value = _decode_span(text, span)
+        if value is not None or span.end is None:
+            return value
+        # A balanced but undecodable candidate (e.g. "[sic]" in prose): keep looking.
+        span = find_json(text, span.start + 1)
+    return None
+
+
+def validate_items(items: Any, schema: Type[BaseModel]) -> List[dict]:
+    """Keep the items that validate against schema, normalized to plain dicts."""
+    if not isinstance(items, list):
+        return []
+    valid = []
+    for item in items:
+        try:
+            valid.append(schema.model_validate(item).model_dump())
+        except ValidationError:
+            continue
+    return valid
+
+
+def parse_items(text: str, schema: Type[BaseModel]) -> List[dict]:
+    """Parse a JSON array response and return its schema-valid items."""
+    return validate_items(parse_json(text), schema)
+
+
+def parse_strings(text: str) -> List[str]:
+    """Parse a JSON array of strings, dropping non-string and blank entries."""
+    value = parse_json(text)
+    if not isinstance(value, list):
+        return []
+    return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+
+def parse_object(text: str, schema: Type[BaseModel]) -> Optional[dict]:
+    """Parse a JSON object response; None unless it validates against schema."""
+    value = parse_json(text)
+    if not isinstance(value, dict):
+        return None
+    try:
+        return schema.model_validate(value).model_dump()
+    except ValidationError:
+        return None
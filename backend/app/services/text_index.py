@@ -0,0 +1,202 @@
+import hashlib
+import re
+import sys
+import zlib
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+import bson
+
+from app.services.chunking import Chunk, chunk_spans, estimate_tokens
+from app.services.content_store import content_store
+from app.services.document_processor import DocumentProcessor
+
+# Bump when sentence, paragraph or chunk segmentation changes; older indexes are rebuilt.
+INDEX_VERSION = 1
+HASH_BYTES = 32
+# Material fields an index can be stored in: index_blob, or text_index inline before it.
+INDEX_FIELDS = {"index_blob": 1, "text_index": 1}
+
+_PARAGRAPH_GAP = re.compile(r"\n\s*\n")
+
+_current_index: ContextVar[Optional["TextIndex"]] = ContextVar("text_index", default=None)
+
+
+def _pack(values) -> bytes:
+    """Little-endian uint32 array."""
+    packed = array("I", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data: bytes) -> array:
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _pairs(flat: array) -> List[tuple]:
+    return list(zip(flat[0::2], flat[1::2]))
+
+
+class TextIndex:
+    """Offsets of a material's sentences, paragraphs and chunks, built once at upload.
+
+    Spans are stored as flat uint32 [start, end, start, end, ...] arrays
+    and chunk hashes as concatenated SHA-256 digests, a few bytes per
+    sentence, kept through content_store in the material's `index_blob`
+    so large indexes go to GridFS with large texts. Features slice the
+    content by offset instead of segmenting it again; the index is only
+    used for the exact text it was built from (length and CRC-32 match).
+    """
+
+    def __init__(self, length: int, checksum: int, chunk_tokens: int, sentences: array,
+                 paragraphs: array, chunks: array, tokens: array, hashes: bytes):
+        self.length = length
+        self.checksum = checksum
+        self.chunk_tokens = chunk_tokens
+        self.sentences = sentences
+        self.paragraphs = paragraphs
+        self.chunks = chunks
+        self.tokens = tokens
+        self.hashes = hashes
+        # The last text matches() accepted, so repeated lookups skip the CRC.
+        self._verified: Optional[str] = None
+
+    @classmethod
+    def build(cls, text: str, chunk_tokens: int) -> "TextIndex":
+        sentence_spans = DocumentProcessor.sentence_spans(text)
+        paragraphs = []
+        start = 0
+        for gap in _PARAGRAPH_GAP.finditer(text):
+            if text[start:gap.start()].strip():
+                paragraphs.extend((start, gap.start()))
+            start = gap.end()
+        if text[start:].strip():
+            paragraphs.extend((start, len(text.rstrip())))
+
+        chunks = chunk_spans(text, chunk_tokens, sentence_spans)
+        return cls(
+            length=len(text),
+            checksum=zlib.crc32(text.encode("utf-8")),
+            chunk_tokens=chunk_tokens,
+            sentences=array("I", (offset for span in sentence_spans for offset in span)),
+            paragraphs=array("I", paragraphs),
+            chunks=array("I", (offset for span in chunks for offset in span)),
+            tokens=array("I", (estimate_tokens(text[start:end]) for start, end in chunks)),
+            hashes=b"".join(hashlib.sha256(text[start:end].encode("utf-8")).digest() for start, end in chunks),
+        )
+
+    def to_document(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "length": self.length,
+            "checksum": self.checksum,
+            "chunk_tokens": self.chunk_tokens,
+            "sentences": _pack(self.sentences),
+            "paragraphs": _pack(self.paragraphs),
+            "chunks": _pack(self.chunks),
+            "tokens": _pack(self.tokens),
+            "hashes": self.hashes,
+        }
+
+    @classmethod
+    def from_document(cls, doc: Optional[dict]) -> Optional["TextIndex"]:
+        """The stored index, or None when missing or built by another INDEX_VERSION."""
+        if not doc or doc.get("version") != INDEX_VERSION:
+            return None
+        return cls(
+            length=doc["length"],
+            checksum=doc["checksum"],
+            chunk_tokens=doc["chunk_tokens"],
+            sentences=_unpack(doc["sentences"]),
+            paragraphs=_unpack(doc["paragraphs"]),
+            chunks=_unpack(doc["chunks"]),
+            tokens=_unpack(doc["tokens"]),
+            hashes=bytes(doc["hashes"]),
+        )
+
+    def to_bytes(self) -> bytes:
+        return bson.encode(self.to_document())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["TextIndex"]:
+        return cls.from_document(bson.decode(data))
+
+    def matches(self, text: str, chunk_tokens: Optional[int] = None) -> bool:
+        """Whether this index describes text (and, if given, its chunking at chunk_tokens)."""
+        if chunk_tokens is not None and chunk_tokens != self.chunk_tokens:
+            return False
+        if text is self._verified:
+            return True
+        if len(text) == self.length and zlib.crc32(text.encode("utf-8")) == self.checksum:
+            self._verified = text
+            return True
+        return False
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(values) * values.itemsize for values in
+                   (self.sentences, self.paragraphs, self.chunks, self.tokens)) + len(self.hashes)
+
+    def sentence_spans(self) -> List[tuple]:
+        return _pairs(self.sentences)
+
+    def sentence_texts(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in _pairs(self.sentences)]
+
+    def paragraph_texts(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in _pairs(self.paragraphs)]
+
+    def chunk_list(self, text: str) -> List[Chunk]:
+        """The chunks chunk_text(text, chunk_tokens) would return."""
+        return [
+            Chunk(index=i, text=text[start:end], start=start, end=end, tokens=self.tokens[i])
+            for i, (start, end) in enumerate(_pairs(self.chunks))
+        ]
+
+    def chunk_hashes(self) -> List[str]:
+        return [self.hashes[i:i + HASH_BYTES].hex() for i in range(0, len(self.hashes), HASH_BYTES)]
+
+
+async def index_fields(index: TextIndex) -> dict:
+    """Material fields to $set for a new or rebuilt index."""
+    return {"index_blob": await content_store.prepare_blob(index.to_bytes()), "text_index": None}
+
+
+async def load_index(doc: dict) -> Optional[TextIndex]:
+    """The index of a material fetched with INDEX_FIELDS, or None when it has none usable."""
+    if doc.get("index_blob"):
+        return TextIndex.from_bytes(await content_store.load_blob(doc["index_blob"]))
+    return TextIndex.from_document(doc.get("text_index"))
+
+
+@contextmanager
+def index_scope(index: Optional[TextIndex]):
+    """Let code in the enclosed block use a material's stored index."""
+    token = _current_index.set(index)
+    try:
+        yield
+    finally:
+        _current_index.reset(token)
+
+
+def current_index(text: str, chunk_tokens: Optional[int] = None) -> Optional[TextIndex]:
+    """The index in scope, if it was built from text."""
+    index = _current_index.get()
+    if index is not None and index.matches(text, chunk_tokens):
+        return index
+    return None
+
+
+def segment_sentences(text: str) -> List[str]:
+    """DocumentProcessor.segment_sentences, from the stored index when one is in scope."""
+    index = current_index(text)
+    if index is not None:
+        return index.sentence_texts(text)
+    return DocumentProcessor.segment_sentences(text)
@@ -0,0 +1,98 @@
+import re
+from typing import Iterable, Iterator, TextIO
+
+# Characters outside this set carry no meaning for study material and are dropped.
+_DROPPED = re.compile(r"[^\w\s.,;:!?\-'\"()\[\]{}/\\@#$%&*+=<>~`^|]+")
+# "end.Next" -> "end. Next"
+_SENTENCE = re.compile(r"\.(?=[A-Z])")
+# Two line breaks with only whitespace between them separate paragraphs. Anchored on
+# the line break so the scanner skips ahead instead of trying every position.
+_PARAGRAPH = re.compile(r"\n[^\S\n]*\n\s*")
+
+
+def read_segments(handle: TextIO, segment_chars: int) -> Iterator[str]:
+    """Read a text file as segments of at most segment_chars characters."""
+    while True:
+        segment = handle.read(segment_chars)
+        if not segment:
+            return
+        yield segment
+
+
+class TextNormalizer:
+    """Streaming replacement for the old four-pass clean_text.
+
+    Segments (pages, file reads) are normalized as they arrive: characters
+    without meaning are dropped, missing sentence spaces inserted,
+    whitespace inside a paragraph collapses to single spaces, and paragraph
+    breaks are kept as a blank line. Only the unfinished word at the end of
+    a segment is carried over, so working memory is bounded by the segment
+    size (a single word longer than max_carry is cut).
+    """
+
+    def __init__(self, max_carry: int = 65536):
+        self.max_carry = max_carry
+
+    def _split(self, text: str) -> tuple:
+        """Split off the trailing whitespace run and partial word to carry into the next segment."""
+        end = start = len(text)
+        while start and not text[start - 1].isspace():
+            start -= 1
+            if end - start > self.max_carry:
+                return text, ""
+        while start and text[start - 1].isspace():
+            start -= 1
+        return text[:start], text[start:]
+
+    def iter_normalized(self, segments: Iterable[str]) -> Iterator[str]:
+        """Yield normalized text pieces; their concatenation is the cleaned document."""
+        carry = ""
+        started = False
+        pending = ""  # separator owed before the next word: "", " " or "\n\n"
+        segments = iter(segments)
+        finished = False
+        while not finished:
+            segment = next(segments, None)
+            if segment is None:
+                finished = True
+                ready, carry = carry, ""
+            else:
+                ready, carry = self._split(carry + segment)
+            edited = _SENTENCE.sub(". ", _DROPPED.sub("", ready))
+            if not finished:
+                # A trailing word made only of dropped characters leaves whitespace that
+                # may belong to the same run as the start of the next segment.
+                kept = edited.rstrip()
+                edited, carry = kept, edited[len(kept):] + carry
+            if not edited:
+                continue
+
+            for i, paragraph in enumerate(_PARAGRAPH.split(edited)):
+                if i:
+                    pending = "\n\n"
+                words = paragraph.split()
+                if not words:
+                    if paragraph and not pending:
+                        pending = " "
+                    continue
+                if paragraph[0].isspace() and not pending:
+                    pending = " "
+                if started and pending:
+                    yield pending
+                yield " ".join(words)
+                started = True
+                pending = " " if paragraph[-1].isspace() else ""
+
+    def normalize(self, segments: Iterable[str]) -> str:
+        return "".join(self.iter_normalized(segments))
+
+    def normalize_pages(self, pages: Iterable[str]) -> str:
+        """Normalize page texts, with a paragraph break between pages."""
+        def separated():
+            for page in pages:
+                yield page
+                yield "\n\n"
+        return self.normalize(separated())
+
+
+text_normalizer = TextNormalizer()
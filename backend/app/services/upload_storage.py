@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+import zipfile
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+MB = 1024 * 1024
+# Room for the multipart framing and the other form fields of an upload request.
+FORM_OVERHEAD = MB
+
+
+class UploadTooLarge(ValueError):
+    """The upload exceeds the size limit for its file type."""
+
+    def __init__(self, file_type: str, limit: int):
+        super().__init__(f"{file_type} uploads are limited to {limit // MB} MB")
+        self.file_type = file_type
+        self.limit = limit
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    elapsed: float
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.size / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    file_type: str
+    stored: Optional[StoredUpload]
+    error: Optional[str] = None
+
+
+def parse_type_limits(spec: str) -> Dict[str, int]:
+    """Parse "pdf:100,png:25" into {"pdf": 100 MB, "png": 25 MB} in bytes."""
+    limits = {}
+    for entry in spec.split(","):
+        if ":" not in entry:
+            continue
+        file_type, megabytes = entry.split(":", 1)
+        limits[file_type.strip().lower()] = int(float(megabytes) * MB)
+    return limits
+
+
+class UploadStorage:
+    """Streams uploads to disk chunk by chunk, hashing them on the way.
+
+    Only one chunk is held in memory per upload and disk writes run in a
+    worker thread, so large scans neither exhaust memory nor block the
+    event loop. By the time a route runs, Starlette has already spooled
+    the whole form to temporary files, so RequestSizeLimit rejects
+    oversized requests from their Content-Length before that; save()
+    then applies the limit for the file's type.
+    """
+
+    def __init__(self, chunk_bytes: int, default_limit: int, type_limits: Dict[str, int]):
+        self.chunk_bytes = chunk_bytes
+        self.default_limit = default_limit
+        self.type_limits = type_limits
+        self.uploads = 0
+        self.rejected = 0
+        self.bytes = 0
+        self._rates = deque(maxlen=1000)
+
+    def limit(self, file_type: str) -> int:
+        return self.type_limits.get(file_type, self.default_limit)
+
+    def request_limit(self, file_types) -> int:
+        """Largest request body that can carry one file of any of file_types."""
+        return max(self.limit(file_type) for file_type in file_types) + FORM_OVERHEAD
+
+    async def save(self, upload: UploadFile, directory: str, file_type: str) -> StoredUpload:
+        """Write an upload to a uniquely named file and return its path, size and SHA-256."""
+        limit = self.limit(file_type)
+        # upload.size counts the bytes Starlette has already spooled; checking it
+        # only spares copying a file that is over its type's limit.
+        if upload.size is not None and upload.size > limit:
+            self.rejected += 1
+            raise UploadTooLarge(file_type, limit)
+
+        path = os.path.join(directory, f"{uuid.uuid4()}.{file_type}")
+        digest = hashlib.sha256()
+        size = 0
+        started = time.perf_counter()
+        handle = await asyncio.to_thread(open, path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(self.chunk_bytes)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    self.rejected += 1
+                    raise UploadTooLarge(file_type, limit)
+                digest.update(chunk)
+                await asyncio.to_thread(handle.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(self.remove, path)
+            raise
+        await asyncio.to_thread(handle.close)
+
+        stored = StoredUpload(path, size, digest.hexdigest(), time.perf_counter() - started)
+        self.uploads += 1
+        self.bytes += size
+        self._rates.append(stored.bytes_per_second)
+        return stored
+
+    def _unpack_entry(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo, directory: str,
+                      file_type: str) -> StoredUpload:
+        limit = self.limit(file_type)
+        if info.file_size > limit:
+            raise UploadTooLarge(file_type, limit)
+        path = os.path.join(directory, f"{uuid.uuid4()}.{file_type}")
+        digest = hashlib.sha256()
+        size = 0
+        started = time.perf_counter()
+        try:
+            with archive.open(info) as source, open(path, "wb") as target:
+                while True:
+                    chunk = source.read(self.chunk_bytes)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    # The declared size in the archive is not trusted.
+                    if size > limit:
+                        raise UploadTooLarge(file_type, limit)
+                    digest.update(chunk)
+                    target.write(chunk)
+        except BaseException:
+            self.remove(path)
+            raise
+        return StoredUpload(path, size, digest.hexdigest(), time.perf_counter() - started)
+
+    def unpack_archive(self, archive_path: str, directory: str, file_types: List[str],
+                       max_entries: int, max_total: int) -> List[ArchiveEntry]:
+        """Stream each file of a ZIP archive to its own uniquely named file.
+
+        Blocking; run it in a thread. Entries of other types, folders and
+        macOS metadata are skipped; unpacking stops once max_entries files
+        or max_total uncompressed bytes have been written.
+        """
+        entries = []
+        written = total = 0
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                base = os.path.basename(name)
+                if info.is_dir() or name.startswith("__MACOSX/") or not base or base.startswith("."):
+                    continue
+                file_type = base.rsplit(".", 1)[-1].lower() if "." in base else ""
+                if file_type not in file_types:
+                    entries.append(ArchiveEntry(name, file_type, None, "Unsupported file type"))
+                    continue
+                if written >= max_entries:
+                    entries.append(ArchiveEntry(name, file_type, None, f"Archive holds more than {max_entries} files"))
+                    break
+                if total + info.file_size > max_total:
+                    entries.append(ArchiveEntry(name, file_type, None,
+                                                f"Archive expands to more than {max_total // MB} MB"))
+                    break
+                try:
+                    stored = self._unpack_entry(archive, info, directory, file_type)
+                except (UploadTooLarge, zipfile.BadZipFile, OSError) as e:
+                    self.rejected += 1
+                    entries.append(ArchiveEntry(name, file_type, None, str(e)))
+                    continue
+                written += 1
+                total += stored.size
+                self.uploads += 1
+                self.bytes += stored.size
+                entries.append(ArchiveEntry(name, file_type, stored))
+        return entries
+
+    @staticmethod
+    def remove(path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def stats(self) -> dict:
+        rates = sorted(self._rates)
+        return {
+            "uploads": self.uploads,
+            "rejected": self.rejected,
+            "bytes": self.bytes,
+            "chunk_bytes": self.chunk_bytes,
+            "bytes_per_second": {
+                "p50": round(rates[len(rates) // 2]) if rates else 0,
+                "min": round(rates[0]) if rates else 0,
+                "max": round(rates[-1]) if rates else 0,
+            },
+        }
+
+
+class RequestSizeLimit:
+    """ASGI middleware answering oversized upload requests before their body is read.
+
+    limits holds (method, path pattern, max bytes) for the upload routes.
+    Requests to them are rejected with 413 when their Content-Length is
+    over the limit, and with 411 when they have none.
+    """
+
+    def __init__(self, app, limits: List[Tuple[str, str, int]]):
+        self.app = app
+        self.limits = [(method, re.compile(pattern), limit) for method, pattern, limit in limits]
+
+    def limit_for(self, scope: dict) -> Optional[int]:
+        for method, pattern, limit in self.limits:
+            if scope["method"] == method and pattern.fullmatch(scope["path"]):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limit_for(scope) if scope["type"] == "http" else None
+        if limit is not None:
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if not length.isdigit():
+                response = JSONResponse(
+                    status_code=411, content={"detail": "Uploads must send a Content-Length"}
+                )
+                return await response(scope, receive, send)
+            if int(length) > limit:
+                upload_storage.rejected += 1
+                response = JSONResponse(
+                    status_code=413, content={"detail": f"Upload requests are limited to {limit // MB} MB"}
+                )
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+upload_storage = UploadStorage(
+    chunk_bytes=settings.UPLOAD_CHUNK_BYTES,
+    default_limit=settings.UPLOAD_MAX_MB * MB,
+    type_limits=parse_type_limits(settings.UPLOAD_TYPE_LIMITS_MB),
+)
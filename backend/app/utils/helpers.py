@@ -1,8 +1,10 @@
+import json
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import HTTPException, status, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
 
@@ -46,3 +48,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid token payload",
         )
     return user_id
+
+async def require_admin(user_id: str = Depends(get_current_user)) -> str:
+    """Dependency restricting a route to the users listed in ADMIN_USER_IDS."""
+    admins = {admin.strip() for admin in settings.ADMIN_USER_IDS.split(",") if admin.strip()}
+    if user_id not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return user_id
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,163 @@
+"""Benchmark: material document size and read latency, inline text against ContentStore.
+
+Builds material documents for texts of each requested size (default 0.1,
+1, 10 and 40 MB of synthetic notes, plus a generated quiz, flashcards and
+a study plan) and reads them the way the routes do. "inline" is the old
+layout, the full text in `content`, fetched whole by get_material_doc;
+"store" is ContentStore's layout, fetched with CONTENT_FIELDS and
+decompressed by load(). Reports the BSON document size (16 MB is
+MongoDB's limit), bytes and time to read the text, and the time to
+build a list preview. Without --mongodb-url reads are BSON decodes in
+process; with it they are round trips to a scratch database (dropped
+afterwards), with GridFS for the largest texts.
+
+Run from the backend directory:
+    python -m benchmarks.bench_content_store [--sizes 0.1,1,10,40] [--repeat N] [--mongodb-url URL]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+import bson
+
+from app.services.content_store import CONTENT_FIELDS, ContentStore
+from benchmarks.bench_local_summarizer import build_text
+
+MONGO_LIMIT = 16 * 1024 * 1024
+
+
+def build_material(text: str) -> dict:
+    return {
+        "user_id": "bench",
+        "title": "Bench material",
+        "content": text,
+        "created_at": datetime.utcnow(),
+        "summary": "A summary. " * 40,
+        "key_concepts": [f"concept {i}" for i in range(15)],
+        "quizzes": [{"question": f"Question {i}?", "options": ["a", "b", "c", "d"], "answer": "a"}
+                    for i in range(10)],
+        "flashcards": [{"front": f"Term {i}", "back": "Definition. " * 5} for i in range(15)],
+        "study_plan": {"days": [{"day": i, "tasks": ["Read", "Review"]} for i in range(7)]},
+    }
+
+
+def timed(fn, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+async def timed_async(fn, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def project(doc: dict, fields: dict) -> dict:
+    return {name: value for name, value in doc.items() if name in fields}
+
+
+def report(mode: str, size: int, read_bytes: int, read: float, preview: float):
+    status = "over 16 MB limit" if size > MONGO_LIMIT else f"{size / 1e6:.2f} MB document"
+    print(f"  {mode:>6}: {status:>18}, read {read_bytes / 1e6:7.2f} MB in {read * 1000:8.1f} ms, "
+          f"preview {preview * 1000:7.2f} ms")
+
+
+async def bench_local(store: ContentStore, text: str, repeat: int):
+    before = build_material(text)
+    encoded = bson.encode(before)
+    read, _ = timed(lambda: bson.decode(encoded)["content"], repeat)
+    preview, _ = timed(lambda: bson.decode(encoded)["content"][:200], repeat)
+    report("inline", len(encoded), len(encoded), read, preview)
+
+    stored = store.encode(text)
+    after = {**before, **stored.fields}
+    encoded = bson.encode(after)
+    projected = bson.encode(project(after, CONTENT_FIELDS))
+    blob = stored.blob or b""
+
+    def fetch(data: bytes) -> dict:
+        doc = bson.decode(data)
+        if blob:
+            # Stands in for the GridFS download.
+            doc["content_blob"] = {**doc["content_blob"], "data": blob}
+        return doc
+
+    read, loaded = await timed_async(lambda: store.load(fetch(projected)), repeat)
+    assert loaded == text
+    preview, _ = await timed_async(lambda: store.preview(fetch(encoded), 200), repeat)
+    report("store", len(encoded), len(projected) + len(blob), read, preview)
+
+
+async def bench_mongo(store: ContentStore, database, text: str, repeat: int):
+    before = build_material(text)
+    size = len(bson.encode(before))
+    if size > MONGO_LIMIT:
+        print(f"  inline: {'over 16 MB limit':>18}, cannot be stored")
+    else:
+        material_id = (await database.materials.insert_one(before)).inserted_id
+        read, _ = await timed_async(lambda: database.materials.find_one({"_id": material_id}), repeat)
+        # Listing fetched whole documents to cut the preview from the text.
+        report("inline", size, size, read, read)
+
+    after = {**build_material(""), **await store.prepare(text)}
+    material_id = (await database.materials.insert_one(after)).inserted_id
+    blob = after["content_blob"] or {}
+
+    async def load():
+        doc = await database.materials.find_one({"_id": material_id}, CONTENT_FIELDS)
+        return await store.load(doc)
+
+    async def preview():
+        doc = await database.materials.find_one({"_id": material_id})
+        return await store.preview(doc, 200)
+
+    read, loaded = await timed_async(load, repeat)
+    assert loaded == text
+    preview_time, _ = await timed_async(preview, repeat)
+    report("store", len(bson.encode(after)), blob.get("stored", len(text)), read, preview_time)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="0.1,1,10,40", help="text sizes in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compress-min-bytes", type=int, default=16384)
+    parser.add_argument("--inline-max-bytes", type=int, default=1024 * 1024)
+    parser.add_argument("--mongodb-url", default=None)
+    args = parser.parse_args()
+
+    store = ContentStore(args.compress_min_bytes, args.inline_max_bytes, level=6)
+    block = build_text(250, 1) + "\n\n"
+    client = database = None
+    if args.mongodb_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongodb_url)
+        database = client["bench_content_store"]
+        store.set_db(database)
+
+    try:
+        for megabytes in (float(size) for size in args.sizes.split(",")):
+            text = (block * int(megabytes * 1e6 / len(block) + 1))[:int(megabytes * 1e6)]
+            print(f"{megabytes:g} MB text")
+            if database is None:
+                await bench_local(store, text, args.repeat)
+            else:
+                await bench_mongo(store, database, text, args.repeat)
+        if database is not None:
+            print(store.stats())
+    finally:
+        if client is not None:
+            await client.drop_database("bench_content_store")
+            client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
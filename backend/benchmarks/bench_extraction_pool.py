@@ -0,0 +1,86 @@
+"""Benchmark: responsiveness of the event loop during heavy extraction.
+
+Writes synthetic text files, then extracts them concurrently while a probe
+coroutine stands in for other API requests, measuring how late it gets
+scheduled. "inline" runs DocumentProcessor.extract_and_clean on the
+event loop, as upload_material used to; "pool" awaits ExtractionPool.
+
+Run from the backend directory:
+    python -m benchmarks.bench_extraction_pool [--files N] [--mb N] [--workers N]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from app.services.document_processor import DocumentProcessor
+from app.services.extraction_pool import ExtractionPool
+from benchmarks.bench_local_summarizer import build_text
+
+
+async def probe(latencies: list, stop: asyncio.Event, interval: float = 0.01):
+    """Sleep in short steps and record how late each wake-up is."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append(time.perf_counter() - started - interval)
+
+
+async def run(mode: str, paths: list, pool: ExtractionPool) -> tuple:
+    latencies, stop = [], asyncio.Event()
+    prober = asyncio.ensure_future(probe(latencies, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+
+    async def extract(path):
+        if mode == "pool":
+            return await pool.process_file(path, "txt")
+        return DocumentProcessor.extract_and_clean(path, "txt")
+
+    await asyncio.gather(*(extract(path) for path in paths))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return elapsed, sorted(latencies)
+
+
+def report(mode: str, elapsed: float, latencies: list):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{mode:>6}: extraction {elapsed:.2f} s, probe lag p50 {p50:.1f} ms, "
+          f"p99 {p99:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--mb", type=float, default=4)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = max(1, int(args.mb * 1e6 / 4400))
+    text = build_text(pages, 1)
+    directory = tempfile.mkdtemp()
+    paths = []
+    for i in range(args.files):
+        path = os.path.join(directory, f"doc{i}.txt")
+        with open(path, "w") as f:
+            f.write(text)
+        paths.append(path)
+    print(f"{args.files} files of {len(text) / 1e6:.1f} MB")
+
+    pool = ExtractionPool(workers=args.workers, queue_size=args.files, timeout=600, max_tasks_per_child=50)
+    # Start the workers before timing.
+    await pool.run(len, "warm-up")
+    try:
+        for mode in ("inline", "pool"):
+            report(mode, *await run(mode, paths, pool))
+    finally:
+        pool.shutdown()
+        for path in paths:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Benchmark: Tesseract on raw photos against the preprocessing + strip pipeline.
+
+Renders synthetic photos of notes (default 6 images of 3000x12000 pixels:
+dark text under uneven lighting, saved as JPEG) and reads them two ways:
+"raw" passes Image.open straight to pytesseract as extract_from_image
+used to; "pipeline" is ExtractionPool's preprocessing, parallel strip OCR
+and stitching. Reports latency per image and the share of images that
+came back empty. Without pytesseract only the preprocessing is timed.
+
+Run from the backend directory:
+    python -m benchmarks.bench_image_ocr [--images N] [--width N] [--height N] [--workers N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services.extraction_pool import ExtractionPool
+from app.services.image_preprocessor import image_preprocessor, pytesseract
+from benchmarks.bench_local_summarizer import build_text
+
+
+def render_photo(path: str, width: int, height: int, seed: int):
+    rng = random.Random(seed)
+    # Lighting falls off from the top-left corner, as under a desk lamp.
+    light = Image.linear_gradient("L").resize((width, height)).point(lambda v: 235 - v // 2)
+    image = Image.merge("RGB", (light, light, light))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=max(12, width // 60))
+    words = build_text(height // 400 + 1, seed).split()
+    line_height = int(font.size * 1.6)
+    y = line_height
+    while y < height - line_height:
+        line = " ".join(words[rng.randrange(len(words) - 12):][:rng.randint(6, 12)])
+        draw.text((width // 20, y), line, fill=(rng.randint(20, 60),) * 3, font=font)
+        y += line_height * (2 if rng.random() < 0.1 else 1)
+    image.save(path, quality=85)
+
+
+async def read_pipeline(pool: ExtractionPool, path: str) -> str:
+    return await pool._ocr_image(path)
+
+
+def read_raw(path: str) -> str:
+    with Image.open(path) as image:
+        return pytesseract.image_to_string(image)
+
+
+def report(mode: str, timings: list, texts: list):
+    empty = sum(1 for text in texts if not text.strip())
+    print(f"{mode:>9}: avg {sum(timings) / len(timings):.2f} s/image, max {max(timings):.2f} s, "
+          f"empty {empty}/{len(texts)}, avg {sum(len(t.split()) for t in texts) / len(texts):.0f} words")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=12000)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    paths = []
+    for i in range(args.images):
+        path = os.path.join(directory, f"photo{i}.jpg")
+        render_photo(path, args.width, args.height, i)
+        paths.append(path)
+    print(f"{args.images} photos of {args.width}x{args.height} "
+          f"({sum(os.path.getsize(p) for p in paths) / len(paths) / 1e6:.1f} MB avg)")
+
+    try:
+        timings, strips = [], 0
+        for path in paths:
+            started = time.perf_counter()
+            image = image_preprocessor.prepare(Image.open(path))
+            strips += len(image_preprocessor.split(image))
+            timings.append(time.perf_counter() - started)
+        print(f"preprocess: avg {sum(timings) / len(timings):.2f} s/image, "
+              f"{image.width}x{image.height} after scaling, {strips / len(paths):.1f} strips/image")
+
+        if pytesseract is None:
+            print("pytesseract is not installed; skipping OCR")
+            return
+
+        timings, texts = [], []
+        for path in paths:
+            started = time.perf_counter()
+            texts.append(read_raw(path))
+            timings.append(time.perf_counter() - started)
+        report("raw", timings, texts)
+
+        pool = ExtractionPool(workers=args.workers, queue_size=64, timeout=600, max_tasks_per_child=50)
+        await pool.run(len, "warm-up")
+        try:
+            timings, texts = [], []
+            for path in paths:
+                started = time.perf_counter()
+                texts.append(await read_pipeline(pool, path))
+                timings.append(time.perf_counter() - started)
+            report("pipeline", timings, texts)
+        finally:
+            pool.shutdown()
+    finally:
+        for path in paths:
+            os.remove(path)
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""Benchmark: document-frequency writes per material for KeyphraseExtractor.
+
+Builds synthetic textbooks of each requested size (default 10, 100 and
+500 pages of ~500 words) and counts the term-table upserts an upload,
+an edit and a delete send, next to every distinct candidate term a text
+has. Fails if any operation writes more than df_terms + 1 rows.
+
+Run from the backend directory:
+    python -m benchmarks.bench_keyphrase_extractor [--pages 10,100,500] [--df-terms N]
+"""
+import argparse
+import time
+
+from app.services.keyphrase_extractor import KeyphraseExtractor
+from benchmarks.bench_local_summarizer import build_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="10,100,500", help="textbook sizes in pages")
+    parser.add_argument("--df-terms", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    extractor = KeyphraseExtractor(df_terms=args.df_terms)
+    bound = extractor.df_terms + 1
+    for pages in (int(n) for n in args.pages.split(",")):
+        text = build_text(pages, args.seed)
+        edited = build_text(pages, args.seed + 1)
+        distinct = len(extractor.candidates(text, len(text)).terms)
+
+        writes = {}
+        started = time.perf_counter()
+        writes["upload"] = len(extractor.df_operations([text], []))
+        writes["edit"] = len(extractor.df_operations([edited], [text]))
+        writes["delete"] = len(extractor.df_operations([], [text]))
+        elapsed = time.perf_counter() - started
+
+        print(f"{pages} pages, {len(text.split())} words, {distinct} distinct terms: "
+              + ", ".join(f"{name} {count} writes" for name, count in writes.items())
+              + f" ({elapsed * 1000:.0f} ms)")
+        # An edit nets out terms both versions share, but may write each version's terms once.
+        assert writes["upload"] <= bound and writes["delete"] <= bound and writes["edit"] <= 2 * bound, writes
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Benchmark for the offline quiz and flashcard generator.
+
+Reuses the synthetic textbook from bench_local_summarizer and times
+LocalQuizGenerator end to end: key-term ranking, sentence indexing and
+item construction. Reports items per second for quiz and flashcards.
+
+Run from the backend directory:
+    python -m benchmarks.bench_local_quiz [--pages N] [--items N] [--repeat N]
+"""
+import argparse
+import time
+
+from app.services.local_quiz import LocalQuizGenerator
+from benchmarks.bench_local_summarizer import build_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    text = build_text(args.pages, args.seed)
+    generator = LocalQuizGenerator()
+    print(f"{args.pages} pages, {len(text) / 1e6:.2f} MB, {len(text.split())} words")
+
+    for name, generate in (("quiz", generator.quiz), ("flashcards", generator.flashcards)):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            items = generate(text, args.items)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        print(f"{name}: {len(items)} items, best {best * 1000:.0f} ms, "
+              f"{len(items) / best:.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
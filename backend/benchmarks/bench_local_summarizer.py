@@ -0,0 +1,54 @@
+"""Benchmark for the offline extractive summarizer.
+
+Builds a synthetic textbook (default 500 pages of ~500 words with
+recurring topics) and times LocalSummarizer.summarize end to end:
+sentence segmentation, TF-IDF, TextRank and markdown rendering.
+
+Run from the backend directory:
+    python -m benchmarks.bench_local_summarizer [--pages N] [--repeat N]
+"""
+import argparse
+import random
+import time
+
+from app.services.local_summarizer import LocalSummarizer
+
+
+def build_text(pages: int, seed: int) -> str:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 11))) for _ in range(8000)]
+    common = vocabulary[:600]
+    sentences = []
+    for page in range(pages):
+        topic = vocabulary[600 + (page // 12) % 60 * 100:600 + ((page // 12) % 60 + 1) * 100]
+        for _ in range(25):
+            words = [rng.choice(topic) if rng.random() < 0.45 else rng.choice(common)
+                     for _ in range(rng.randint(8, 32))]
+            sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    text = build_text(args.pages, args.seed)
+    summarizer = LocalSummarizer()
+    print(f"{args.pages} pages, {len(text) / 1e6:.1f} MB, {len(text.split())} words")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        summary = summarizer.summarize(text)
+        timings.append(time.perf_counter() - started)
+
+    print(f"summarize: best {min(timings) * 1000:.0f} ms, worst {max(timings) * 1000:.0f} ms, "
+          f"{len(summary.split())} words in summary")
+
+
+if __name__ == "__main__":
+    main()
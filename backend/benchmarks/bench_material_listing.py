@@ -0,0 +1,156 @@
+"""Benchmark: the materials listing, full documents against keyset pages of listing fields.
+
+Builds a user with many materials (default 1000 and 5000, each with
+about 50 KB of text, stored compressed, and a summary, quiz, flashcards
+and a study plan on half of them). "full" is the old listing: every field of every
+material, sorted by created_at. "paged" is MaterialListing: LIST_FIELDS
+only, one page of --limit at a time. Reports bytes transferred and time
+for a dashboard load (first page) and for walking every page. Without
+--mongodb-url, transfer is BSON encode and decode in process; with it
+the listings run against a scratch database (dropped afterwards), with
+the compound index from main.py, and the index use is shown.
+
+Run from the backend directory:
+    python -m benchmarks.bench_material_listing [--materials 1000,5000] [--limit N] [--mongodb-url URL]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+
+from app.services.content_store import ContentStore
+from app.services.material_listing import LIST_FIELDS, MaterialListing, listing_fields
+from benchmarks.bench_content_store import build_material
+from benchmarks.bench_local_summarizer import build_text
+
+
+def build_materials(count: int, text: str, seed: int) -> list:
+    rng = random.Random(seed)
+    store = ContentStore(16384, 1024 * 1024, level=6)
+    content = store.encode(text).fields
+    started = datetime(2025, 1, 1)
+    materials = []
+    for i in range(count):
+        doc = build_material("")
+        doc.update(content)
+        doc.update(listing_fields(text))
+        doc.update({
+            "_id": ObjectId(),
+            "subject": rng.choice(["Biology", "History", "Physics", "Law"]),
+            "file_type": rng.choice(["pdf", "txt", "png"]),
+            # Bulk uploads share timestamps, so ties are common.
+            "created_at": started + timedelta(seconds=i // 3),
+        })
+        if rng.random() < 0.5:
+            doc.update({"summary": None, "quizzes": None, "flashcards": None, "study_plan": None,
+                        "has_summary": False, "has_quizzes": False, "has_flashcards": False,
+                        "has_study_plan": False})
+        else:
+            doc.update({"has_summary": True, "has_quizzes": True, "has_flashcards": True,
+                        "has_study_plan": True})
+        materials.append(doc)
+    return materials
+
+
+def newest_first(materials: list) -> list:
+    return sorted(materials, key=lambda doc: (doc["created_at"], doc["_id"]), reverse=True)
+
+
+def transfer(docs: list) -> tuple:
+    """(bytes, seconds) to encode and decode docs as if sent by the server."""
+    started = time.perf_counter()
+    encoded = [bson.encode(doc) for doc in docs]
+    for data in encoded:
+        bson.decode(data)
+    return sum(len(data) for data in encoded), time.perf_counter() - started
+
+
+def report(mode: str, first: tuple, walk: tuple, pages: int):
+    print(f"  {mode:>5}: first page {first[0] / 1e6:8.2f} MB in {first[1] * 1000:8.1f} ms, "
+          f"all {pages:3d} pages {walk[0] / 1e6:8.2f} MB in {walk[1] * 1000:8.1f} ms")
+
+
+def bench_local(materials: list, limit: int):
+    ordered = newest_first(materials)
+    full = transfer(ordered)
+    report("full", full, full, 1)
+
+    projected = [{"_id": doc["_id"], **{name: doc[name] for name in LIST_FIELDS}} for doc in ordered]
+    pages = [projected[i:i + limit] for i in range(0, len(projected), limit)]
+    walk = [transfer(page) for page in pages]
+    report("paged", walk[0], (sum(b for b, _ in walk), sum(t for _, t in walk)), len(pages))
+
+
+async def bench_mongo(database, materials: list, limit: int):
+    await database.materials.delete_many({})
+    await database.materials.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await database.materials.insert_many(materials)
+
+    started = time.perf_counter()
+    cursor = database.materials.find({"user_id": "bench"}).sort("created_at", -1)
+    size = sum([len(bson.encode(doc)) async for doc in cursor])
+    elapsed = time.perf_counter() - started
+    report("full", (size, elapsed), (size, elapsed), 1)
+
+    listing = MaterialListing()
+    listing.set_db(database)
+    walk_bytes, walk_seconds, pages, first, cursor = 0, 0.0, 0, None, None
+    while True:
+        started = time.perf_counter()
+        entries, cursor = await listing.page("bench", None, cursor, limit)
+        elapsed = time.perf_counter() - started
+        size = len(bson.encode({"materials": entries}))
+        walk_bytes, walk_seconds, pages = walk_bytes + size, walk_seconds + elapsed, pages + 1
+        first = first or (size, elapsed)
+        if cursor is None:
+            break
+    report("paged", first, (walk_bytes, walk_seconds), pages)
+
+    last = newest_first(materials)[-limit - 1]
+    created_at, material_id = last["created_at"], last["_id"]
+    plan = await database.materials.find({
+        "user_id": "bench",
+        "$or": [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "_id": {"$lt": material_id}}],
+    }, LIST_FIELDS).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).explain()
+    stats = plan.get("executionStats", {})
+    print(f"  last page examined {stats.get('totalKeysExamined')} keys, "
+          f"{stats.get('totalDocsExamined')} documents")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--materials", default="1000,5000", help="materials per user")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--text-kb", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongodb-url", default=None)
+    args = parser.parse_args()
+
+    block = build_text(20, args.seed)
+    text = (block * (args.text_kb * 1000 // len(block) + 1))[:args.text_kb * 1000]
+    client = database = None
+    if args.mongodb_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongodb_url)
+        database = client["bench_material_listing"]
+
+    try:
+        for count in (int(n) for n in args.materials.split(",")):
+            materials = build_materials(count, text, args.seed)
+            print(f"{count} materials, {args.text_kb} KB of text each")
+            if database is None:
+                bench_local(materials, args.limit)
+            else:
+                await bench_mongo(database, materials, args.limit)
+    finally:
+        if client is not None:
+            await client.drop_database("bench_material_listing")
+            client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
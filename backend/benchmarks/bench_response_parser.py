@@ -0,0 +1,124 @@
+"""Micro-benchmark for LLM response parsing.
+
+Compares the previous regex-based `_safe_parse_json` with
+`app.services.response_parser` on a synthetic corpus of clean, fenced,
+prose-wrapped, truncated and corrupted quiz responses, plus any real
+responses saved as *.txt files in --corpus.
+
+Run from the backend directory:
+    python -m benchmarks.bench_response_parser [--corpus DIR] [--repeat N]
+"""
+import argparse
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from app.models.generation import QuizQuestion
+from app.services import response_parser
+
+
+def legacy_parse(text: str):
+    """The original AIEngine._safe_parse_json."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        json_match = re.search(r'[\[{].*[\]}]', text, re.DOTALL)
+        if json_match:
+            try:
+                return json.loads(json_match.group())
+            except json.JSONDecodeError:
+                pass
+        return {}
+
+
+def make_quiz(rng: random.Random, n: int) -> str:
+    items = []
+    for i in range(n):
+        items.append({
+            "type": "mcq",
+            "question": f"Which statement about topic {i} [section {rng.randint(1, 9)}] is correct?",
+            "options": [f"Option {c} with a \"quoted\" detail, {{braces}}" for c in "ABCD"],
+            "correct_answer": "Option A with a \"quoted\" detail, {braces}",
+            "explanation": "Because " + " ".join(rng.choice(["cells", "energy", "law", "graph"]) for _ in range(40)),
+        })
+    return json.dumps(items, indent=2)
+
+
+def build_corpus(rng: random.Random, size: int) -> list:
+    corpus = []
+    for _ in range(size):
+        body = make_quiz(rng, 10)
+        variant = rng.choice(["clean", "fenced", "prose", "truncated", "trailing", "corrupt"])
+        if variant == "fenced":
+            text = f"```json\n{body}\n```"
+        elif variant == "prose":
+            text = f"Here [as requested] is your quiz:\n{body}\nLet me know if you need more!"
+        elif variant == "truncated":
+            text = body[:rng.randint(len(body) // 3, len(body) - 5)]
+        elif variant == "trailing":
+            text = body + "\n\nNote: answers are in {brackets} above ]"
+        elif variant == "corrupt":
+            cut = body.index('"question"', len(body) // 2)
+            text = body[:cut] + body[cut + 1:]
+        else:
+            text = body
+        corpus.append((variant, text))
+    return corpus
+
+
+def run(name: str, parse, corpus: list, repeat: int) -> dict:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [parse(text) for _, text in corpus]
+    elapsed = time.perf_counter() - started
+
+    recovered = {}
+    for (variant, _), items in zip(corpus, results):
+        ok, total = recovered.get(variant, (0, 0))
+        recovered[variant] = (ok + (1 if items else 0), total + 1)
+    return {
+        "name": name,
+        "us_per_response": elapsed / (repeat * len(corpus)) * 1e6,
+        "items": sum(len(items) for items in results),
+        "recovered": recovered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="directory of real responses (*.txt)")
+    parser.add_argument("--size", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(random.Random(args.seed), args.size)
+    if args.corpus:
+        corpus += [("real", path.read_text()) for path in sorted(args.corpus.glob("*.txt"))]
+
+    def legacy(text):
+        value = legacy_parse(text)
+        return response_parser.validate_items(value, QuizQuestion)
+
+    def current(text):
+        return response_parser.parse_items(text, QuizQuestion)
+
+    for result in (run("legacy", legacy, corpus, args.repeat), run("response_parser", current, corpus, args.repeat)):
+        print(f"{result['name']:>16}: {result['us_per_response']:8.1f} us/response, "
+              f"{result['items']} valid items")
+        for variant, (ok, total) in sorted(result["recovered"].items()):
+            print(f"{'':>18}{variant:<10} {ok}/{total} responses usable")
+
+
+if __name__ == "__main__":
+    main()
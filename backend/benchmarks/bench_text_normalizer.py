@@ -0,0 +1,120 @@
+"""Benchmark: streaming TextNormalizer against the old four-pass clean_text.
+
+Writes synthetic extracted text (soft-wrapped lines, paragraph and page
+breaks, bullets and other dropped symbols, "end.Next" joins) of each
+requested size to a temporary file, then cleans it both ways: "legacy"
+reads the whole file and runs the previous clean_text; "streaming" is
+DocumentProcessor.clean_file. Peak Python memory is measured in a
+separate traced run so it does not distort the timings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_text_normalizer [--sizes 1,10,100] [--repeat N]
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from app.services.document_processor import DocumentProcessor
+from benchmarks.bench_local_summarizer import build_text
+
+
+def legacy_clean_text(raw_text: str) -> str:
+    """DocumentProcessor.clean_text before the streaming normalizer."""
+    if not raw_text:
+        return ""
+    text = re.sub(r'\s+', ' ', raw_text)
+    text = re.sub(r'[^\w\s.,;:!?\-\'\"()\[\]{}/\\@#$%&*+=<>~`^|]', '', text)
+    text = re.sub(r'\.(?=[A-Z])', '. ', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def legacy_clean_file(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return legacy_clean_text(f.read())
+
+
+def build_page_text(seed: int) -> str:
+    """About 1 MB laid out like PDF extraction output."""
+    rng = random.Random(seed)
+    sentences = build_text(240, seed).split(". ")
+    pages, lines, line = [], [], ""
+    for i, sentence in enumerate(sentences):
+        if rng.random() < 0.05:
+            sentence = "• " + sentence
+        joiner = "." if rng.random() < 0.1 else ". "
+        for word in (sentence + joiner).split(" "):
+            if len(line) + len(word) > 78:
+                lines.append(line)
+                line = ""
+            line += word + " "
+        if rng.random() < 0.12:
+            lines.append(line + "\n")
+            line = ""
+        if i % 60 == 59:
+            pages.append("\n".join(lines + [line]) + "\n\x0c")
+            lines, line = [], ""
+    pages.append("\n".join(lines + [line]))
+    return "\n".join(pages)
+
+
+def write_corpus(directory: str, megabytes: int, block: str) -> str:
+    path = os.path.join(directory, f"corpus-{megabytes}mb.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < megabytes * 1e6:
+            f.write(block)
+            written += len(block)
+    return path
+
+
+def timed(clean, path: str, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = clean(path)
+        timings.append(time.perf_counter() - started)
+    return min(timings), text
+
+
+def peak_memory(clean, path: str) -> int:
+    tracemalloc.start()
+    try:
+        clean(path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,100", help="corpus sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    block = build_page_text(args.seed)
+    directory = tempfile.mkdtemp()
+    modes = {"legacy": legacy_clean_file, "streaming": DocumentProcessor.clean_file}
+    try:
+        for megabytes in (int(size) for size in args.sizes.split(",")):
+            path = write_corpus(directory, megabytes, block)
+            size = os.path.getsize(path)
+            print(f"{megabytes} MB corpus ({size / 1e6:.1f} MB on disk)")
+            for mode, clean in modes.items():
+                elapsed, text = timed(clean, path, args.repeat)
+                peak = peak_memory(clean, path)
+                paragraphs = text.count("\n\n") + 1 if text else 0
+                print(f"  {mode:>9}: {elapsed * 1000:8.0f} ms, {size / elapsed / 1e6:6.1f} MB/s, "
+                      f"peak {peak / 1e6:7.1f} MB ({peak / size:.1f}x input), {paragraphs} paragraphs")
+            os.remove(path)
+    finally:
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,18 @@ from bson import ObjectId
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.routes import auth, materials, ai, progress
+from app.routes import auth, materials, ai, progress, jobs
 from app.utils.helpers import get_current_user
+from app.services.chunk_store import chunk_store
+from app.services.content_store import content_store
+from app.services.generation_cache import generation_cache
+from app.services.job_queue import job_queue
+from app.services.keyphrase_extractor import keyphrase_extractor
+from app.services.material_listing import material_listing
+from app.services.llm_metrics import llm_metrics
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_pool import extraction_pool
+from app.services.upload_storage import RequestSizeLimit
 
 # Database setup
 client = None
@@ -29,14 +39,46 @@ async def lifespan(app: FastAPI):
     # Create indexes
     await db.users.create_index("email", unique=True)
     await db.materials.create_index("user_id")
+    await db.materials.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.materials.create_index([("user_id", 1), ("subject", 1), ("created_at", -1), ("_id", -1)])
+    await db.materials.create_index("content_blob.sha256", sparse=True)
+    await db.materials.create_index("index_blob.sha256", sparse=True)
     await db.progress.create_index("user_id")
     await db.progress.create_index("created_at")
+    await db.jobs.create_index([("status", 1), ("created_at", 1)])
+    await db.jobs.create_index("user_id")
+    await db.material_chunks.create_index(
+        [("material_id", 1), ("kind", 1), ("version", 1), ("hash", 1)], unique=True
+    )
+    await db.term_frequencies.create_index([("user_id", 1), ("term", 1)], unique=True)
+    await db.ai_cache.create_index(
+        "created_at", expireAfterSeconds=settings.AI_CACHE_MONGO_TTL_SECONDS
+    )
+    await db.llm_calls.create_index(
+        "created_at", expireAfterSeconds=settings.LLM_METRICS_MONGO_TTL_SECONDS
+    )
+    await db.llm_calls.create_index([("kind", 1), ("created_at", -1)])
+    await db.extraction_cache.create_index(
+        "last_used_at", expireAfterSeconds=settings.EXTRACTION_CACHE_MONGO_TTL_SECONDS
+    )
+    await db.extraction_cache.create_index("version")
 
     auth.set_db(db)
     materials.set_db(db)
     materials.set_upload_dir(settings.UPLOAD_DIR)
     ai.set_db(db)
     progress.set_db(db)
+    generation_cache.set_db(db)
+    chunk_store.set_db(db)
+    content_store.set_db(db)
+    material_listing.set_db(db)
+    keyphrase_extractor.set_db(db)
+    llm_metrics.set_db(db)
+    llm_metrics.start()
+    extraction_cache.set_db(db)
+    await extraction_cache.prune()
+    job_queue.set_db(db)
+    job_queue.start()
 
     print("✅ Connected to MongoDB Atlas successfully!")
     print(f"📡 Server running on http://{settings.HOST}:{settings.PORT}")
@@ -44,6 +86,9 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    await job_queue.stop()
+    await llm_metrics.stop()
+    extraction_pool.shutdown()
     print("🔌 Disconnecting from MongoDB...")
     client.close()
 
@@ -56,6 +101,8 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Added before CORS so that CORS wraps it and its 413s reach the browser.
+app.add_middleware(RequestSizeLimit, limits=materials.upload_request_limits())
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -68,6 +115,7 @@ app.include_router(auth.router)
 app.include_router(materials.router)
 app.include_router(ai.router)
 app.include_router(progress.router)
+app.include_router(jobs.router)
 
 @app.get("/", tags=["Health"])
 async def root():
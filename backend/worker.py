@@ -0,0 +1,46 @@
+import asyncio
+import certifi
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.routes import ai
+from app.services.chunk_store import chunk_store
+from app.services.content_store import content_store
+from app.services.generation_cache import generation_cache
+from app.services.job_queue import job_queue
+from app.services.keyphrase_extractor import keyphrase_extractor
+from app.services.llm_metrics import llm_metrics
+
+
+async def main():
+    """Run only the generation job workers, independently of the API servers."""
+    print("🚀 Connecting to MongoDB Atlas...")
+    client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        tls=True,
+        tlsCAFile=certifi.where(),
+        tlsAllowInvalidCertificates=True
+    )
+    db = client[settings.DB_NAME]
+
+    ai.set_db(db)
+    generation_cache.set_db(db)
+    chunk_store.set_db(db)
+    content_store.set_db(db)
+    keyphrase_extractor.set_db(db)
+    llm_metrics.set_db(db)
+    llm_metrics.start()
+    job_queue.set_db(db)
+    job_queue.start(settings.JOB_STANDALONE_WORKERS)
+    print(f"⚙️ Job worker running with {settings.JOB_STANDALONE_WORKERS} workers")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.stop()
+        await llm_metrics.stop()
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())